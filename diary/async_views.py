@@ -0,0 +1,230 @@
+"""
+Async versions of the diary list and detail endpoints, for ASGI deployments.
+
+Under ASGI, Django runs a sync DRF view in a worker thread for the whole
+request, so authentication, conditional checks, cache lookups,
+serialization and rendering all hold a thread. These views run on the
+event loop instead. Reads use the async ORM, cache and pagination APIs.
+Writes that must be atomic run as a single unit in a worker thread,
+because Django cannot keep a transaction open across awaits. That covers
+creates with an ``Idempotency-Key``, deletes with their tombstone, and
+attaching a chunked upload.
+
+Requests and responses match the DRF views: same serializers, cursors,
+ETags, response cache, error bodies and Token/session authentication.
+``diary_project.asgi`` serves these views (see ``diary_project.asgi_urls``);
+WSGI deployments keep the DRF views.
+"""
+from calendar import timegm
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.authentication import SessionAuthentication, get_authorization_header
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from . import cache as response_cache
+from .authentication import CachedTokenAuthentication
+from .conditional import adiary_list_etag, adiary_updated_at, diary_detail_digest
+from .idempotency import IDEMPOTENCY_HEADER, idempotent
+from .models import Diary, DiaryTombstone
+from .pagination import DiaryCursorPagination
+from .serializers import DiaryListSerializer, DiarySerializer
+from .views import with_preview
+
+NOT_FOUND = 'No Diary matches the given query.'
+
+
+async def authenticate(request):
+    """The user making ``request``, authenticated as the DRF views would"""
+    auth = get_authorization_header(request).split()
+    if auth and auth[0].lower() == b'token':
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        user, _ = await CachedTokenAuthentication().aauthenticate_credentials(key)
+        return user
+
+    # No session middleware on token-only paths (see diary_project.settings_api)
+    user = await request.auser() if hasattr(request, 'auser') else None
+    if user is None or not user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    if request.method not in SAFE_METHODS:
+        SessionAuthentication().enforce_csrf(Request(request))
+    return user
+
+
+@transaction.atomic
+def _delete_with_tombstone(diary):
+    DiaryTombstone.objects.create(user_id=diary.user_id, diary_id=diary.pk)
+    diary.delete()
+
+
+class AsyncDiaryView(View):
+    """Authentication, request parsing and JSON rendering for the async diary views"""
+    renderer = JSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token requests carry no CSRF token; session requests are checked in authenticate()
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await authenticate(request)
+            response = await super().dispatch(request, *args, **kwargs)
+        except (exceptions.APIException, Http404) as exc:
+            response = self.render_exception(exc)
+        # As DRF's content negotiation does for the sync views
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def api_request(self, request):
+        """``request`` as a DRF ``Request``, to parse the body as the DRF views do"""
+        api_request = Request(request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES])
+        api_request.user = request.user
+        return api_request
+
+    def render(self, data, status=200):
+        return HttpResponse(self.renderer.render(data), content_type='application/json', status=status)
+
+    def render_response(self, response):
+        """Render a DRF ``Response`` built by code shared with the sync views"""
+        rendered = self.render(response.data, status=response.status_code)
+        for header, value in response.items():
+            if header != 'Content-Type':
+                rendered[header] = value
+        return rendered
+
+    def render_exception(self, exc):
+        if isinstance(exc, Http404):
+            exc = exceptions.NotFound(*exc.args)
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = self.render(data, status=exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            response['WWW-Authenticate'] = 'Token'
+        return response
+
+    async def get_object(self, request, pk):
+        diary = await Diary.objects.filter(user=request.user, pk=pk).afirst()
+        if diary is None:
+            raise Http404(NOT_FOUND)
+        return diary
+
+    async def validate(self, serializer):
+        if 'upload' in serializer.initial_data:
+            # Looking the upload up uses the sync ORM
+            await sync_to_async(serializer.is_valid)(raise_exception=True)
+        else:
+            serializer.is_valid(raise_exception=True)
+
+    async def save(self, serializer):
+        """``serializer.save()``, with the model saved by ``asave``"""
+        if 'upload' in serializer.validated_data:
+            # Moves the assembled file into storage and deletes the upload
+            return await sync_to_async(serializer.save)()
+        diary = serializer.instance or Diary()
+        for attr, value in serializer.validated_data.items():
+            setattr(diary, attr, value)
+        # Hashes and stores a new attachment off the event loop
+        await diary.asave()
+        return diary
+
+
+class AsyncDiaryListCreateView(AsyncDiaryView):
+    async def get(self, request):
+        digest = await adiary_list_etag(request)
+        etag = quote_etag(digest)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            data, hit = await response_cache.acached_data(
+                request, 'list', digest, lambda: self._list_page(request),
+                lambda: adiary_list_etag(request),
+            )
+            response = self.render(data)
+            response['X-Cache'] = 'HIT' if hit else 'MISS'
+        response['ETag'] = etag
+        return response
+
+    async def _list_page(self, request):
+        queryset = Diary.objects.filter(user=request.user)
+        file_type = request.GET.get('file_type')
+        if file_type:
+            queryset = queryset.filter(file_type=file_type)
+        paginator = DiaryCursorPagination()
+        page = await paginator.apaginate_queryset(with_preview(queryset), Request(request))
+        return paginator.get_paginated_data(DiaryListSerializer(page, many=True).data)
+
+    async def post(self, request):
+        api_request = self.api_request(request)
+        if request.headers.get(IDEMPOTENCY_HEADER):
+            # The row and the recorded response must commit together
+            return self.render_response(
+                await sync_to_async(idempotent)(api_request, lambda: self._create(api_request))
+            )
+        serializer = DiarySerializer(data=api_request.data, context={'request': api_request})
+        await self.validate(serializer)
+        diary = await self.save(serializer)
+        return self.render(DiarySerializer(diary).data, status=201)
+
+    def _create(self, api_request):
+        serializer = DiarySerializer(data=api_request.data, context={'request': api_request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=201)
+
+
+class AsyncDiaryDetailView(AsyncDiaryView):
+    async def get(self, request, pk):
+        updated_at = await adiary_updated_at(request, pk)
+        if updated_at is None:
+            raise Http404(NOT_FOUND)
+        digest = diary_detail_digest(request, pk, updated_at)
+        etag = quote_etag(digest)
+        last_modified = timegm(updated_at.utctimetuple())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            data, hit = await response_cache.acached_data(
+                request, 'detail', digest, lambda: self._retrieve(request, pk),
+                lambda: self._detail_etag(request, pk),
+            )
+            response = self.render(data)
+            response['X-Cache'] = 'HIT' if hit else 'MISS'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    async def _detail_etag(self, request, pk):
+        updated_at = await adiary_updated_at(request, pk)
+        return diary_detail_digest(request, pk, updated_at) if updated_at else None
+
+    async def _retrieve(self, request, pk):
+        return DiarySerializer(await self.get_object(request, pk)).data
+
+    async def put(self, request, pk, partial=False):
+        diary = await self.get_object(request, pk)
+        api_request = self.api_request(request)
+        serializer = DiarySerializer(diary, data=api_request.data, partial=partial, context={'request': api_request})
+        await self.validate(serializer)
+        diary = await self.save(serializer)
+        return self.render(DiarySerializer(diary).data)
+
+    async def patch(self, request, pk):
+        return await self.put(request, pk, partial=True)
+
+    async def delete(self, request, pk):
+        diary = await self.get_object(request, pk)
+        await sync_to_async(_delete_with_tombstone)(diary)
+        return HttpResponse(status=204)
@@ -0,0 +1,103 @@
+"""
+Token authentication without a database query per request.
+
+DRF's ``TokenAuthentication`` looks the token and its user up on every
+API call. ``CachedTokenAuthentication`` remembers recent lookups in a
+bounded, process-local LRU. Entries expire after DIARY_TOKEN_CACHE_TIMEOUT
+seconds. They are keyed by a SHA-256 digest of the token and hold only
+the user and when the token was created, so no key outlives the request
+that presented it: a hit rebuilds the Token around the request's key.
+
+Deleting a token, which is what logout does, drops it from the cache.
+Saving a user drops that user's tokens, so deactivation takes effect
+immediately (see ``diary.signals``). Other processes only see either
+change once their entry expires, so the timeout bounds how long a revoked
+token keeps working there.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+
+def _digest(key):
+    return hashlib.sha256(key.encode()).digest()
+
+
+class TokenCache:
+    """Thread-safe LRU of ``(user, token created)`` by token digest, with a TTL"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        digest = _digest(key)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            user, created, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+        # Each request gets its own user, as it would from the database
+        return copy.copy(user), created
+
+    def set(self, key, user, created):
+        digest = _digest(key)
+        expires = time.monotonic() + settings.DIARY_TOKEN_CACHE_TIMEOUT
+        with self._lock:
+            self._entries[digest] = (user, created, expires)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > settings.DIARY_TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(_digest(key), None)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for digest in [d for d, (user, _, _) in self._entries.items() if user.pk == user_id]:
+                del self._entries[digest]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cached = self._cached_credentials(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token.created)
+        return copy.copy(user), token
+
+    async def aauthenticate_credentials(self, key):
+        """``authenticate_credentials`` for async views; only a cache miss leaves the event loop"""
+        cached = self._cached_credentials(key)
+        if cached is not None:
+            return cached
+        return await sync_to_async(self.authenticate_credentials)(key)
+
+    def _cached_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            return None
+        user, created = cached
+        # The token as the database would return it, for request.auth
+        token = self.get_model().from_db(None, ['key', 'user_id', 'created'], [key, user.pk, created])
+        token.user = user
+        return user, token
@@ -0,0 +1,103 @@
+"""
+Per-user response cache for the diary read endpoints.
+
+Cached payloads are keyed by user, by the response's ETag (see
+``diary.conditional``) and by the full request URL. The ETag is worked out
+from the database on every request, so a write committed by any process
+changes the key, and a cached body is never served with an ETag other than
+the one it was built under. Superseded payloads simply expire. Works with
+any Django cache backend; ``LocMemCache`` is correct with several worker
+processes, but each keeps its own copy.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+
+class CacheStats:
+    """Process-local hit/miss counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else None,
+            }
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[settings.DIARY_CACHE_ALIAS]
+
+
+def cached_response(request, scope, etag, build_response, current_etag):
+    """
+    Serve ``request`` from the cache, or call ``build_response`` and cache it.
+
+    ``etag`` is the ETag the response goes out with; without one nothing
+    is cached. On a miss, ``current_etag()`` works the ETag out again once
+    the response is built, and the response is only stored if it has not
+    changed: a write committed in between could be missing from the body.
+    Only 200 responses are stored; their ``data`` is cached rather than the
+    rendered bytes so content negotiation still happens per request.
+    """
+    if etag is None:
+        return build_response()
+    cache = get_cache()
+    key = _response_key(request, scope, etag)
+
+    data = cache.get(key)
+    stats.record(hit=data is not None)
+    if data is not None:
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    response = build_response()
+    if response.status_code == 200 and current_etag() == etag:
+        cache.set(key, response.data, timeout=settings.DIARY_CACHE_TIMEOUT)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+async def acached_data(request, scope, etag, build_data, current_etag):
+    """
+    ``cached_response`` for async views, which render their own responses.
+
+    Awaits ``build_data()`` on a miss; it should raise rather than return
+    anything that must not be cached. Returns ``(data, hit)``.
+    """
+    cache = get_cache()
+    key = _response_key(request, scope, etag)
+
+    data = await cache.aget(key)
+    stats.record(hit=data is not None)
+    if data is not None:
+        return data, True
+
+    data = await build_data()
+    if await current_etag() == etag:
+        await cache.aset(key, data, timeout=settings.DIARY_CACHE_TIMEOUT)
+    return data, False
+
+
+def _response_key(request, scope, etag):
+    return f'diary:{scope}:{request.user.pk}:{etag}:{request.build_absolute_uri()}'
@@ -0,0 +1,79 @@
+"""
+Validators for conditional GETs on the diary endpoints.
+
+They are passed to ``django.views.decorators.http.condition`` so that a
+request carrying a matching ``If-None-Match`` (or, for a single diary,
+``If-Modified-Since``) is answered with 304 before any row is serialized.
+The ETag is also kept on the request as ``diary_etag``, for the response
+cache to key on (see ``diary.cache``). Both ETags change when the window
+of the signed media URLs in the bodies does (see ``diary.media``).
+"""
+import hashlib
+
+from django.db.models import Count, Max
+
+from .media import media_url_window
+from .models import Diary
+
+
+def _remember(request, etag):
+    request.diary_etag = etag
+    return etag
+
+
+def _digest(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def diary_list_etag(request, *args, **kwargs):
+    """
+    ETag for a page of the user's diary list.
+
+    Any create or update raises ``max(updated_at)`` and any delete changes
+    the row count, so together they identify the state of the whole list;
+    the query string distinguishes pages, page sizes and filters.
+    """
+    return _remember(request, _list_digest(request, Diary.objects.filter(user=request.user).aggregate(**_list_stats())))
+
+
+async def adiary_list_etag(request):
+    return _list_digest(request, await Diary.objects.filter(user=request.user).aaggregate(**_list_stats()))
+
+
+def _list_stats():
+    return {'count': Count('id'), 'last_updated': Max('updated_at')}
+
+
+def _list_digest(request, stats):
+    return _digest(
+        request.user.pk,
+        stats['count'],
+        stats['last_updated'].isoformat() if stats['last_updated'] else '',
+        request.META.get('QUERY_STRING', ''),
+        media_url_window(),
+    )
+
+
+def _diary_updated_at(request, pk):
+    return _updated_at_query(request, pk).first()
+
+
+async def adiary_updated_at(request, pk):
+    return await _updated_at_query(request, pk).afirst()
+
+
+def _updated_at_query(request, pk):
+    return Diary.objects.filter(user=request.user, pk=pk).values_list('updated_at', flat=True)
+
+
+def diary_detail_digest(request, pk, updated_at):
+    return _digest(request.user.pk, pk, updated_at.isoformat(), media_url_window())
+
+
+def diary_detail_etag(request, pk, *args, **kwargs):
+    updated_at = _diary_updated_at(request, pk)
+    return _remember(request, diary_detail_digest(request, pk, updated_at) if updated_at else None)
+
+
+def diary_detail_last_modified(request, pk, *args, **kwargs):
+    return _diary_updated_at(request, pk)
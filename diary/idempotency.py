@@ -0,0 +1,70 @@
+"""
+``Idempotency-Key`` support for create requests.
+
+A client that may retry a POST (e.g. one replaying writes queued while
+offline) sends a unique key with it. The first request that succeeds with
+a key records its response in the same transaction as the created row;
+any later request with that key gets the recorded response back instead
+of creating a duplicate.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+def replay(record):
+    return Response(record.response, status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+
+
+def idempotent(request, build_response):
+    """
+    Run ``build_response`` at most once per ``Idempotency-Key``.
+
+    Without the header the request is handled as usual. Only successful
+    responses are recorded, so a request that failed validation can be
+    corrected and retried with the same key.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return build_response()
+    if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+        raise ValidationError({'detail': f'{IDEMPOTENCY_HEADER} is too long'})
+
+    record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+    if record is not None:
+        return replay(record)
+
+    # Receive the body, and any attached file, before the transaction
+    # takes the database's write lock
+    request.data
+    try:
+        with transaction.atomic():
+            response = build_response()
+            if response.status_code < 300:
+                IdempotencyKey.objects.create(
+                    user=request.user, key=key, status_code=response.status_code, response=response.data,
+                )
+    except IntegrityError:
+        # A concurrent request with the same key committed first, and this
+        # one's row was rolled back with it; answer as that request did
+        record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+        if record is None:
+            raise
+        return replay(record)
+    return response
+
+
+def expire_idempotency_keys():
+    """Delete keys older than DIARY_IDEMPOTENCY_KEY_RETENTION_HOURS; returns how many"""
+    horizon = timezone.now() - timedelta(hours=settings.DIARY_IDEMPOTENCY_KEY_RETENTION_HOURS)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=horizon).delete()
+    return deleted
@@ -0,0 +1,111 @@
+"""
+Shared helpers for the ``benchmark_*`` management commands.
+
+Benchmarks never touch the configured database: they run inside a
+throwaway test database created with the same backend, so they are safe
+to run against a development settings module.
+"""
+import os
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from diary.models import Diary
+
+WORDS = (
+    'morning coffee walk park rain sunshine meeting project deadline friend family dinner '
+    'lunch breakfast travel mountain beach river city train airport holiday weekend music '
+    'concert movie book chapter garden flowers birthday party gift office team review idea '
+    'plan exercise run gym yoga sleep dream memory letter phone call message doctor health '
+    'recipe cooking bread market school lesson exam teacher student painting photo camera '
+    'sunset ocean forest hike trail snow winter summer autumn spring quiet tired happy calm'
+).split()
+
+# Number of distinct rare ``topicNNNN`` terms mixed into seeded content
+RARE_TERMS = 20000
+
+
+@contextmanager
+def isolated_database(verbosity=0, on_disk=False):
+    """
+    Create a scratch test database for the duration of the block.
+
+    SQLite test databases are normally in memory, where concurrent
+    connections contend on table locks that a real database file never
+    takes; ``on_disk`` puts the scratch database in a temporary file.
+    """
+    old_name = connection.settings_dict['NAME']
+    with tempfile.TemporaryDirectory() as scratch:
+        if on_disk and connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(scratch, 'benchmark.sqlite3')
+        connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+        try:
+            yield connection
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+            connection.settings_dict['TEST']['NAME'] = None
+
+
+def seed_diaries(users, entries, content_length=200, batch_size=5000, stdout=None):
+    """
+    Bulk-insert ``entries`` diaries spread evenly across ``users`` users.
+
+    ``created_at`` is spread over the past few years so that per-user
+    listings have a realistic order to sort on. Returns the list of
+    seeded user ids.
+    """
+    User.objects.bulk_create(
+        [User(username=f'bench-user-{i}') for i in range(users)],
+        batch_size=batch_size,
+    )
+    user_ids = list(User.objects.filter(username__startswith='bench-user-').values_list('id', flat=True))
+
+    created_at = Diary._meta.get_field('created_at')
+    created_at.auto_now_add = False
+    try:
+        now = timezone.now()
+        words_per_entry = max(content_length // 7, 1)
+        batch = []
+        for i in range(entries):
+            batch.append(Diary(
+                user_id=user_ids[i % users],
+                title=' '.join(random.choices(WORDS, k=3)).capitalize(),
+                content=' '.join(random.choices(WORDS, k=words_per_entry) + [f'topic{random.randrange(RARE_TERMS)}']),
+                created_at=now - timedelta(minutes=random.randrange(3 * 365 * 24 * 60)),
+            ))
+            if len(batch) == batch_size:
+                Diary.objects.bulk_create(batch)
+                batch = []
+                if stdout is not None and (i + 1) % (batch_size * 20) == 0:
+                    stdout.write(f'  seeded {i + 1}/{entries} diaries')
+        if batch:
+            Diary.objects.bulk_create(batch)
+    finally:
+        created_at.auto_now_add = True
+    return user_ids
+
+
+def measure(fn, iterations):
+    """Call ``fn`` ``iterations`` times and return latency stats in ms"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'p50': statistics.median(samples),
+        'p95': samples[int(len(samples) * 0.95) - 1],
+        'max': samples[-1],
+    }
+
+
+def format_stats(label, stats):
+    return f'{label:<28} p50={stats["p50"]:8.3f}ms  p95={stats["p95"]:8.3f}ms  max={stats["max"]:8.3f}ms'
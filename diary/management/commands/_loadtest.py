@@ -0,0 +1,61 @@
+"""
+HTTP load generator for ``benchmark_asgi``.
+
+Runs in its own process, so it must not import Django: the server under
+test keeps the parent process's CPU to itself.
+"""
+import asyncio
+import random
+import time
+
+import httpx
+
+
+def run_load(base_url, users, concurrency, duration, warmup, write_percent):
+    """
+    Hit the diary API from ``concurrency`` concurrent clients for
+    ``duration`` seconds (after ``warmup`` seconds that are not recorded).
+
+    ``users`` is a list of ``(token, diary_ids)``. Each client acts as one
+    user: it lists the first page, opens diaries and, ``write_percent`` of
+    the time, creates one. Returns the recorded latencies in ms and the
+    number of failed requests.
+    """
+    return asyncio.run(_run_load(base_url, users, concurrency, duration, warmup, write_percent))
+
+
+async def _run_load(base_url, users, concurrency, duration, warmup, write_percent):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies = []
+    errors = [0]
+    start = time.perf_counter()
+    record_from = start + warmup
+    stop_at = record_from + duration
+
+    async def client(number, http):
+        token, diary_ids = users[number % len(users)]
+        headers = {'Authorization': f'Token {token}'}
+        while time.perf_counter() < stop_at:
+            roll = random.random() * 100
+            sent = time.perf_counter()
+            try:
+                if roll < write_percent:
+                    response = await http.post(
+                        'diaries/', json={'title': 'Load test', 'content': 'x' * 200}, headers=headers,
+                    )
+                elif roll < 50:
+                    response = await http.get('diaries/', headers=headers)
+                else:
+                    response = await http.get(f'diaries/{random.choice(diary_ids)}/', headers=headers)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            finished = time.perf_counter()
+            # Requests that finish inside the window count, however long they queued
+            if record_from <= finished <= stop_at:
+                latencies.append((finished - sent) * 1000)
+                errors[0] += failed
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        await asyncio.gather(*(client(number, http) for number in range(concurrency)))
+    return latencies, errors[0]
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from diary.models import Diary
+
+
+class Command(BaseCommand):
+    help = 'Compute file_type, file_size, mime_type and file_hash for diaries with attachments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recompute metadata for every attachment, not only rows missing it.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        queryset = Diary.objects.exclude(file='').exclude(file__isnull=True).order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(file_hash__isnull=True)
+
+        updated = missing = 0
+        for diary in queryset.defer('content').iterator(chunk_size=options['batch_size']):
+            try:
+                diary.refresh_file_metadata()
+            except FileNotFoundError:
+                missing += 1
+                self.stderr.write(f'Diary {diary.pk}: file {diary.file.name} is missing from storage')
+                continue
+            # updated_at too, so ETags and delta sync pick up the new fields
+            diary.save(update_fields=['file_type', 'file_size', 'mime_type', 'file_hash', 'updated_at'])
+            updated += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} diaries ({missing} missing files)'))
@@ -0,0 +1,126 @@
+import asyncio
+import multiprocessing
+import socket
+import statistics
+import threading
+
+import uvicorn
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connection
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from diary.models import Diary
+from diary_project.asgi import DiaryASGIHandler
+
+from ._benchmark import isolated_database, seed_diaries
+from ._loadtest import run_load
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class BenchmarkWSGIServer(ThreadedWSGIServer):
+    # Room for every client's connection to be waiting at once
+    request_queue_size = 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the diary API as a WSGI deployment (sync DRF views, a thread '
+        'per connection) and as an ASGI deployment (async views under uvicorn), '
+        'and compare throughput and tail latency. Both servers run in this '
+        'process, one after the other, on a scratch database; the clients run '
+        'in a separate process.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=500)
+        parser.add_argument('--duration', type=float, default=20, help='Seconds measured per deployment.')
+        parser.add_argument('--warmup', type=float, default=3)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--entries', type=int, default=10_000)
+        parser.add_argument('--write-percent', type=float, default=5)
+
+    def handle(self, *args, **options):
+        with isolated_database(on_disk=True), override_settings(ALLOWED_HOSTS=['127.0.0.1']):
+            self.stdout.write(f'Seeding {options["entries"]} diaries across {options["users"]} users...')
+            user_ids = seed_diaries(options['users'], options['entries'])
+            Token.objects.bulk_create([Token(key=Token.generate_key(), user_id=user_id) for user_id in user_ids])
+            users = [
+                (token.key, list(Diary.objects.filter(user_id=token.user_id).values_list('pk', flat=True)[:200]))
+                for token in Token.objects.filter(user_id__in=user_ids)
+            ]
+
+            results = []
+            for label, serve in (('WSGI (sync views)', self._serve_wsgi), ('ASGI (async views)', self._serve_asgi)):
+                self.stdout.write(f'{label}: {options["concurrency"]} clients for {options["duration"]:g}s...')
+                with serve() as base_url:
+                    latencies, errors = self._load(base_url, users, options)
+                results.append((label, latencies, errors))
+
+        for label, latencies, errors in results:
+            latencies.sort()
+            self.stdout.write(
+                f'{label:<20} {len(latencies) / options["duration"]:8.1f} req/s  '
+                f'p50={statistics.median(latencies) if latencies else 0:8.1f}ms  '
+                f'p99={latencies[int(len(latencies) * 0.99) - 1] if latencies else 0:8.1f}ms  '
+                f'errors={errors}'
+            )
+
+    def _load(self, base_url, users, options):
+        # A fresh interpreter, so the clients do not compete with the server for the GIL
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            return pool.apply(run_load, (
+                base_url, users, options['concurrency'], options['duration'],
+                options['warmup'], options['write_percent'],
+            ))
+
+    def _serve_wsgi(self):
+        server = BenchmarkWSGIServer(('127.0.0.1', 0), QuietHandler)
+        server.set_app(WSGIHandler())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        return _Serving(
+            f'http://127.0.0.1:{server.server_port}/api/',
+            start=thread.start,
+            stop=lambda: (server.shutdown(), server.server_close()),
+        )
+
+    def _serve_asgi(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        server = uvicorn.Server(uvicorn.Config(
+            DiaryASGIHandler(), lifespan='off', log_level='warning', access_log=False, backlog=1024,
+        ))
+        thread = threading.Thread(target=lambda: asyncio.run(server.serve(sockets=[sock])), daemon=True)
+        # This process loaded the WSGI settings; run as diary_project.asgi would
+        conn_max_age = connection.settings_dict['CONN_MAX_AGE']
+
+        def start():
+            connection.settings_dict['CONN_MAX_AGE'] = 0
+            thread.start()
+
+        def stop():
+            server.should_exit = True
+            thread.join()
+            sock.close()
+            connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+        return _Serving(f'http://127.0.0.1:{sock.getsockname()[1]}/api/', start=start, stop=stop)
+
+
+class _Serving:
+    def __init__(self, base_url, start, stop):
+        self.base_url = base_url
+        self.start = start
+        self.stop = stop
+
+    def __enter__(self):
+        self.start()
+        return self.base_url
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,66 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from diary.models import Diary
+
+from ._benchmark import format_stats, isolated_database, measure, seed_diaries
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a scratch database with diaries and report per-user list '
+        'latency with and without the (user, created_at, id) index.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--entries', type=int, default=1_000_000)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--iterations', type=int, default=500)
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        iterations = options['iterations']
+
+        with isolated_database():
+            self.stdout.write(f'Seeding {options["entries"]} diaries across {options["users"]} users...')
+            user_ids = seed_diaries(options['users'], options['entries'], stdout=self.stdout)
+            index = next(i for i in Diary._meta.indexes if i.name == 'diary_user_created_idx')
+
+            def first_page():
+                user_id = random.choice(user_ids)
+                return list(Diary.objects.filter(user_id=user_id)[:page_size])
+
+            # Cursor positions halfway through each user's history
+            middles = {}
+            for user_id in user_ids:
+                qs = Diary.objects.filter(user_id=user_id).values_list('created_at', flat=True)
+                middles[user_id] = qs[qs.count() // 2]
+
+            def deep_page():
+                user_id = random.choice(user_ids)
+                qs = Diary.objects.filter(user_id=user_id, created_at__lt=middles[user_id])
+                return list(qs[:page_size])
+
+            with connection.schema_editor() as editor:
+                editor.remove_index(Diary, index)
+            self._analyze()
+            before = [measure(first_page, iterations), measure(deep_page, iterations)]
+
+            with connection.schema_editor() as editor:
+                editor.add_index(Diary, index)
+            self._analyze()
+            after = [measure(first_page, iterations), measure(deep_page, iterations)]
+
+        self.stdout.write('Without composite index:')
+        self.stdout.write('  ' + format_stats('first page', before[0]))
+        self.stdout.write('  ' + format_stats('cursor page (mid-history)', before[1]))
+        self.stdout.write('With composite index:')
+        self.stdout.write('  ' + format_stats('first page', after[0]))
+        self.stdout.write('  ' + format_stats('cursor page (mid-history)', after[1]))
+
+    def _analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
@@ -0,0 +1,67 @@
+import random
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from diary.models import Diary
+from diary.search import get_search_backend
+
+from ._benchmark import RARE_TERMS, WORDS, format_stats, isolated_database, measure, seed_diaries
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a scratch database with diaries and compare full-text search '
+        'latency against a naive case-insensitive substring scan.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--entries', type=int, default=1_000_000)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        iterations = options['iterations']
+
+        with isolated_database():
+            self.stdout.write(f'Seeding {options["entries"]} diaries across {options["users"]} users...')
+            user_ids = seed_diaries(options['users'], options['entries'], stdout=self.stdout)
+
+            # bulk_create bypasses the sync signals, so index in one pass
+            backend = get_search_backend()
+            with connection.cursor() as cursor:
+                backend.rebuild(cursor)
+
+            def common_terms():
+                return ' '.join(random.sample(WORDS, 2))
+
+            def rare_term():
+                return f'topic{random.randrange(RARE_TERMS)}'
+
+            def full_text(make_query):
+                def run():
+                    user = User(pk=random.choice(user_ids))
+                    return backend.search(user, make_query(), limit)
+                return run
+
+            def substring_scan(make_query):
+                def run():
+                    qs = Diary.objects.filter(user_id=random.choice(user_ids))
+                    for term in make_query().split():
+                        qs = qs.filter(Q(title__icontains=term) | Q(content__icontains=term))
+                    return list(qs[:limit])
+                return run
+
+            results = [
+                ('full-text, rare term', measure(full_text(rare_term), iterations)),
+                ('icontains, rare term', measure(substring_scan(rare_term), iterations)),
+                ('full-text, common terms', measure(full_text(common_terms), iterations)),
+                ('icontains, common terms', measure(substring_scan(common_terms), iterations)),
+            ]
+
+        for label, stats in results:
+            self.stdout.write(format_stats(label, stats))
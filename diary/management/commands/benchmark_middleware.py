@@ -0,0 +1,60 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from diary_project import settings as default_settings
+from diary_project import settings_api
+
+from ._benchmark import format_stats, isolated_database, measure, seed_diaries
+
+
+class Command(BaseCommand):
+    help = (
+        'Report per-request latency of token-authenticated diary requests '
+        'through the default middleware stack and through the API profile\'s '
+        'path-scoped stack (diary_project.settings_api).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--entries', type=int, default=10_000)
+        parser.add_argument('--iterations', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        profiles = (
+            ('default MIDDLEWARE', {'MIDDLEWARE': default_settings.MIDDLEWARE}),
+            ('settings_api MIDDLEWARE', {
+                'MIDDLEWARE': settings_api.MIDDLEWARE,
+                'DIARY_TOKEN_ONLY_PATHS': settings_api.DIARY_TOKEN_ONLY_PATHS,
+                'DIARY_BROWSER_MIDDLEWARE': settings_api.DIARY_BROWSER_MIDDLEWARE,
+            }),
+        )
+        results = []
+        with isolated_database(), override_settings(ALLOWED_HOSTS=['testserver']):
+            self.stdout.write(f'Seeding {options["entries"]} diaries across {options["users"]} users...')
+            user_ids = seed_diaries(options['users'], options['entries'])
+            Token.objects.bulk_create([Token(key=Token.generate_key(), user_id=user_id) for user_id in user_ids])
+            keys = list(Token.objects.values_list('key', flat=True))
+
+            for label, overrides in profiles:
+                with override_settings(**overrides):
+                    results.append((label, self._run(keys, options['iterations'])))
+
+        # Every request is a response cache hit, so the stacks are most of the difference
+        for label, stats in results:
+            self.stdout.write(format_stats(label, stats))
+        self.stdout.write(f'Saved per request (p50): {results[0][1]["p50"] - results[1][1]["p50"]:.3f}ms')
+
+    def _run(self, keys, iterations):
+        # A new client loads the middleware from the current settings
+        client = Client()
+
+        def list_page():
+            response = client.get('/api/diaries/', HTTP_AUTHORIZATION=f'Token {random.choice(keys)}')
+            assert response.status_code == 200, response.status_code
+
+        for key in keys:
+            client.get('/api/diaries/', HTTP_AUTHORIZATION=f'Token {key}')
+        return measure(list_page, iterations)
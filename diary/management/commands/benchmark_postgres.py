@@ -0,0 +1,111 @@
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from diary.models import Diary
+
+from ._benchmark import isolated_database, seed_diaries
+
+
+class Command(BaseCommand):
+    help = (
+        'Load the diary API from increasing numbers of worker threads against '
+        'a scratch copy of the configured PostgreSQL database (DIARY_DATABASE='
+        'postgresql) and report throughput, latency and how long workers '
+        'waited for a pooled connection.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per worker count.')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--entries', type=int, default=100_000)
+        parser.add_argument('--write-percent', type=float, default=10)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The default database is not PostgreSQL; set DIARY_DATABASE=postgresql.')
+        pool_options = connection.settings_dict['OPTIONS'].get('pool') or {}
+        self.stdout.write(
+            f'Connection pool: min_size={pool_options.get("min_size", 4)} '
+            f'max_size={pool_options.get("max_size", pool_options.get("min_size", 4))}'
+            if pool_options else 'No connection pool configured'
+        )
+
+        results = []
+        with isolated_database(), override_settings(ALLOWED_HOSTS=['testserver']):
+            self.stdout.write(f'Seeding {options["entries"]} diaries across {options["users"]} users...')
+            user_ids = seed_diaries(options['users'], options['entries'], stdout=self.stdout)
+            Token.objects.bulk_create([Token(key=Token.generate_key(), user_id=user_id) for user_id in user_ids])
+            users = [
+                (token.key, list(Diary.objects.filter(user_id=token.user_id).values_list('pk', flat=True)[:200]))
+                for token in Token.objects.filter(user_id__in=user_ids)
+            ]
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            connection.close()
+
+            for workers in options['workers']:
+                self.stdout.write(f'{workers} workers for {options["duration"]:g}s...')
+                results.append((workers, self._run(workers, users, options)))
+
+        for workers, stats in results:
+            self.stdout.write(
+                f'{workers:>3} workers  {stats["requests"] / options["duration"]:8.1f} req/s  '
+                f'p50={stats["p50"]:7.1f}ms  p99={stats["p99"]:7.1f}ms  '
+                f'pool waits={stats["pool_waits"]} ({stats["pool_wait_ms"]}ms)  errors={stats["errors"]}'
+            )
+
+    def _run(self, workers, users, options):
+        lock = threading.Lock()
+        latencies = []
+        errors = [0]
+        stop_at = time.perf_counter() + options['duration']
+        if connection.pool:
+            connection.pool.pop_stats()
+
+        def work(number):
+            token, diary_ids = users[number % len(users)]
+            client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+            try:
+                while time.perf_counter() < stop_at:
+                    roll = random.random() * 100
+                    start = time.perf_counter()
+                    if roll < options['write_percent']:
+                        response = client.post(
+                            '/api/diaries/', {'title': 'Benchmark', 'content': 'x' * 200},
+                            content_type='application/json',
+                        )
+                    elif roll < 50:
+                        response = client.get('/api/diaries/')
+                    else:
+                        response = client.get(f'/api/diaries/{random.choice(diary_ids)}/')
+                    # The test client keeps the connection; a real request hands it back to the pool
+                    close_old_connections()
+                    with lock:
+                        latencies.append((time.perf_counter() - start) * 1000)
+                        errors[0] += response.status_code >= 400
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=(number,)) for number in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        pool_stats = connection.pool.pop_stats() if connection.pool else {}
+        latencies.sort()
+        return {
+            'requests': len(latencies),
+            'p50': latencies[len(latencies) // 2] if latencies else 0,
+            'p99': latencies[int(len(latencies) * 0.99) - 1] if latencies else 0,
+            'pool_waits': pool_stats.get('requests_queued', 0),
+            'pool_wait_ms': pool_stats.get('requests_wait_ms', 0),
+            'errors': errors[0],
+        }
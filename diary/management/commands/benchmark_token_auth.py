@@ -0,0 +1,61 @@
+import random
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from diary.authentication import CachedTokenAuthentication, token_cache
+
+from ._benchmark import format_stats, isolated_database, measure, seed_diaries
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a scratch database and report diary list latency and queries '
+        'per request with DRF\'s TokenAuthentication and with the cached '
+        'CachedTokenAuthentication.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--entries', type=int, default=100_000)
+        parser.add_argument('--iterations', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        results = []
+        with isolated_database(), override_settings(ALLOWED_HOSTS=['testserver']):
+            self.stdout.write(f'Seeding {options["entries"]} diaries across {options["users"]} users...')
+            user_ids = seed_diaries(options['users'], options['entries'], stdout=self.stdout)
+            Token.objects.bulk_create([Token(key=Token.generate_key(), user_id=user_id) for user_id in user_ids])
+            keys = list(Token.objects.values_list('key', flat=True))
+
+            for authentication in (TokenAuthentication, CachedTokenAuthentication):
+                token_cache.clear()
+                # Views read the setting when they are defined, so swap the class in directly
+                with mock.patch.object(APIView, 'authentication_classes', [authentication]):
+                    results.append((authentication.__name__, *self._run(keys, options['iterations'])))
+
+        for label, stats, queries in results:
+            self.stdout.write(format_stats(label, stats) + f'  queries/request={queries:.2f}')
+
+    def _run(self, keys, iterations):
+        client = APIClient()
+
+        def list_page():
+            client.credentials(HTTP_AUTHORIZATION=f'Token {random.choice(keys)}')
+            response = client.get('/api/diaries/')
+            assert response.status_code == 200, response.status_code
+
+        # Fill the response and token caches, so only authentication differs
+        for key in keys:
+            client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+            client.get('/api/diaries/')
+        with CaptureQueriesContext(connection) as queries:
+            stats = measure(list_page, iterations)
+        return stats, len(queries) / iterations
@@ -0,0 +1,111 @@
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import tracemalloc
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from diary.models import Diary
+
+from ._benchmark import isolated_database
+
+BLOCK_SIZE = 1024 * 1024
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Upload a large attachment end to end (API client -> HTTP -> Django -> '
+        'storage) in one process, and fail if peak Python memory exceeds a cap. '
+        'Covers both the multipart create and the chunked upload API.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=500)
+        parser.add_argument('--max-memory-mb', type=int, default=32)
+
+    def handle(self, *args, **options):
+        # The client lives with the Flet app rather than in a package
+        sys.path.insert(0, str(settings.BASE_DIR / 'mobile'))
+        from api_client import AsyncDiaryApiClient
+
+        size = options['size_mb'] * 1024 * 1024
+        cap = options['max_memory_mb'] * 1024 * 1024
+
+        with tempfile.TemporaryDirectory() as scratch, isolated_database():
+            path = os.path.join(scratch, 'recording.wav')
+            self.stdout.write(f'Writing a {options["size_mb"]} MB test file...')
+            digest = hashlib.sha256()
+            with open(path, 'wb') as f:
+                for _ in range(size // BLOCK_SIZE):
+                    block = os.urandom(BLOCK_SIZE)
+                    digest.update(block)
+                    f.write(block)
+            sha256 = digest.hexdigest()
+
+            user = User.objects.create_user('bench-uploader')
+            token = Token.objects.create(user=user)
+
+            with override_settings(
+                ALLOWED_HOSTS=['127.0.0.1'],
+                MEDIA_ROOT=os.path.join(scratch, 'media'),
+                DIARY_UPLOAD_TEMP_DIR=os.path.join(scratch, 'partial'),
+            ):
+                server = make_server('127.0.0.1', 0, WSGIHandler(), server_class=WSGIServer, handler_class=QuietHandler)
+                thread = threading.Thread(target=server.serve_forever, daemon=True)
+                thread.start()
+                try:
+                    base_url = f'http://127.0.0.1:{server.server_port}/api/'
+                    results = asyncio.run(self._run(AsyncDiaryApiClient, base_url, token.key, path))
+                finally:
+                    server.shutdown()
+                    server.server_close()
+
+                failed = False
+                for label, diary_id, peak in results:
+                    diary = Diary.objects.get(pk=diary_id)
+                    ok = diary.file_size == size and diary.file_hash == sha256 and peak <= cap
+                    failed = failed or not ok
+                    self.stdout.write(
+                        f'{label:<20} peak={peak / 1024 / 1024:7.1f} MB  '
+                        f'stored={diary.file_size / 1024 / 1024:7.1f} MB  checksum={"ok" if diary.file_hash == sha256 else "BAD"}'
+                    )
+
+        if failed:
+            raise CommandError(f'An upload was corrupted or exceeded {options["max_memory_mb"]} MB of memory')
+        self.stdout.write(self.style.SUCCESS(f'Both uploads stayed under {options["max_memory_mb"]} MB'))
+
+    async def _run(self, client_class, base_url, token, path):
+        api = client_class(base_url, timeout=(5, 600))
+        api.set_token(token)
+        results = []
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            with open(path, 'rb') as f:
+                response = await api.create_diary({'title': 'multipart', 'content': 'x'}, {'file': f})
+            response.raise_for_status()
+            results.append(('multipart create', response.json()['id'], tracemalloc.get_traced_memory()[1]))
+
+            tracemalloc.reset_peak()
+            upload_id = await api.upload_file(path)
+            response = await api.create_diary({'title': 'chunked', 'content': 'x', 'upload': upload_id})
+            response.raise_for_status()
+            results.append(('chunked upload', response.json()['id'], tracemalloc.get_traced_memory()[1]))
+        finally:
+            tracemalloc.stop()
+            await api.close()
+        return results
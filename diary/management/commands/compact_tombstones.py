@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from diary.sync import compact_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete diary tombstones older than DIARY_TOMBSTONE_RETENTION_DAYS. '
+        'Run periodically, e.g. daily from cron.'
+    )
+
+    def handle(self, *args, **options):
+        removed = compact_tombstones()
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {removed} tombstones older than {settings.DIARY_TOMBSTONE_RETENTION_DAYS} days'
+        ))
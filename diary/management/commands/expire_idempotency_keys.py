@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from diary.idempotency import expire_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete Idempotency-Key records older than DIARY_IDEMPOTENCY_KEY_RETENTION_HOURS. '
+        'Run periodically, e.g. daily from cron.'
+    )
+
+    def handle(self, *args, **options):
+        removed = expire_idempotency_keys()
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {removed} idempotency keys older than {settings.DIARY_IDEMPOTENCY_KEY_RETENTION_HOURS} hours'
+        ))
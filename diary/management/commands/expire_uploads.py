@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from diary.uploads import expire_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        'Discard chunked uploads (and their partial files) older than DIARY_UPLOAD_RETENTION_HOURS. '
+        'Run periodically, e.g. daily from cron.'
+    )
+
+    def handle(self, *args, **options):
+        removed = expire_uploads()
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {removed} uploads older than {settings.DIARY_UPLOAD_RETENTION_HOURS} hours'
+        ))
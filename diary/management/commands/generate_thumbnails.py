@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from diary.models import Diary
+from diary.thumbnails import generate_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Make thumbnails for image attachments that do not have one yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # A FileField saves "no file" as an empty name rather than NULL
+        queryset = Diary.objects.filter(
+            Q(thumbnail__isnull=True) | Q(thumbnail=''), file_type='image',
+        ).order_by('pk')
+
+        made = skipped = 0
+        for diary in queryset.defer('content').iterator(chunk_size=options['batch_size']):
+            try:
+                ok = generate_thumbnail(diary)
+            except FileNotFoundError:
+                ok = False
+                self.stderr.write(f'Diary {diary.pk}: file {diary.file.name} is missing from storage')
+            if ok:
+                made += 1
+            else:
+                skipped += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Made {made} thumbnails ({skipped} unreadable or missing images)'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from diary.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the diary full-text search index from the diary table.'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        with transaction.atomic(), connection.cursor() as cursor:
+            backend.create(cursor)
+            backend.rebuild(cursor)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search index ({connection.vendor})'))
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from diary.tasks import start_runner
+
+
+class Command(BaseCommand):
+    help = 'Run background tasks (thumbnails and other media processing) until interrupted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=max(settings.DIARY_TASK_WORKERS, 1),
+            help='Number of worker threads; run several processes to use more cores.',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once no task is due, instead of waiting for more.',
+        )
+
+    def handle(self, *args, **options):
+        runner = start_runner(options['workers'], burst=options['burst'])
+        self.stdout.write(f'Running tasks with {options["workers"]} workers')
+        try:
+            runner.join()
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping once running tasks finish...')
+            runner.stop()
+        self.stdout.write(self.style.SUCCESS('Stopped'))
@@ -0,0 +1,119 @@
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, transaction
+
+from diary.models import Diary
+
+from ._benchmark import isolated_database, seed_diaries
+
+SETTINGS_KEYS = ('OPTIONS', 'CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')
+
+# What the project used before SQLite was tuned. journal_mode is set
+# explicitly because WAL, once on, persists in the database file.
+SQLITE_DEFAULTS = {
+    'OPTIONS': {'init_command': 'PRAGMA journal_mode=DELETE'},
+    'CONN_MAX_AGE': 0,
+    'CONN_HEALTH_CHECKS': False,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent readers and writers against a scratch SQLite database, '
+        'first with sqlite3\'s defaults and then with the configured DATABASES '
+        'options, and report throughput, write latency and "database is '
+        'locked" errors. Each operation ends like a request does, so '
+        'connections are only reused where CONN_MAX_AGE allows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per configuration.')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--entries', type=int, default=20_000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The default database is not SQLite.')
+        configured = {key: connection.settings_dict.get(key) for key in SETTINGS_KEYS}
+
+        results = []
+        with isolated_database(on_disk=True):
+            self.stdout.write(f'Seeding {options["entries"]} diaries across {options["users"]} users...')
+            user_ids = seed_diaries(options['users'], options['entries'])
+            try:
+                for label, profile in (('sqlite3 defaults', SQLITE_DEFAULTS), ('configured', configured)):
+                    self.stdout.write(
+                        f'{label}: {options["readers"]} readers, {options["writers"]} writers '
+                        f'for {options["duration"]:g}s...'
+                    )
+                    results.append((label, self._run(profile, user_ids, options)))
+            finally:
+                connection.close()
+                connection.settings_dict.update(configured)
+
+        for label, stats in results:
+            self.stdout.write(
+                f'{label:<18} reads={stats["reads"] / options["duration"]:8.1f}/s  '
+                f'writes={stats["writes"] / options["duration"]:7.1f}/s  '
+                f'write p99={stats["write_p99"]:8.1f}ms  locked errors={stats["locked"]}'
+            )
+
+    def _run(self, profile, user_ids, options):
+        # Connections opened from here on, in every thread, use the profile
+        connection.close()
+        connection.settings_dict.update(profile)
+        # Apply the journal mode while this is the only connection
+        connection.ensure_connection()
+
+        lock = threading.Lock()
+        stats = {'reads': 0, 'writes': 0, 'locked': 0}
+        write_latencies = []
+        stop_at = time.perf_counter() + options['duration']
+
+        def work(kind, operation):
+            try:
+                while time.perf_counter() < stop_at:
+                    user_id = random.choice(user_ids)
+                    start = time.perf_counter()
+                    try:
+                        operation(user_id)
+                    except OperationalError as exc:
+                        if 'locked' not in str(exc):
+                            raise
+                        with lock:
+                            stats['locked'] += 1
+                        continue
+                    finally:
+                        # What the request_finished signal does
+                        close_old_connections()
+                    with lock:
+                        stats[kind] += 1
+                        if kind == 'writes':
+                            write_latencies.append((time.perf_counter() - start) * 1000)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=('reads', self._read)) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=work, args=('writes', self._write)) for _ in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        write_latencies.sort()
+        stats['write_p99'] = write_latencies[int(len(write_latencies) * 0.99) - 1] if write_latencies else 0
+        return stats
+
+    def _read(self, user_id):
+        list(Diary.objects.filter(user_id=user_id)[:20])
+
+    def _write(self, user_id):
+        # Read, then write, in one transaction, as an Idempotency-Key create does
+        with transaction.atomic():
+            Diary.objects.filter(user_id=user_id).exists()
+            Diary.objects.create(user_id=user_id, title='Stress test', content='x' * 200)
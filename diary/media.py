@@ -0,0 +1,175 @@
+"""
+Serving attachments and thumbnails to their owners.
+
+Files are no longer exposed under MEDIA_URL. They are served by
+``DiaryMediaView`` at URLs that carry an expiry and a signature of it,
+the diary, the kind of file and the attachment's hash. Players and image
+widgets cannot send an ``Authorization`` header, but they can fetch a URL
+the API handed out. Such a URL is a capability: anyone holding it can
+fetch the file until it expires. Requests authenticated as the owner need
+no signature.
+
+Expiries are rounded to DIARY_MEDIA_URL_LIFETIME, so URLs stay the same
+within one such window (and responses, which embed them, stay cacheable)
+and are valid for one to two windows after they were handed out. The
+diary ETags include the window, so clients revalidating a list get fresh
+URLs once it rolls over.
+
+Responses carry an ``ETag`` (from the hash) and ``Last-Modified``, and
+answer ``If-None-Match``/``If-Modified-Since`` with 304. A single
+``Range`` gets a 206 so audio can seek without downloading the whole file.
+Whole files go out through ``FileResponse``, which lets the WSGI server
+use sendfile. Behind nginx, setting DIARY_MEDIA_ACCEL_REDIRECT hands the
+transfer to nginx (``X-Accel-Redirect``) once access has been checked.
+"""
+import os
+import re
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+SIGNATURE_PARAM = 'sig'
+EXPIRES_PARAM = 'exp'
+MEDIA_KINDS = ('file', 'thumbnail')
+# Browsers and media players cache the response privately; the URL
+# changes whenever the file does
+CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+_range_re = re.compile(r'^bytes=(\d*)-(\d*)$')
+_signer = signing.Signer(salt='diary.media')
+
+
+def media_url_window():
+    """Number of the current DIARY_MEDIA_URL_LIFETIME window; media URLs change with it"""
+    return int(time.time()) // settings.DIARY_MEDIA_URL_LIFETIME
+
+
+def _signature(diary, kind, expires):
+    return _signer.signature(f'{diary.pk}:{kind}:{diary.file_hash}:{expires}')
+
+
+def media_url(diary, kind):
+    """Signed URL of a diary's attachment or thumbnail, or None if it has none"""
+    field = getattr(diary, kind)
+    if not field:
+        return None
+    path = reverse(f'diary-{kind}', kwargs={'pk': diary.pk, 'name': os.path.basename(field.name)})
+    expires = (media_url_window() + 2) * settings.DIARY_MEDIA_URL_LIFETIME
+    return f'{path}?{EXPIRES_PARAM}={expires}&{SIGNATURE_PARAM}={_signature(diary, kind, expires)}'
+
+
+def has_valid_signature(request, diary, kind):
+    signature = request.GET.get(SIGNATURE_PARAM)
+    expires = request.GET.get(EXPIRES_PARAM, '')
+    if not signature or not expires.isdigit() or int(expires) <= time.time():
+        return False
+    return constant_time_compare(signature, _signature(diary, kind, int(expires)))
+
+
+def media_etag(diary, kind):
+    return quote_etag(diary.file_hash if kind == 'file' else f'{diary.file_hash}-{kind}')
+
+
+class FileRange:
+    """Read-only view of ``length`` bytes of an open file, starting at ``start``"""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+class MediaResponse(FileResponse):
+    block_size = 64 * 1024
+
+
+def parse_range(header, size):
+    """
+    Return ``(start, end)`` (inclusive) for a single-range ``Range`` header,
+    None to ignore the header, or raise ValueError if it cannot be satisfied.
+    """
+    match = _range_re.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # Multiple ranges, other units or nonsense: serve the whole file
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def serve(request, diary, kind):
+    """Response for a diary's attachment or thumbnail; access must already be checked"""
+    field = getattr(diary, kind)
+    storage = field.storage
+    size = field.size
+    etag = media_etag(diary, kind)
+    last_modified = int(storage.get_modified_time(field.name).timestamp())
+    content_type = diary.mime_type if kind == 'file' else 'image/webp'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, field, size, etag, last_modified, content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = CACHE_CONTROL
+    return response
+
+
+def _file_response(request, field, size, etag, last_modified, content_type):
+    if settings.DIARY_MEDIA_ACCEL_REDIRECT:
+        # nginx serves the file, handling Range itself, with zero copies
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.DIARY_MEDIA_ACCEL_REDIRECT + field.name
+        return response
+
+    byte_range = None
+    if request.headers.get('Range') and _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers['Range'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = field.storage.open(field.name, 'rb')
+    if byte_range is None:
+        response = MediaResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = MediaResponse(FileRange(file, start, end - start + 1), content_type=content_type, status=206)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _if_range_matches(request, etag, last_modified):
+    # A range of a file that changed since the client's copy would be garbage
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
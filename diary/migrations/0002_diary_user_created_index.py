@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='diary',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='diary',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='diary_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0002_diary_user_created_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diary',
+            name='file_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='diary',
+            name='file_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='diary',
+            name='file_type',
+            field=models.CharField(blank=True, choices=[('image', 'Image'), ('audio', 'Audio'), ('other', 'Other')], max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='diary',
+            name='mime_type',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='diary',
+            index=models.Index(fields=['user', 'file_type'], name='diary_user_file_type_idx'),
+        ),
+    ]
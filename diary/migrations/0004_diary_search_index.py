@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from diary.search import get_search_backend
+
+    backend = get_search_backend(schema_editor.connection)
+    with schema_editor.connection.cursor() as cursor:
+        backend.create(cursor)
+        backend.rebuild(cursor)
+
+
+def drop_search_index(apps, schema_editor):
+    from diary.search import get_search_backend
+
+    with schema_editor.connection.cursor() as cursor:
+        get_search_backend(schema_editor.connection).drop(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0003_diary_file_metadata'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0004_diary_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='diary',
+            index=models.Index(fields=['user', 'updated_at'], name='diary_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0008_chunked_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diary',
+            name='thumbnail',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to='thumbnails/'),
+        ),
+    ]
@@ -1,16 +1,194 @@
+import hashlib
+import mimetypes
+import os
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
+AUDIO_EXTENSIONS = ['.mp3', '.wav', '.ogg', '.m4a']
+
+
+def classify_file(name):
+    """Map a file name to one of the ``Diary.FILE_TYPE_CHOICES`` values"""
+    ext = os.path.splitext(name)[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        return 'image'
+    elif ext in AUDIO_EXTENSIONS:
+        return 'audio'
+    return 'other'
+
+
 # Create your models here.
 class Diary(models.Model):
+    FILE_TYPE_CHOICES = [
+        ('image', 'Image'),
+        ('audio', 'Audio'),
+        ('other', 'Other'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     content = models.TextField()
     file = models.FileField(upload_to='diaries/', blank=True, null=True)
+    # Attachment metadata, captured once when the file is uploaded
+    file_type = models.CharField(max_length=10, choices=FILE_TYPE_CHOICES, blank=True, null=True)
+    file_size = models.PositiveBigIntegerField(blank=True, null=True)
+    mime_type = models.CharField(max_length=100, blank=True, null=True)
+    file_hash = models.CharField(max_length=64, blank=True, null=True)
+    # Small WebP rendition of an image attachment, generated in the background
+    thumbnail = models.FileField(upload_to='thumbnails/', blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Serves the per-user listing and its cursor pagination as a
+            # single index range scan, already in display order.
+            models.Index(fields=['user', '-created_at', '-id'], name='diary_user_created_idx'),
+            models.Index(fields=['user', 'file_type'], name='diary_user_file_type_idx'),
+            # Lets change detection read max(updated_at) from the index alone
+            models.Index(fields=['user', 'updated_at'], name='diary_user_updated_idx'),
+        ]
     
     def __str__(self):
         return self.title 
-    
-    
\ No newline at end of file
+
+    def save(self, *args, **kwargs):
+        # A freshly uploaded file has not been committed to storage yet
+        if not self.file or not self.file._committed:
+            self.refresh_file_metadata()
+            # Made from the previous file, if any; a new one is queued after saving
+            self.thumbnail = None
+        super().save(*args, **kwargs)
+
+    def refresh_file_metadata(self):
+        """Populate the ``file_*`` and ``mime_type`` columns from ``file``"""
+        if not self.file:
+            self.file_type = self.file_size = self.mime_type = self.file_hash = None
+            return
+
+        # Uploads are hashed as they are received (see diary.uploads)
+        self.file_hash = getattr(self.file.file, 'sha256', None)
+        if self.file_hash is None:
+            digest = hashlib.sha256()
+            for chunk in self.file.chunks():
+                digest.update(chunk)
+            self.file_hash = digest.hexdigest()
+
+        self.file_size = self.file.size
+        self.file_type = classify_file(self.file.name)
+        self.mime_type = (
+            mimetypes.guess_type(self.file.name)[0]
+            or getattr(self.file.file, 'content_type', None)
+            or 'application/octet-stream'
+        )
+        if self.file._committed:
+            self.file.close()
+
+
+class DiaryTombstone(models.Model):
+    """Record of a deleted diary, kept so delta sync can report deletions"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    diary_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+            # Compaction deletes by age across all users
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f'Deleted diary {self.diary_id}'
+
+
+class IdempotencyKey(models.Model):
+    """
+    Outcome of a create request sent with an ``Idempotency-Key`` header,
+    replayed to any retry of that request instead of creating again
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key_uniq'),
+        ]
+        indexes = [
+            # Expiry deletes by age across all users
+            models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'Idempotency key {self.key}'
+
+
+class ChunkedUpload(models.Model):
+    """
+    An attachment being uploaded in chunks, see ``diary.uploads``.
+
+    Bytes are appended to a temporary file until ``offset`` reaches
+    ``size``; the upload is then completed by checking the file against
+    ``sha256`` and can be attached to a diary by its id.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    offset = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Resuming looks an upload up by its content
+            models.Index(fields=['user', 'sha256'], name='upload_user_sha256_idx'),
+            models.Index(fields=['created_at'], name='upload_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'Upload of {self.filename}'
+
+
+class BackgroundTask(models.Model):
+    """
+    A call to a ``diary.tasks`` task, run after the request that queued it.
+
+    Claimed by a worker for ``locked_until``; a task whose worker died is
+    claimed again once that passes. Succeeded tasks are deleted, failed
+    ones are kept with their error.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField()
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Workers take the oldest due task
+            models.Index(fields=['status', 'run_after'], name='task_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
@@ -0,0 +1,117 @@
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class DiaryCursorPagination(CursorPagination):
+    """
+    Keyset pagination over a user's diaries, newest first.
+
+    The cursor encodes a position on ``(created_at, id)``, and a page is the
+    rows strictly after it, so fetching a page never needs an OFFSET scan no
+    matter how long the user's history is, and entries created in the same
+    instant are neither skipped nor repeated. The default page size comes
+    from ``REST_FRAMEWORK['PAGE_SIZE']`` and clients may ask for a different
+    one with ``?page_size=``.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self._set_page(list(self._page_queryset(queryset, request)))
+        # Display page controls in the browsable API if there is more than one page
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        ``paginate_queryset`` for async views: the page is fetched with the
+        async ORM; cursors and links are the same as the sync version's.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        self._set_page([diary async for diary in self._page_queryset(queryset, request)])
+        return self.page
+
+    def _page_queryset(self, queryset, request):
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*[
+                field[1:] if field.startswith('-') else '-' + field for field in self.ordering
+            ])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(self._after(current_position, reverse))
+
+        # Positions are unique, so DRF's offset is always 0 in cursors we issue.
+        # One extra row tells whether another page follows.
+        return queryset[offset:offset + self.page_size + 1]
+
+    def _after(self, position, reverse):
+        try:
+            created_at, pk = position.rsplit('|', 1)
+            created_at, pk = datetime.fromisoformat(created_at), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        # The ordering is descending, so a forward cursor continues below its position
+        lookup = 'gt' if reverse else 'lt'
+        # The redundant bound keeps this a single range on the listing index
+        return Q(**{f'created_at__{lookup}e': created_at}) & (
+            Q(**{f'created_at__{lookup}': created_at}) | Q(created_at=created_at, **{f'id__{lookup}': pk})
+        )
+
+    def _set_page(self, results):
+        (offset, reverse, current_position) = self.cursor or (0, False, None)
+        self.page = results[:self.page_size]
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            return f'{instance["created_at"].isoformat()}|{instance["id"]}'
+        return f'{instance.created_at.isoformat()}|{instance.pk}'
+
+    def get_paginated_data(self, data):
+        """The body ``get_paginated_response`` would return"""
+        return {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
@@ -0,0 +1,157 @@
+"""
+Full-text search over diary titles and content.
+
+SQLite deployments keep a standalone FTS5 table, ``diary_diary_fts``,
+whose rowid is the diary id; it is kept in sync by the signal handlers in
+``diary.signals``. The owner is indexed as a ``u<user id>`` token so the
+per-user restriction is part of the full-text match itself.
+
+PostgreSQL deployments search a weighted ``tsvector`` expression backed
+by a GIN index, which the database maintains itself. Both backends rank
+results so that higher ``rank`` means a better match.
+"""
+from django.db import connection
+
+from .models import Diary
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+
+FTS_TABLE = 'diary_diary_fts'
+PG_INDEX = 'diary_search_idx'
+PG_CONFIG = 'english'
+PG_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(diary_diary.title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(diary_diary.content, '')), 'B')"
+)
+
+
+class SQLiteSearchBackend:
+    # The FTS table is a copy of the indexed columns, so it needs syncing
+    needs_sync = True
+
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5(title, content, owner, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def drop(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+    def rebuild(self, cursor):
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, content, owner) "
+            f"SELECT id, title, content, 'u' || user_id FROM diary_diary"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+    def index(self, cursor, diary):
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {FTS_TABLE}(rowid, title, content, owner) VALUES (%s, %s, %s, %s)',
+            [diary.pk, diary.title, diary.content, f'u{diary.user_id}'],
+        )
+
+    def remove(self, cursor, diary_id):
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [diary_id])
+
+    def search(self, user, query, limit):
+        match = self.to_match_expression(query)
+        if not match:
+            return []
+        match = f'owner : "u{user.pk}" AND {{title content}} : ({match})'
+        return list(Diary.objects.raw(
+            f"SELECT diary_diary.id, diary_diary.title, diary_diary.file, diary_diary.file_type, "
+            f"diary_diary.file_hash, diary_diary.thumbnail, "
+            f"diary_diary.created_at, diary_diary.updated_at, "
+            f"highlight({FTS_TABLE}, 0, %s, %s) AS highlighted_title, "
+            f"snippet({FTS_TABLE}, 1, %s, %s, '...', 24) AS snippet, "
+            f"-bm25({FTS_TABLE}, 10.0, 1.0, 0.0) AS rank "
+            f"FROM {FTS_TABLE} JOIN diary_diary ON diary_diary.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND diary_diary.user_id = %s "
+            f"ORDER BY rank DESC LIMIT %s",
+            [HIGHLIGHT_START, HIGHLIGHT_END, HIGHLIGHT_START, HIGHLIGHT_END, match, user.pk, limit],
+        ))
+
+    @staticmethod
+    def to_match_expression(query):
+        """
+        Turn free text into an FTS5 expression that cannot be a syntax error.
+
+        Every term is quoted, so operators and punctuation typed by the user
+        are matched literally, and the last term also matches as a prefix
+        so results appear while a word is still being typed.
+        """
+        terms = ['"%s"' % term.replace('"', '""') for term in query.split()]
+        if terms:
+            terms[-1] += '*'
+        return ' '.join(terms)
+
+
+class PostgresSearchBackend:
+    # The GIN expression index is maintained by PostgreSQL itself
+    needs_sync = False
+
+    def create(self, cursor):
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {PG_INDEX} ON diary_diary USING GIN (({PG_VECTOR}))')
+
+    def drop(self, cursor):
+        cursor.execute(f'DROP INDEX IF EXISTS {PG_INDEX}')
+
+    def rebuild(self, cursor):
+        cursor.execute(f'REINDEX INDEX {PG_INDEX}')
+
+    def index(self, cursor, diary):
+        pass
+
+    def remove(self, cursor, diary_id):
+        pass
+
+    def search(self, user, query, limit):
+        terms = query.split()
+        if not terms:
+            return []
+        headline_options = f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}'
+        return list(Diary.objects.raw(
+            f"SELECT diary_diary.id, diary_diary.title, diary_diary.file, diary_diary.file_type, "
+            f"diary_diary.file_hash, diary_diary.thumbnail, "
+            f"diary_diary.created_at, diary_diary.updated_at, "
+            f"ts_headline('{PG_CONFIG}', diary_diary.title, q, %s) AS highlighted_title, "
+            f"ts_headline('{PG_CONFIG}', diary_diary.content, q, %s) AS snippet, "
+            f"ts_rank({PG_VECTOR}, q) AS rank "
+            f"FROM diary_diary, (SELECT websearch_to_tsquery('{PG_CONFIG}', %s) "
+            f"&& to_tsquery('{PG_CONFIG}', %s) AS q) AS query "
+            f"WHERE diary_diary.user_id = %s AND ({PG_VECTOR}) @@ q "
+            f"ORDER BY rank DESC LIMIT %s",
+            [
+                headline_options + ', HighlightAll=true',
+                headline_options + ', MaxWords=24, MinWords=12',
+                ' '.join(terms[:-1]), self.to_prefix_query(terms[-1]), user.pk, limit,
+            ],
+        ))
+
+    @staticmethod
+    def to_prefix_query(term):
+        """
+        A ``to_tsquery`` expression matching words that start with ``term``.
+
+        Matches results while the last word is still being typed, as the
+        SQLite backend does. The term is quoted, so it is matched literally.
+        """
+        return "'%s':*" % term.replace('\\', '\\\\').replace("'", "''")
+
+
+def get_search_backend(conn=None):
+    """Return the search backend matching the database vendor"""
+    vendor = (conn or connection).vendor
+    if vendor == 'postgresql':
+        return PostgresSearchBackend()
+    if vendor == 'sqlite':
+        return SQLiteSearchBackend()
+    raise NotImplementedError(f'Full-text search is not supported on {vendor}')
+
+
+def search_diaries(user, query, limit=20):
+    """Return the user's diaries matching ``query``, best match first"""
+    return get_search_backend().search(user, query, limit)
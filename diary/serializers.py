@@ -1,29 +1,136 @@
-from rest_framework import serializers
-from .models import Diary
 import os
 
+from django.conf import settings
+from rest_framework import serializers
+from .media import media_url
+from .models import ChunkedUpload, Diary
+from .uploads import discard_upload, open_upload
+
+# Number of content characters returned as ``preview`` by list endpoints
+PREVIEW_LENGTH = 100
+
 class DiarySerializer(serializers.ModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
     file_url = serializers.SerializerMethodField()
-    file_type = serializers.SerializerMethodField()
+    # Null until the background worker has made it, and for non-images
+    thumbnail_url = serializers.SerializerMethodField()
+    # Id of a completed chunked upload to attach instead of sending ``file``
+    upload = serializers.UUIDField(write_only=True, required=False)
     
     class Meta:
         model = Diary
-        fields = ['id', 'user', 'title', 'content', 'file', 'file_url', 'file_type', 'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at', 'file_url', 'file_type']
+        fields = [
+            'id', 'user', 'title', 'content', 'file', 'upload', 'file_url', 'thumbnail_url',
+            'file_type', 'file_size', 'mime_type', 'file_hash', 'created_at', 'updated_at',
+        ]
+        read_only_fields = [
+            'created_at', 'updated_at', 'file_url', 'thumbnail_url', 'file_type',
+            'file_size', 'mime_type', 'file_hash',
+        ]
+        # Read back through the signed ``file_url``; storage paths are not served
+        extra_kwargs = {'file': {'write_only': True}}
     
     def get_file_url(self, obj):
-        if obj.file:
-            return obj.file.url
-        return None
-    
-    def get_file_type(self, obj):
-        if obj.file:
-            ext = os.path.splitext(obj.file.name)[1].lower()
-            if ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']:
-                return 'image'
-            elif ext in ['.mp3', '.wav', '.ogg', '.m4a']:
-                return 'audio'
-            else:
-                return 'other'
-        return None
\ No newline at end of file
+        return media_url(obj, 'file')
+
+    def get_thumbnail_url(self, obj):
+        return media_url(obj, 'thumbnail')
+
+    def validate_upload(self, value):
+        upload = ChunkedUpload.objects.filter(
+            pk=value, user=self.context['request'].user, completed_at__isnull=False,
+        ).first()
+        if upload is None:
+            raise serializers.ValidationError('No completed upload with this id.')
+        return upload
+
+    def create(self, validated_data):
+        return self._save_with_upload(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self._save_with_upload(lambda data: super(DiarySerializer, self).update(instance, data), validated_data)
+
+    def _save_with_upload(self, save, validated_data):
+        upload = validated_data.pop('upload', None)
+        if upload is None:
+            return save(validated_data)
+        # Moved (or streamed) into storage, never read into memory whole
+        with open_upload(upload) as file:
+            validated_data['file'] = file
+            diary = save(validated_data)
+        discard_upload(upload)
+        return diary
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    chunk_size = serializers.SerializerMethodField()
+    completed = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ['id', 'filename', 'size', 'sha256', 'offset', 'chunk_size', 'completed', 'created_at']
+        read_only_fields = ['id', 'offset', 'created_at']
+
+    def get_chunk_size(self, obj):
+        return settings.DIARY_UPLOAD_CHUNK_SIZE
+
+    def get_completed(self, obj):
+        return obj.completed_at is not None
+
+    def validate_filename(self, value):
+        return os.path.basename(value)
+
+    def validate_size(self, value):
+        if value > settings.DIARY_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f'Files may be at most {settings.DIARY_UPLOAD_MAX_SIZE} bytes.')
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if len(value) != 64 or any(c not in '0123456789abcdef' for c in value):
+            raise serializers.ValidationError('Expected a hex SHA-256 digest.')
+        return value
+
+
+class DiaryListSerializer(DiarySerializer):
+    """
+    Compact representation used by the list endpoint.
+
+    Returns a short ``preview`` instead of the full ``content``; the view
+    annotates it in SQL as ``content_preview`` and defers ``content`` so
+    the body of long entries is never loaded for a listing.
+    """
+    preview = serializers.SerializerMethodField()
+
+    class Meta(DiarySerializer.Meta):
+        fields = [
+            'id', 'title', 'preview', 'file_url', 'thumbnail_url', 'file_type', 'file_size',
+            'created_at', 'updated_at',
+        ]
+        read_only_fields = fields
+
+    def get_preview(self, obj):
+        # The annotation carries one extra character so truncation is detectable
+        preview = obj.content_preview
+        if len(preview) > PREVIEW_LENGTH:
+            return preview[:PREVIEW_LENGTH] + '...'
+        return preview
+
+
+class DiarySearchSerializer(DiarySerializer):
+    """
+    Search hit with highlighted title, content snippet and relevance.
+
+    Matched terms are wrapped in ``<mark>``/``</mark>`` by the search
+    backend; ``rank`` is higher for better matches.
+    """
+    highlighted_title = serializers.CharField(read_only=True)
+    snippet = serializers.CharField(read_only=True)
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta(DiarySerializer.Meta):
+        fields = [
+            'id', 'title', 'highlighted_title', 'snippet', 'rank',
+            'file_url', 'thumbnail_url', 'file_type', 'created_at', 'updated_at',
+        ]
+        read_only_fields = fields
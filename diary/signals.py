@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .models import Diary
+from .search import get_search_backend
+from .thumbnails import queue_thumbnail
+
+SEARCHABLE_FIELDS = {'title', 'content'}
+
+
+@receiver(post_save, sender=Diary)
+def index_diary(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCHABLE_FIELDS.intersection(update_fields):
+        return
+    backend = get_search_backend()
+    if backend.needs_sync:
+        with connection.cursor() as cursor:
+            backend.index(cursor, instance)
+
+
+@receiver(post_delete, sender=Diary)
+def unindex_diary(sender, instance, **kwargs):
+    backend = get_search_backend()
+    if backend.needs_sync:
+        with connection.cursor() as cursor:
+            backend.remove(cursor, instance.pk)
+
+
+@receiver(post_save, sender=Diary)
+def thumbnail_image(sender, instance, update_fields=None, **kwargs):
+    # Also catches a thumbnail that a concurrent save overwrote with None
+    if instance.file_type != 'image' or instance.thumbnail:
+        return
+    if update_fields is not None and 'file' not in update_fields:
+        return
+    # Queued in the saving transaction, so it runs only if the save commits
+    queue_thumbnail(instance)
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    # dj_rest_auth's LogoutView deletes the user's token
+    token_cache.discard(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def forget_user_tokens(sender, instance, **kwargs):
+    # A deactivated user must stop authenticating straight away
+    token_cache.discard_user(instance.pk)
@@ -0,0 +1,52 @@
+"""
+Delta sync support: opaque sync tokens and tombstone compaction.
+
+A sync token encodes the server time at which a client last synced. The
+changes endpoint returns every diary updated, and every tombstone recorded,
+since that moment minus ``SYNC_OVERLAP``; the overlap covers writes that
+were in flight when the token was issued, and clients apply changes
+idempotently so seeing an entry twice is harmless.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import DiaryTombstone
+
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def encode_sync_token(moment):
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def decode_sync_token(token):
+    """
+    Return the moment a sync token was issued at.
+
+    Raises InvalidSyncToken for anything this server could not have issued,
+    including moments in the future (beyond SYNC_OVERLAP of clock skew).
+    """
+    try:
+        moment = datetime.fromtimestamp(int(token) / 1_000_000, tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise InvalidSyncToken(f'Invalid sync token: {token!r}')
+    if moment > timezone.now() + SYNC_OVERLAP:
+        raise InvalidSyncToken(f'Sync token is in the future: {token!r}')
+    return moment
+
+
+def tombstone_horizon():
+    """Oldest moment for which deletions are still on record"""
+    return timezone.now() - timedelta(days=settings.DIARY_TOMBSTONE_RETENTION_DAYS)
+
+
+def compact_tombstones():
+    """Drop tombstones past the retention window; returns the number removed"""
+    deleted, _ = DiaryTombstone.objects.filter(deleted_at__lt=tombstone_horizon()).delete()
+    return deleted
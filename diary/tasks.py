@@ -0,0 +1,234 @@
+"""
+Background tasks without a broker: a job table and worker threads.
+
+A task is a function registered with ``@task``. Calling its ``enqueue``
+stores a ``BackgroundTask`` row in the caller's transaction, so the task
+is queued exactly when the write that needs it commits, and survives
+restarts until it has run. Workers claim due rows with a conditional
+UPDATE, which is atomic on SQLite as on any other database, so threads
+and processes can share the table freely.
+
+Each web process starts DIARY_TASK_WORKERS threads on its first enqueue.
+Dedicated workers run ``manage.py run_tasks``; with those in place,
+DIARY_TASK_WORKERS can be 0 to keep task work out of the web processes.
+
+A task that raises is retried with exponential backoff until it has run
+``max_attempts`` times, then left as failed with its traceback.
+``concurrency`` caps how many calls of one task run at once across all
+workers. Task functions must live in modules imported at startup (e.g.
+from ``diary.signals``) so that every worker knows them.
+"""
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.models import Count, F, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import LessThan
+from django.utils import timezone
+
+from .models import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+# Due tasks looked at per claim, in case others claim the first few first
+CLAIM_BATCH = 10
+
+_registry = {}
+_runner = None
+_runner_lock = threading.Lock()
+
+
+class Task:
+    """A registered task function; ``enqueue(**kwargs)`` runs it in the background"""
+
+    def __init__(self, func, name, max_attempts, retry_delay, concurrency):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.concurrency = concurrency
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def enqueue(self, **kwargs):
+        return enqueue(self.name, **kwargs)
+
+
+def task(name=None, max_attempts=3, retry_delay=30, concurrency=None):
+    """
+    Register a function as a task.
+
+    Its keyword arguments are stored as JSON. It is retried ``retry_delay``,
+    then twice that, ... seconds after raising, and at most ``concurrency``
+    calls of it run at once (no limit if None).
+    """
+    def register(func):
+        registered = Task(func, name or f'{func.__module__}.{func.__name__}', max_attempts, retry_delay, concurrency)
+        _registry[registered.name] = registered
+        return registered
+    return register
+
+
+def enqueue(name, **kwargs):
+    """Queue a call to the task ``name``; workers see it once the transaction commits"""
+    if name not in _registry:
+        raise KeyError(f'No task named {name}')
+    record = BackgroundTask.objects.create(name=name, kwargs=kwargs, run_after=timezone.now())
+    if _runner is not None or settings.DIARY_TASK_WORKERS:
+        transaction.on_commit(lambda: start_runner(settings.DIARY_TASK_WORKERS).wake())
+    return record
+
+
+def claim_task():
+    """Claim the oldest due task this process can run, or return None"""
+    now = timezone.now()
+    running = BackgroundTask.objects.filter(status=BackgroundTask.RUNNING, locked_until__gte=now)
+    at_limit = [
+        row['name'] for row in running.values('name').annotate(count=Count('pk'))
+        if row['name'] in _registry
+        and _registry[row['name']].concurrency is not None
+        and row['count'] >= _registry[row['name']].concurrency
+    ]
+    due = BackgroundTask.objects.filter(
+        # A running task whose lease ran out lost its worker
+        Q(status=BackgroundTask.QUEUED, run_after__lte=now)
+        | Q(status=BackgroundTask.RUNNING, locked_until__lt=now),
+        name__in=list(_registry),
+    ).exclude(name__in=at_limit).order_by('run_after', 'pk')
+
+    locked_until = now + timedelta(seconds=settings.DIARY_TASK_LEASE_SECONDS)
+    for record in due[:CLAIM_BATCH]:
+        if not _claim(record, now, locked_until):
+            continue
+        record.status = BackgroundTask.RUNNING
+        record.locked_until = locked_until
+        record.attempts += 1
+        if record.attempts > _registry[record.name].max_attempts:
+            _finish(record, status=BackgroundTask.FAILED, last_error='Lost its worker on the last attempt')
+            continue
+        return record
+    return None
+
+
+def _claim(record, now, locked_until):
+    claim = BackgroundTask.objects.filter(pk=record.pk, status=record.status, locked_until=record.locked_until)
+    concurrency = _registry[record.name].concurrency
+    if concurrency is None:
+        return claim.update(status=BackgroundTask.RUNNING, locked_until=locked_until, attempts=F('attempts') + 1)
+
+    # The limit is checked by the claiming UPDATE itself, so two workers
+    # can't both take the last free slot
+    running = BackgroundTask.objects.filter(
+        name=record.name, status=BackgroundTask.RUNNING, locked_until__gte=now,
+    ).order_by().values('name').annotate(count=Count('pk')).values('count')
+    claim = claim.filter(LessThan(Coalesce(Subquery(running), Value(0)), concurrency))
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Under READ COMMITTED concurrent UPDATEs don't see each other's
+            # claims; queue them per task name until each commits. SQLite
+            # runs one write transaction at a time anyway.
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [record.name])
+        return claim.update(status=BackgroundTask.RUNNING, locked_until=locked_until, attempts=F('attempts') + 1)
+
+
+def run_task(record):
+    """Run a claimed task, then delete it, or schedule a retry; returns whether it succeeded"""
+    registered = _registry[record.name]
+    try:
+        registered.func(**record.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if record.attempts < registered.max_attempts:
+            delay = registered.retry_delay * 2 ** (record.attempts - 1)
+            logger.warning('Task %s failed, retrying in %ss:\n%s', record, delay, error)
+            _finish(
+                record, status=BackgroundTask.QUEUED, last_error=error,
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+        else:
+            logger.error('Task %s failed after %s attempts:\n%s', record, record.attempts, error)
+            _finish(record, status=BackgroundTask.FAILED, last_error=error)
+        return False
+    BackgroundTask.objects.filter(pk=record.pk, locked_until=record.locked_until).delete()
+    return True
+
+
+def _finish(record, **fields):
+    # Only while the claim is still ours; after the lease ran out another
+    # worker may have taken the task over
+    BackgroundTask.objects.filter(pk=record.pk, locked_until=record.locked_until).update(
+        locked_until=None, **fields,
+    )
+
+
+class TaskRunner:
+    """
+    Threads that claim and run due tasks.
+
+    Idle workers look for due tasks every DIARY_TASK_POLL_INTERVAL seconds,
+    or as soon as ``wake`` is called. In ``burst`` mode each worker exits
+    when nothing is due.
+    """
+
+    def __init__(self, workers, burst=False):
+        self.workers = workers
+        self.burst = burst
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'task-worker-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self):
+        """Let running tasks finish, then stop; an interrupted task is retried after its lease"""
+        self._stopping.set()
+        self._wakeup.set()
+        self.join()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self):
+        try:
+            while not self._stopping.is_set():
+                close_old_connections()
+                try:
+                    record = claim_task()
+                except Exception:
+                    # E.g. the database being locked; try again after a pause
+                    logger.exception('Could not claim a task')
+                    record = None
+                if record is not None:
+                    run_task(record)
+                    continue
+                if self.burst:
+                    break
+                self._wakeup.wait(settings.DIARY_TASK_POLL_INTERVAL)
+                self._wakeup.clear()
+        finally:
+            # Worker threads outlive requests, so nothing else closes their connections
+            connections.close_all()
+
+
+def start_runner(workers, burst=False):
+    """Start this process's task workers, unless already started; returns the runner"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = TaskRunner(workers, burst=burst)
+            _runner.start()
+        return _runner
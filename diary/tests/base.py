@@ -0,0 +1,35 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from diary.authentication import token_cache
+
+
+class DiaryTestCase(APITestCase):
+    """Runs against scratch media and upload directories, with empty caches"""
+
+    @classmethod
+    def setUpClass(cls):
+        scratch = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, scratch, ignore_errors=True)
+        overrides = override_settings(
+            MEDIA_ROOT=os.path.join(scratch, 'media'),
+            DIARY_UPLOAD_TEMP_DIR=os.path.join(scratch, 'partial'),
+            DIARY_TASK_WORKERS=0,
+        )
+        overrides.enable()
+        cls.addClassCleanup(overrides.disable)
+        super().setUpClass()
+
+    def setUp(self):
+        # Primary keys are reused between tests, so cached responses would be too
+        caches[settings.DIARY_CACHE_ALIAS].clear()
+        token_cache.clear()
+        self.user = User.objects.create_user('writer', password='secret')
+        self.client.force_authenticate(self.user)
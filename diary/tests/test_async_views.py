@@ -0,0 +1,86 @@
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import override_settings
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+
+from diary.async_views import AsyncDiaryDetailView, AsyncDiaryListCreateView
+from diary.models import Diary
+
+from .base import DiaryTestCase
+
+ASGI_URLCONF = 'diary_project.asgi_urls'
+
+
+class AsyncViewParityTests(DiaryTestCase):
+    """The async list and detail views answer exactly as the DRF views do"""
+    compared_headers = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Vary', 'WWW-Authenticate')
+
+    def setUp(self):
+        super().setUp()
+        # Both go through real authentication
+        self.client.force_authenticate(None)
+        self.token = Token.objects.create(user=self.user)
+        self.diaries = [
+            Diary.objects.create(user=self.user, title=f'Day {number}', content='Sunny ' * 100)
+            for number in range(5)
+        ]
+
+    def get(self, path, asynchronous, token=True, **headers):
+        if token:
+            headers.setdefault('Authorization', f'Token {self.token.key}')
+        # Otherwise one view would answer from the other's cached response
+        caches[settings.DIARY_CACHE_ALIAS].clear()
+        if not asynchronous:
+            return self.client.get(path, headers=headers)
+        with override_settings(ROOT_URLCONF=ASGI_URLCONF):
+            return async_to_sync(self.async_client.get)(path, headers=headers)
+
+    def assertSameResponse(self, path, **kwargs):
+        expected = self.get(path, asynchronous=False, **kwargs)
+        response = self.get(path, asynchronous=True, **kwargs)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        for header in self.compared_headers:
+            self.assertEqual(response.get(header), expected.get(header), header)
+        return response
+
+    def test_served_by_async_views(self):
+        self.assertIs(resolve('/api/diaries/', ASGI_URLCONF).func.view_class, AsyncDiaryListCreateView)
+        self.assertIs(resolve('/api/diaries/1/', ASGI_URLCONF).func.view_class, AsyncDiaryDetailView)
+
+    def test_list_pages(self):
+        response = self.assertSameResponse('/api/diaries/?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        while page['next']:
+            page = self.assertSameResponse(page['next']).json()
+        self.assertSameResponse(page['previous'])
+
+    def test_detail(self):
+        response = self.assertSameResponse(f'/api/diaries/{self.diaries[0].pk}/')
+        self.assertEqual(response.json()['title'], 'Day 0')
+
+    def test_not_modified(self):
+        list_etag = self.get('/api/diaries/', asynchronous=False)['ETag']
+        response = self.assertSameResponse('/api/diaries/', **{'If-None-Match': list_etag})
+        self.assertEqual(response.status_code, 304)
+
+        detail = self.get(f'/api/diaries/{self.diaries[0].pk}/', asynchronous=False)
+        response = self.assertSameResponse(
+            f'/api/diaries/{self.diaries[0].pk}/', **{'If-Modified-Since': detail['Last-Modified']},
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_not_found(self):
+        other = User.objects.create_user('reader', password='secret')
+        hidden = Diary.objects.create(user=other, title='Private', content='x')
+        self.assertEqual(self.assertSameResponse(f'/api/diaries/{hidden.pk}/').status_code, 404)
+        self.assertEqual(self.assertSameResponse('/api/diaries/999999/').status_code, 404)
+
+    def test_unauthenticated(self):
+        self.assertEqual(self.assertSameResponse('/api/diaries/', token=False).status_code, 401)
+        response = self.assertSameResponse('/api/diaries/', Authorization='Token not-a-token')
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,28 @@
+from rest_framework.authtoken.models import Token
+
+from diary.authentication import token_cache
+
+from .base import DiaryTestCase
+
+
+class TokenCacheTests(DiaryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(None)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        # Authenticate once, so the token is cached
+        self.assertEqual(self.client.get('/api/diaries/').status_code, 200)
+
+    def test_logout(self):
+        self.assertEqual(self.client.post('/api/logout/').status_code, 200)
+        self.assertEqual(self.client.get('/api/diaries/').status_code, 401)
+
+    def test_deactivated_user(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/diaries/').status_code, 401)
+
+    def test_cache_holds_no_keys(self):
+        cached = repr(token_cache._entries)
+        self.assertNotIn(self.token.key, cached)
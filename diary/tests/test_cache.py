@@ -0,0 +1,41 @@
+from django.contrib.auth.models import User
+
+from diary.models import Diary
+
+from .base import DiaryTestCase
+
+
+class ResponseCacheTests(DiaryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.diary = Diary.objects.create(user=self.user, title='Before', content='x')
+
+    def test_list_after_update(self):
+        self.assertEqual(self.client.get('/api/diaries/')['X-Cache'], 'MISS')
+        cached = self.client.get('/api/diaries/')
+        self.assertEqual(cached['X-Cache'], 'HIT')
+
+        self.client.patch(f'/api/diaries/{self.diary.pk}/', {'title': 'After'})
+        response = self.client.get('/api/diaries/', HTTP_IF_NONE_MATCH=cached['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['title'], 'After')
+
+    def test_detail_after_update(self):
+        self.client.get(f'/api/diaries/{self.diary.pk}/')
+        self.client.patch(f'/api/diaries/{self.diary.pk}/', {'title': 'After'})
+        self.assertEqual(self.client.get(f'/api/diaries/{self.diary.pk}/').json()['title'], 'After')
+
+    def test_list_after_delete(self):
+        self.client.get('/api/diaries/')
+        self.client.delete(f'/api/diaries/{self.diary.pk}/')
+        self.assertEqual(self.client.get('/api/diaries/').json()['results'], [])
+
+    def test_not_modified(self):
+        etag = self.client.get('/api/diaries/')['ETag']
+        self.assertEqual(self.client.get('/api/diaries/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_users_do_not_share_entries(self):
+        self.client.get('/api/diaries/')
+        self.client.force_authenticate(User.objects.create_user('other'))
+        self.assertEqual(self.client.get('/api/diaries/').json()['results'], [])
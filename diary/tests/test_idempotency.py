@@ -0,0 +1,31 @@
+from django.contrib.auth.models import User
+
+from diary.models import Diary
+
+from .base import DiaryTestCase
+
+
+class IdempotencyTests(DiaryTestCase):
+    def create(self, data, key):
+        return self.client.post('/api/diaries/', data, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_first_response(self):
+        first = self.create({'title': 'Once', 'content': 'x'}, 'key-1')
+        retry = self.create({'title': 'Once', 'content': 'x'}, 'key-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Diary.objects.filter(user=self.user).count(), 1)
+
+    def test_failed_request_is_not_recorded(self):
+        self.assertEqual(self.create({'title': '', 'content': 'x'}, 'key-2').status_code, 400)
+        response = self.create({'title': 'Fixed', 'content': 'x'}, 'key-2')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_keys_are_per_user(self):
+        self.create({'title': 'Mine', 'content': 'x'}, 'shared')
+        self.client.force_authenticate(User.objects.create_user('other'))
+        response = self.create({'title': 'Theirs', 'content': 'x'}, 'shared')
+        self.assertEqual(response.json()['title'], 'Theirs')
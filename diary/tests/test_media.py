@@ -0,0 +1,69 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from rest_framework.test import APIClient
+
+from diary.models import Diary
+
+from .base import DiaryTestCase
+
+
+class MediaTests(DiaryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.diary = Diary.objects.create(
+            user=self.user, title='Notes', content='x', file=ContentFile(b'0123456789', name='notes.txt'),
+        )
+        self.url = self.client.get(f'/api/diaries/{self.diary.pk}/').json()['file_url']
+
+    def fetch(self, url=None, client=None, **headers):
+        response = (client or self.client).get(url or self.url, **headers)
+        if response.status_code in (200, 206):
+            response.body = b''.join(response.streaming_content)
+        return response
+
+    def test_whole_file(self):
+        response = self.fetch()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_range(self):
+        response = self.fetch(HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.body, b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+    def test_suffix_range(self):
+        response = self.fetch(HTTP_RANGE='bytes=-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.body, b'789')
+
+    def test_unsatisfiable_range(self):
+        response = self.fetch(HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range_gets_whole_file(self):
+        response = self.fetch(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, b'0123456789')
+
+    def test_signed_url_without_credentials(self):
+        anonymous = APIClient()
+        self.assertEqual(self.fetch(client=anonymous).status_code, 200)
+        self.assertEqual(self.fetch(self.url.split('?')[0], client=anonymous).status_code, 404)
+        self.assertEqual(self.fetch(self.url.replace('sig=', 'sig=x'), client=anonymous).status_code, 404)
+
+    def test_signed_url_expires(self):
+        later = time.time() + 3 * settings.DIARY_MEDIA_URL_LIFETIME
+        with mock.patch('diary.media.time.time', return_value=later):
+            self.assertEqual(self.fetch(client=APIClient()).status_code, 404)
+            # The owner needs no signature
+            self.assertEqual(self.fetch().status_code, 200)
+
+    def test_missing_file(self):
+        self.diary.file.storage.delete(self.diary.file.name)
+        self.assertEqual(self.fetch().status_code, 404)
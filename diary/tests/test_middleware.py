@@ -0,0 +1,71 @@
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from diary_project import settings_api
+
+from .base import DiaryTestCase
+
+
+@override_settings(
+    MIDDLEWARE=settings_api.MIDDLEWARE,
+    DIARY_TOKEN_ONLY_PATHS=settings_api.DIARY_TOKEN_ONLY_PATHS,
+    DIARY_BROWSER_MIDDLEWARE=settings_api.DIARY_BROWSER_MIDDLEWARE,
+    REST_FRAMEWORK=settings_api.REST_FRAMEWORK,
+)
+class PathScopedMiddlewareTests(DiaryTestCase):
+    """The ``diary_project.settings_api`` middleware stack"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(None)
+        self.token = Token.objects.create(user=self.user)
+        self.token_header = {'Authorization': f'Token {self.token.key}'}
+
+    def assertSkippedBrowserMiddleware(self, response):
+        self.assertNotIn('X-Frame-Options', response)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.assertFalse(response.cookies)
+
+    def test_api_skips_browser_middleware(self):
+        response = self.client.get('/api/diaries/', headers=self.token_header)
+        self.assertEqual(response.status_code, 200)
+        self.assertSkippedBrowserMiddleware(response)
+
+        response = self.client.post('/api/diaries/', {'title': 'Token', 'content': 'x'}, headers=self.token_header)
+        # No CSRF token needed, and none handed out
+        self.assertEqual(response.status_code, 201)
+        self.assertSkippedBrowserMiddleware(response)
+
+    def test_api_skips_browser_middleware_under_asgi(self):
+        response = async_to_sync(self.async_client.get)('/api/diaries/', headers=self.token_header)
+        self.assertEqual(response.status_code, 200)
+        self.assertSkippedBrowserMiddleware(response)
+
+    def test_api_ignores_sessions(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/diaries/').status_code, 401)
+
+    def test_admin_keeps_browser_middleware(self):
+        response = self.client.get('/admin/login/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+
+        csrf_client = Client(enforce_csrf_checks=True)
+        response = csrf_client.post('/admin/login/', {'username': 'writer', 'password': 'secret'})
+        self.assertEqual(response.status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/admin/').status_code, 200)
+
+    def test_login_keeps_browser_middleware(self):
+        response = self.client.post('/api/login/', {'username': 'writer', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['key'], self.token.key)
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        # Logged in with a session as well, as with the default settings
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
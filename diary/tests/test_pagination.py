@@ -0,0 +1,29 @@
+from django.utils import timezone
+
+from diary.models import Diary
+
+from .base import DiaryTestCase
+
+
+class CursorPaginationTests(DiaryTestCase):
+    def setUp(self):
+        super().setUp()
+        Diary.objects.bulk_create([Diary(user=self.user, title=f'Entry {n}', content='x') for n in range(25)])
+        # Rows sharing a created_at straddle the page boundaries
+        Diary.objects.filter(user=self.user).update(created_at=timezone.now())
+        self.expected = list(Diary.objects.filter(user=self.user).values_list('id', flat=True))
+
+    def test_pages_cover_every_row_once(self):
+        page = self.client.get('/api/diaries/', {'page_size': 10}).json()
+        pages = [page]
+        while page['next']:
+            page = self.client.get(page['next']).json()
+            pages.append(page)
+        self.assertEqual([len(page['results']) for page in pages], [10, 10, 5])
+        self.assertEqual([diary['id'] for page in pages for diary in page['results']], self.expected)
+
+        previous = self.client.get(pages[-1]['previous']).json()
+        self.assertEqual(previous['results'], pages[1]['results'])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/diaries/', {'cursor': 'cD1nYXJiYWdl'}).status_code, 404)
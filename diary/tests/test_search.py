@@ -0,0 +1,76 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+
+from diary.models import Diary
+from diary.search import FTS_TABLE, get_search_backend
+
+from .base import DiaryTestCase
+
+
+class SearchTests(DiaryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.diary = Diary.objects.create(user=self.user, title='Trip to Lisbon', content='Pastel de nata by the river')
+
+    def search(self, query):
+        response = self.client.get('/api/diaries/search/', {'q': query})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['results']
+
+    def assertFinds(self, query, *diaries):
+        self.assertEqual([hit['id'] for hit in self.search(query)], [diary.pk for diary in diaries])
+
+    def test_title_and_content(self):
+        self.assertFinds('lisbon', self.diary)
+        self.assertFinds('nata', self.diary)
+        hit = self.search('lisbon')[0]
+        self.assertIn('<mark>Lisbon</mark>', hit['highlighted_title'])
+
+    def test_last_term_is_a_prefix(self):
+        self.assertFinds('lisb', self.diary)
+        self.assertFinds('pastel riv', self.diary)
+        self.assertFinds('lisb pastel')
+
+    def test_title_ranks_above_content(self):
+        in_content = Diary.objects.create(user=self.user, title='Harbour', content='Ferry back from Lisbon')
+        self.assertFinds('lisbon', self.diary, in_content)
+
+    def test_operators_are_matched_literally(self):
+        self.assertFinds('"nata river)', self.diary)
+        self.assertFinds('nata OR porto')
+
+    def test_other_users_diaries(self):
+        other = User.objects.create_user('reader', password='secret')
+        Diary.objects.create(user=other, title='Lisbon again', content='x')
+        self.assertFinds('lisbon', self.diary)
+
+    def test_query_required(self):
+        response = self.client.get('/api/diaries/search/', {'q': '  '})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('q', response.json())
+
+    def test_edits_and_deletes_are_reindexed(self):
+        self.client.patch(f'/api/diaries/{self.diary.pk}/', {'title': 'Trip to Porto'})
+        self.assertFinds('lisbon')
+        self.assertFinds('porto', self.diary)
+
+        self.client.delete(f'/api/diaries/{self.diary.pk}/')
+        self.assertFinds('porto')
+
+    def test_rebuild_search_index(self):
+        if get_search_backend().needs_sync:
+            # Lose the copy the signals made, as if rows were loaded behind their back
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            self.assertFinds('lisbon')
+        else:
+            # PostgreSQL won't index a table with foreign key checks still
+            # deferred in the test's transaction; a real run has none
+            with connection.cursor() as cursor:
+                cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertFinds('lisbon', self.diary)
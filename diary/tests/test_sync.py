@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import override_settings
+from django.utils import timezone
+
+from diary.models import Diary, DiaryTombstone
+from diary.sync import encode_sync_token
+
+from .base import DiaryTestCase
+
+
+class DeltaSyncTests(DiaryTestCase):
+    def changes(self, since):
+        return self.client.get('/api/diaries/changes/', {'since': since})
+
+    def test_reports_changes_and_deletions(self):
+        kept = Diary.objects.create(user=self.user, title='Kept', content='x')
+        deleted = Diary.objects.create(user=self.user, title='Deleted', content='x')
+        since = self.client.get('/api/diaries/changes/').json()['sync_token']
+        self.client.patch(f'/api/diaries/{kept.pk}/', {'title': 'Edited'})
+        self.client.delete(f'/api/diaries/{deleted.pk}/')
+
+        delta = self.changes(since).json()
+        self.assertFalse(delta['reset'])
+        self.assertEqual([diary['title'] for diary in delta['changed']], ['Edited'])
+        self.assertEqual(delta['deleted'], [deleted.pk])
+
+    def test_token_older_than_tombstones_resets(self):
+        since = timezone.now() - timedelta(days=settings.DIARY_TOMBSTONE_RETENTION_DAYS + 1)
+        delta = self.changes(encode_sync_token(since)).json()
+        self.assertTrue(delta['reset'])
+        self.assertEqual(delta['changed'], [])
+
+    @override_settings(DIARY_SYNC_MAX_CHANGES=2)
+    def test_large_delta_resets(self):
+        since = self.client.get('/api/diaries/changes/').json()['sync_token']
+        for n in range(3):
+            DiaryTombstone.objects.create(user=self.user, diary_id=n)
+        self.assertTrue(self.changes(since).json()['reset'])
+
+    def test_invalid_tokens(self):
+        future = encode_sync_token(timezone.now() + timedelta(days=1))
+        for token in ('nonsense', '9' * 30, '-' + '9' * 30, future):
+            with self.subTest(token=token):
+                self.assertEqual(self.changes(token).status_code, 400)
@@ -0,0 +1,125 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from diary.models import BackgroundTask
+from diary.tasks import claim_task, run_task, task
+
+from .base import DiaryTestCase
+
+calls = []
+
+
+@task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task(name='tests.fail', max_attempts=2, retry_delay=30)
+def fail():
+    raise RuntimeError('Out of film')
+
+
+@task(name='tests.one_at_a_time', concurrency=1)
+def one_at_a_time(value):
+    calls.append(value)
+
+
+class TaskQueueTests(DiaryTestCase):
+    def setUp(self):
+        super().setUp()
+        calls.clear()
+
+    def expire_lease(self, record):
+        BackgroundTask.objects.filter(pk=record.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+    def test_runs_and_deletes(self):
+        record.enqueue(value='roll')
+        claimed = claim_task()
+        self.assertEqual(claimed.status, BackgroundTask.RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertGreater(claimed.locked_until, timezone.now())
+
+        self.assertTrue(run_task(claimed))
+        self.assertEqual(calls, ['roll'])
+        self.assertFalse(BackgroundTask.objects.exists())
+        self.assertIsNone(claim_task())
+
+    def test_runs_in_queued_order(self):
+        for value in ('first', 'second'):
+            record.enqueue(value=value)
+        while (claimed := claim_task()) is not None:
+            run_task(claimed)
+        self.assertEqual(calls, ['first', 'second'])
+
+    def test_retries_with_backoff_then_fails(self):
+        queued = fail.enqueue()
+        with self.assertLogs('diary.tasks', 'WARNING'):
+            self.assertFalse(run_task(claim_task()))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, BackgroundTask.QUEUED)
+        self.assertIsNone(queued.locked_until)
+        self.assertIn('Out of film', queued.last_error)
+        self.assertAlmostEqual(
+            (queued.run_after - timezone.now()).total_seconds(), fail.retry_delay, delta=5,
+        )
+        # Not due until then
+        self.assertIsNone(claim_task())
+
+        BackgroundTask.objects.filter(pk=queued.pk).update(run_after=timezone.now())
+        with self.assertLogs('diary.tasks', 'ERROR'):
+            self.assertFalse(run_task(claim_task()))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, BackgroundTask.FAILED)
+        self.assertEqual(queued.attempts, 2)
+        self.assertIn('Out of film', queued.last_error)
+        self.assertIsNone(claim_task())
+
+    def test_expired_lease_is_claimed_again(self):
+        record.enqueue(value='roll')
+        lost = claim_task()
+        self.assertIsNone(claim_task())
+
+        self.expire_lease(lost)
+        reclaimed = claim_task()
+        self.assertEqual(reclaimed.pk, lost.pk)
+        self.assertEqual(reclaimed.attempts, 2)
+        self.assertGreater(reclaimed.locked_until, timezone.now())
+
+        # The first worker finishing late must not drop the new claim
+        run_task(lost)
+        self.assertTrue(BackgroundTask.objects.filter(pk=lost.pk).exists())
+        self.assertTrue(run_task(reclaimed))
+        self.assertFalse(BackgroundTask.objects.exists())
+
+    def test_lost_on_last_attempt_fails(self):
+        fail.enqueue()
+        for _ in range(fail.max_attempts):
+            lost = claim_task()
+            self.expire_lease(lost)
+        self.assertIsNone(claim_task())
+        lost.refresh_from_db()
+        self.assertEqual(lost.status, BackgroundTask.FAILED)
+        self.assertEqual(lost.last_error, 'Lost its worker on the last attempt')
+
+    def test_concurrency_limit(self):
+        one_at_a_time.enqueue(value='first')
+        one_at_a_time.enqueue(value='second')
+        record.enqueue(value='other')
+
+        first = claim_task()
+        self.assertEqual(first.kwargs, {'value': 'first'})
+        # The second waits for a free slot; other tasks don't
+        self.assertEqual(claim_task().name, 'tests.record')
+        self.assertIsNone(claim_task())
+
+        run_task(first)
+        self.assertEqual(claim_task().kwargs, {'value': 'second'})
+
+    def test_expired_lease_frees_its_slot(self):
+        one_at_a_time.enqueue(value='first')
+        one_at_a_time.enqueue(value='second')
+        self.expire_lease(claim_task())
+        # The lost task is due again, and ahead of the queue
+        self.assertEqual(claim_task().kwargs, {'value': 'first'})
+        self.assertIsNone(claim_task())
@@ -0,0 +1,78 @@
+import io
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from PIL import Image
+
+from diary.models import BackgroundTask, Diary
+from diary.tasks import claim_task, run_task
+
+from .base import DiaryTestCase
+
+
+def image_file(name='photo.jpg', size=(1200, 900), color='teal'):
+    output = io.BytesIO()
+    Image.new('RGB', size, color).save(output, 'JPEG')
+    return ContentFile(output.getvalue(), name=name)
+
+
+class ThumbnailTests(DiaryTestCase):
+    def create(self, file):
+        response = self.client.post('/api/diaries/', {'title': 'Photo', 'content': 'x', 'file': file})
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def run_tasks(self):
+        while (record := claim_task()) is not None:
+            run_task(record)
+
+    def test_image_gets_thumbnail(self):
+        diary = self.create(image_file())
+        # Made by a task once the diary is saved, not in the request
+        self.assertIsNone(diary['thumbnail_url'])
+        self.run_tasks()
+
+        url = self.client.get(f'/api/diaries/{diary["id"]}/').json()['thumbnail_url']
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as thumbnail:
+            self.assertEqual(thumbnail.format, 'WEBP')
+            self.assertEqual(thumbnail.size, (533, 400))
+
+    def test_other_files_get_none(self):
+        diary = self.create(ContentFile(b'Dear diary', name='notes.txt'))
+        self.assertFalse(BackgroundTask.objects.exists())
+        self.assertIsNone(diary['thumbnail_url'])
+
+    def test_unreadable_image(self):
+        diary = self.create(ContentFile(b'not really a photo', name='photo.jpg'))
+        self.run_tasks()
+        self.assertFalse(Diary.objects.get(pk=diary['id']).thumbnail)
+        self.assertFalse(BackgroundTask.objects.exists())
+
+    def test_same_image_is_shrunk_once(self):
+        first = self.create(image_file())
+        second = self.create(image_file())
+        self.run_tasks()
+        self.assertEqual(
+            Diary.objects.get(pk=first['id']).thumbnail.name, Diary.objects.get(pk=second['id']).thumbnail.name,
+        )
+
+    def test_replaced_attachment(self):
+        diary = self.create(image_file())
+        self.client.patch(f'/api/diaries/{diary["id"]}/', {'file': image_file(color='orange')}, format='multipart')
+        self.run_tasks()
+        # The task queued for the first image found it gone and did nothing
+        diary = Diary.objects.get(pk=diary['id'])
+        self.assertTrue(diary.thumbnail.name.startswith(f'thumbnails/{diary.file_hash}-'))
+
+    def test_generate_thumbnails(self):
+        # As if attached before thumbnails existed
+        diary = Diary.objects.create(user=self.user, title='Photo', content='x', file=image_file())
+        BackgroundTask.objects.all().delete()
+
+        call_command('generate_thumbnails', stdout=StringIO())
+        diary.refresh_from_db()
+        self.assertTrue(diary.thumbnail)
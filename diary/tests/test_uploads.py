@@ -0,0 +1,118 @@
+import hashlib
+import os
+import sys
+import tracemalloc
+
+from django.conf import settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .base import DiaryTestCase
+
+# The API client lives with the Flet app rather than in a package
+sys.path.insert(0, str(settings.BASE_DIR / 'mobile'))
+from api_client import StreamingMultipart  # noqa: E402
+
+BLOCK_SIZE = 1024 * 1024
+
+
+class WSGIInput:
+    """A request body as a WSGI server hands it to Django, to be read as it arrives"""
+
+    def __init__(self, body):
+        self.read = body.read
+
+    def readline(self, size=-1):
+        raise AssertionError('The request body was read by lines; uploads must be read in blocks')
+
+
+class UploadMemoryTests(DiaryTestCase):
+    """
+    Attachments go from the client's disk to storage in blocks, so peak
+    memory stays flat as the file grows. ``manage.py benchmark_upload``
+    makes the same check end to end over HTTP with a 500 MB file.
+    """
+    sizes = (BLOCK_SIZE, 8 * BLOCK_SIZE)
+    # How much more the largest upload may peak at than the smallest
+    max_growth = BLOCK_SIZE // 2
+
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.user)
+        self.source_dir = os.path.join(settings.MEDIA_ROOT, 'source')
+        os.makedirs(self.source_dir, exist_ok=True)
+
+    def write_file(self, size):
+        path = os.path.join(self.source_dir, f'recording-{size}.wav')
+        digest = hashlib.sha256()
+        with open(path, 'wb') as f:
+            for _ in range(size // BLOCK_SIZE):
+                block = os.urandom(BLOCK_SIZE)
+                digest.update(block)
+                f.write(block)
+        return path, digest.hexdigest()
+
+    def send(self, method, path, body, length, content_type, **headers):
+        # The body is Django's WSGI input stream, as it would be behind a server
+        return APIClient().request(
+            REQUEST_METHOD=method, PATH_INFO=path, CONTENT_TYPE=content_type, CONTENT_LENGTH=str(length),
+            HTTP_AUTHORIZATION=f'Token {self.token.key}', **headers, **{'wsgi.input': WSGIInput(body)},
+        )
+
+    def assertFlatPeak(self, upload):
+        """Run ``upload(path, size, sha256)`` for each size and compare peak memory"""
+        peaks = []
+        for size in self.sizes:
+            path, sha256 = self.write_file(size)
+            tracemalloc.start()
+            try:
+                response = upload(path, size, sha256)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+            self.assertEqual(response.status_code, 201, response.content)
+            self.assertEqual(response.json()['file_size'], size)
+            self.assertEqual(response.json()['file_hash'], sha256)
+        self.assertLess(
+            peaks[-1] - peaks[0], self.max_growth,
+            f'Peak memory went from {peaks[0]} to {peaks[-1]} bytes for {self.sizes[0]} and {self.sizes[-1]} byte files',
+        )
+
+    def test_multipart_create(self):
+        def upload(path, size, sha256):
+            with open(path, 'rb') as f:
+                body = StreamingMultipart({'title': 'Recording', 'content': 'Take one'}, {'file': f})
+                return self.send('POST', '/api/diaries/', body, len(body), body.content_type)
+
+        self.assertFlatPeak(upload)
+
+    def test_chunked_upload(self):
+        def upload(path, size, sha256):
+            upload_id = self.client.post(
+                '/api/diaries/uploads/', {'filename': 'recording.wav', 'size': size, 'sha256': sha256},
+            ).json()['id']
+            with open(path, 'rb') as f:
+                response = self.send(
+                    'PUT', f'/api/diaries/uploads/{upload_id}/', f, size, 'application/octet-stream',
+                    HTTP_UPLOAD_OFFSET='0',
+                )
+            self.assertEqual(response.json()['offset'], size)
+            self.assertEqual(self.client.post(f'/api/diaries/uploads/{upload_id}/complete/').status_code, 200)
+            return self.client.post('/api/diaries/', {'title': 'Recording', 'content': 'Take one', 'upload': upload_id})
+
+        self.assertFlatPeak(upload)
+
+
+class ChunkedUploadTests(DiaryTestCase):
+    def test_empty_file(self):
+        # No chunk is ever sent, so completing it finds no file on disk
+        upload = self.client.post(
+            '/api/diaries/uploads/', {'filename': 'empty.txt', 'size': 0, 'sha256': hashlib.sha256(b'').hexdigest()},
+        ).json()
+        response = self.client.post(f'/api/diaries/uploads/{upload["id"]}/complete/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(response.json()['completed'])
+
+        response = self.client.post('/api/diaries/', {'title': 'Empty', 'content': 'Nothing yet', 'upload': upload['id']})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['file_size'], 0)
@@ -0,0 +1,72 @@
+"""
+Thumbnails for image attachments.
+
+Decoding and shrinking a photo takes long enough that it is kept out of
+the request: once a diary with a new image attachment is committed, a
+``diary.tasks`` worker makes the thumbnail and stores it in
+``Diary.thumbnail`` as a WebP that fits within DIARY_THUMBNAIL_SIZE.
+Thumbnails are named after the attachment's hash, so the same image is
+only ever shrunk once. ``generate_thumbnails`` makes any that are missing,
+e.g. for attachments saved before thumbnails existed.
+"""
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Diary
+from .tasks import task
+
+
+def queue_thumbnail(diary):
+    make_thumbnail.enqueue(diary_id=diary.pk, file_hash=diary.file_hash)
+
+
+@task(concurrency=settings.DIARY_THUMBNAIL_CONCURRENCY)
+def make_thumbnail(diary_id, file_hash):
+    # Nothing to do if the diary was deleted or its attachment replaced since
+    diary = Diary.objects.filter(pk=diary_id, file_hash=file_hash).first()
+    if diary is not None:
+        generate_thumbnail(diary)
+
+
+def render_thumbnail(file):
+    """Return a WebP thumbnail of an image file, or None if it is not a readable image"""
+    width, height = settings.DIARY_THUMBNAIL_SIZE
+    try:
+        with Image.open(file) as image:
+            # Lets JPEGs decode straight to a fraction of their size; the box
+            # is square because EXIF rotation may swap width and height
+            image.draft('RGB', (max(width, height), max(width, height)))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((width, height))
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+            output = io.BytesIO()
+            image.save(output, 'WEBP', quality=settings.DIARY_THUMBNAIL_QUALITY)
+    except (OSError, Image.DecompressionBombError):
+        return None
+    return output.getvalue()
+
+
+def generate_thumbnail(diary):
+    """Make and attach the diary's thumbnail; returns False if its file is not a readable image"""
+    width, height = settings.DIARY_THUMBNAIL_SIZE
+    name = diary.thumbnail.field.generate_filename(diary, f'{diary.file_hash}-{width}x{height}.webp')
+    storage = diary.thumbnail.storage
+    if not storage.exists(name):
+        with diary.file.open('rb') as f:
+            data = render_thumbnail(f)
+        if data is None:
+            return False
+        name = storage.save(name, ContentFile(data))
+
+    # The attachment may have been replaced while the thumbnail was made.
+    # Bumping updated_at changes the ETags and lets delta sync hand clients
+    # the new thumbnail_url.
+    updated = Diary.objects.filter(pk=diary.pk, file_hash=diary.file_hash).update(
+        thumbnail=name, updated_at=timezone.now(),
+    )
+    return bool(updated)
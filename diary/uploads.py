@@ -0,0 +1,214 @@
+"""
+Chunked, resumable attachment uploads.
+
+A client starts an upload with the file's name, size and SHA-256, then
+PUTs the bytes in order, each request carrying the ``Upload-Offset`` it
+starts at. The server appends them to a temporary file and records how
+far it got, so after an interruption the client asks for the offset and
+carries on from there instead of starting over. Starting an upload of a
+file the server already has a partial copy of resumes that copy.
+
+Completing the upload checks the assembled file against the SHA-256; the
+upload's id can then be passed as ``upload`` when creating or updating a
+diary, which attaches the file and discards the upload.
+"""
+import hashlib
+import os
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.utils import timezone
+
+from .models import ChunkedUpload
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+OFFSET_HEADER = 'Upload-Offset'
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class UploadOffsetMismatch(Exception):
+    """A chunk did not start where the previous one ended"""
+
+    def __init__(self, offset):
+        super().__init__(f'Upload is at offset {offset}')
+        self.offset = offset
+
+
+class UploadChecksumMismatch(Exception):
+    pass
+
+
+def upload_path(upload):
+    return os.path.join(settings.DIARY_UPLOAD_TEMP_DIR, f'{upload.pk}.part')
+
+
+def append_chunk(upload, offset, stream, length):
+    """
+    Write ``length`` bytes from ``stream`` at ``offset`` and return the new offset.
+
+    If the client disconnects part way through, whatever arrived is kept,
+    so the next attempt resumes from the last byte received.
+
+    The body arrives over the network at the client's pace, so no
+    transaction is open while it is read: that would hold the database
+    write lock (or a pooled connection) for the whole transfer. Instead a
+    lock on the ``.part`` file keeps a second request for the same upload
+    out, and the offset only moves forward from the one this chunk was
+    checked against.
+    """
+    if offset != upload.offset or upload.completed_at is not None:
+        raise UploadOffsetMismatch(upload.offset)
+
+    path = upload_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Not opened with 'wb', which would truncate under a concurrent writer
+    with os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o600), 'r+b') as f:
+        if not _try_lock(f):
+            # Another chunk of this upload is still arriving
+            raise UploadOffsetMismatch(upload.offset)
+        upload.refresh_from_db(fields=['offset', 'completed_at'])
+        if offset != upload.offset or upload.completed_at is not None:
+            raise UploadOffsetMismatch(upload.offset)
+
+        # Drop anything past the recorded offset, e.g. from a write that
+        # never got to update it
+        f.seek(offset)
+        f.truncate()
+        received = 0
+        while received < length:
+            data = stream.read(min(COPY_BUFFER_SIZE, length - received))
+            if not data:
+                break
+            f.write(data)
+            received += len(data)
+        f.flush()
+
+        updated = ChunkedUpload.objects.filter(pk=upload.pk, offset=offset, completed_at__isnull=True).update(
+            offset=offset + received,
+        )
+    if not updated:
+        upload.refresh_from_db(fields=['offset', 'completed_at'])
+        raise UploadOffsetMismatch(upload.offset)
+    upload.offset = offset + received
+    return upload.offset
+
+
+def _try_lock(f):
+    """Take an exclusive lock on an open file without waiting; released when it is closed"""
+    if fcntl is None:
+        # No advisory locks (Windows); the conditional offset update still
+        # stops two chunks from both being recorded
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def complete_upload(upload):
+    """Verify the assembled file; a corrupt one is discarded so the client can start over"""
+    if upload.completed_at is not None:
+        return upload
+
+    path = upload_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = hashlib.sha256()
+    # Created if missing: an empty file never has a chunk appended
+    with open(path, 'a+b') as f:
+        f.seek(0)
+        for data in iter(lambda: f.read(COPY_BUFFER_SIZE), b''):
+            digest.update(data)
+
+    if digest.hexdigest() != upload.sha256:
+        os.remove(path)
+        upload.offset = 0
+        upload.save(update_fields=['offset'])
+        raise UploadChecksumMismatch('The uploaded file does not match its checksum')
+
+    upload.completed_at = timezone.now()
+    upload.save(update_fields=['completed_at'])
+    return upload
+
+
+class AssembledFile(File):
+    """
+    An assembled upload on local disk.
+
+    Like Django's ``TemporaryUploadedFile`` it exposes
+    ``temporary_file_path()``, so ``FileSystemStorage`` moves it into
+    place instead of copying it; other storages stream it in chunks.
+    """
+
+    def __init__(self, file, name, sha256):
+        super().__init__(file, name=name)
+        # Checked when the upload was completed, so never hashed again
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+@contextmanager
+def open_upload(upload):
+    """The completed upload as a ``File`` that can be assigned to ``Diary.file``"""
+    with open(upload_path(upload), 'rb') as f:
+        yield AssembledFile(f, name=upload.filename, sha256=upload.sha256)
+
+
+class HashingUploadHandlerMixin:
+    """
+    Hash a multipart file upload while it is received and set it as the
+    file's ``sha256``, so ``Diary.refresh_file_metadata`` needn't read the
+    file back.
+    """
+
+    def new_file(self, *args, **kwargs):
+        # Before super(), which may raise StopFutureHandlers to keep the file
+        self.digest = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        passed_on = super().receive_data_chunk(raw_data, start)
+        if passed_on is None:
+            # This handler kept the chunk; one that passed it on doesn't hash it
+            self.digest.update(raw_data)
+        return passed_on
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.digest.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadHandlerMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadHandlerMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def discard_upload(upload):
+    try:
+        os.remove(upload_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def expire_uploads():
+    """Discard uploads older than DIARY_UPLOAD_RETENTION_HOURS; returns how many"""
+    horizon = timezone.now() - timedelta(hours=settings.DIARY_UPLOAD_RETENTION_HOURS)
+    expired = list(ChunkedUpload.objects.filter(created_at__lt=horizon))
+    for upload in expired:
+        discard_upload(upload)
+    return len(expired)
@@ -1,7 +1,18 @@
 from django.urls import path 
-from .views import DiaryListCreateView, DiaryDetailView
+from .views import (
+    DiaryListCreateView, DiaryDetailView, DiaryChangesView, DiarySearchView, DiaryCacheStatsView,
+    DiaryUploadCreateView, DiaryUploadView, DiaryUploadCompleteView, DiaryMediaView,
+)
 
 urlpatterns = [
     path('', DiaryListCreateView.as_view(), name='diary-list-create'),
+    path('changes/', DiaryChangesView.as_view(), name='diary-changes'),
+    path('cache-stats/', DiaryCacheStatsView.as_view(), name='diary-cache-stats'),
+    path('search/', DiarySearchView.as_view(), name='diary-search'),
+    path('uploads/', DiaryUploadCreateView.as_view(), name='diary-upload-create'),
+    path('uploads/<uuid:pk>/', DiaryUploadView.as_view(), name='diary-upload'),
+    path('uploads/<uuid:pk>/complete/', DiaryUploadCompleteView.as_view(), name='diary-upload-complete'),
     path('<int:pk>/', DiaryDetailView.as_view(), name='diary-detail'),
+    path('<int:pk>/file/<str:name>', DiaryMediaView.as_view(kind='file'), name='diary-file'),
+    path('<int:pk>/thumbnail/<str:name>', DiaryMediaView.as_view(kind='thumbnail'), name='diary-thumbnail'),
 ]
@@ -1,23 +1,276 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Substr
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework import generics
-from rest_framework.permissions import IsAuthenticated
-from .models import Diary
-from .serializers import DiarySerializer
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from . import cache as response_cache
+from .conditional import diary_detail_etag, diary_detail_last_modified, diary_list_etag
+from .idempotency import idempotent
+from .media import has_valid_signature, serve
+from .models import ChunkedUpload, Diary, DiaryTombstone
+from .search import search_diaries
+from .serializers import (
+    ChunkedUploadSerializer, DiarySerializer, DiaryListSerializer, DiarySearchSerializer, PREVIEW_LENGTH,
+)
+from .sync import SYNC_OVERLAP, InvalidSyncToken, decode_sync_token, encode_sync_token, tombstone_horizon
+from .uploads import (
+    OFFSET_HEADER, UploadChecksumMismatch, UploadOffsetMismatch, append_chunk, complete_upload,
+)
+
+
+def with_preview(queryset):
+    """Defer the diary body and annotate what DiaryListSerializer needs instead"""
+    return queryset.defer('content').annotate(
+        content_preview=Substr('content', 1, PREVIEW_LENGTH + 1)
+    )
 
 # Create your views here.
+@method_decorator(condition(etag_func=diary_list_etag), name='get')
 class DiaryListCreateView(generics.ListCreateAPIView):
     serializer_class = DiarySerializer
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return DiaryListSerializer
+        return DiarySerializer
+
     def get_queryset(self):
-        return Diary.objects.filter(user=self.request.user)
+        queryset = Diary.objects.filter(user=self.request.user)
+        file_type = self.request.query_params.get('file_type')
+        if file_type:
+            queryset = queryset.filter(file_type=file_type)
+        if self.request.method == 'GET':
+            # Listings only need a preview, so keep the full body out of the query
+            queryset = with_preview(queryset)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        return response_cache.cached_response(
+            request, 'list', request.diary_etag,
+            lambda: super(DiaryListCreateView, self).list(request, *args, **kwargs),
+            lambda: diary_list_etag(request._request),
+        )
+
+    def create(self, request, *args, **kwargs):
+        # Retried POSTs carrying the same Idempotency-Key create only once
+        return idempotent(request, lambda: super(DiaryListCreateView, self).create(request, *args, **kwargs))
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
+@method_decorator(
+    condition(etag_func=diary_detail_etag, last_modified_func=diary_detail_last_modified),
+    name='get',
+)
 class DiaryDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = DiarySerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Diary.objects.filter(user=self.request.user)
\ No newline at end of file
+        return Diary.objects.filter(user=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        return response_cache.cached_response(
+            request, 'detail', request.diary_etag,
+            lambda: super(DiaryDetailView, self).retrieve(request, *args, **kwargs),
+            lambda: diary_detail_etag(request._request, kwargs['pk']),
+        )
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        DiaryTombstone.objects.create(user=self.request.user, diary_id=instance.pk)
+        instance.delete()
+
+
+class DiaryChangesView(generics.GenericAPIView):
+    """
+    Delta sync: ``GET ?since=<sync_token>``.
+
+    Returns the diaries created or updated and the ids deleted since the
+    token was issued, plus a new token. Without ``since`` only a fresh
+    token is returned. ``reset`` is true when the token is too old or the
+    delta too large, in which case the client should reload its list.
+    """
+    serializer_class = DiaryListSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        sync_token = encode_sync_token(timezone.now())
+        since_param = request.query_params.get('since')
+        if not since_param:
+            return self._respond(sync_token)
+        try:
+            since = decode_sync_token(since_param)
+        except InvalidSyncToken as exc:
+            raise ValidationError({'since': [str(exc)]})
+        if since < tombstone_horizon():
+            return self._respond(sync_token, reset=True)
+
+        since -= SYNC_OVERLAP
+        limit = settings.DIARY_SYNC_MAX_CHANGES
+        changed = list(
+            with_preview(Diary.objects.filter(user=request.user, updated_at__gt=since))
+            .order_by('updated_at', 'id')[:limit + 1]
+        )
+        deleted = list(
+            DiaryTombstone.objects.filter(user=request.user, deleted_at__gt=since)
+            .values_list('diary_id', flat=True)[:limit + 1]
+        )
+        if len(changed) + len(deleted) > limit:
+            return self._respond(sync_token, reset=True)
+        return self._respond(sync_token, changed, deleted)
+
+    def _respond(self, sync_token, changed=(), deleted=(), reset=False):
+        return Response({
+            'changed': self.get_serializer(changed, many=True).data,
+            'deleted': list(deleted),
+            'reset': reset,
+            'sync_token': sync_token,
+        })
+
+
+class DiarySearchView(generics.GenericAPIView):
+    """Full-text search over the user's diaries: ``GET ?q=<terms>&limit=<n>``"""
+    serializer_class = DiarySearchSerializer
+    permission_classes = [IsAuthenticated]
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': ['This query parameter is required.']})
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+
+        results = search_diaries(request.user, query, max(limit, 1))
+        serializer = self.get_serializer(results, many=True)
+        return Response({'results': serializer.data})
+
+
+class DiaryCacheStatsView(generics.GenericAPIView):
+    """Hit/miss counters of the diary response cache in this process"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(response_cache.stats.as_dict())
+
+
+class DiaryUploadCreateView(generics.CreateAPIView):
+    """
+    Start a chunked upload: ``POST {filename, size, sha256}``.
+
+    If the user already has an unfinished upload of the same content it is
+    returned instead (200 rather than 201), with the ``offset`` to resume at.
+    """
+    serializer_class = ChunkedUploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = ChunkedUpload.objects.filter(
+            user=request.user,
+            sha256=serializer.validated_data['sha256'],
+            size=serializer.validated_data['size'],
+        ).order_by('-offset').first()
+        if upload is not None:
+            return Response(self.get_serializer(upload).data)
+        upload = serializer.save(user=request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class DiaryUploadView(generics.RetrieveAPIView):
+    """
+    ``GET`` reports an upload's progress; ``PUT`` appends a chunk.
+
+    A chunk is the raw request body, starting at the byte given in the
+    ``Upload-Offset`` header. A chunk that does not start at the current
+    offset is refused with 409 and the offset to resume from.
+    """
+    serializer_class = ChunkedUploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ChunkedUpload.objects.filter(user=self.request.user)
+
+    def put(self, request, *args, **kwargs):
+        upload = self.get_object()
+        try:
+            offset = int(request.headers[OFFSET_HEADER])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            raise ValidationError({'detail': f'An integer {OFFSET_HEADER} header and Content-Length are required.'})
+        if length > settings.DIARY_UPLOAD_MAX_CHUNK_SIZE:
+            raise ValidationError({'detail': f'Chunks may be at most {settings.DIARY_UPLOAD_MAX_CHUNK_SIZE} bytes.'})
+        if offset + length > upload.size:
+            raise ValidationError({'detail': 'The chunk runs past the end of the file.'})
+
+        try:
+            # Streamed to disk: the body is never parsed or held in memory
+            append_chunk(upload, offset, request.stream, length)
+        except UploadOffsetMismatch as exc:
+            return Response({'offset': exc.offset}, status=status.HTTP_409_CONFLICT)
+        upload.refresh_from_db()
+        return Response(self.get_serializer(upload).data)
+
+
+class DiaryUploadCompleteView(generics.GenericAPIView):
+    """Finish a chunked upload once every byte is in: ``POST``"""
+    serializer_class = ChunkedUploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ChunkedUpload.objects.filter(user=self.request.user)
+
+    def post(self, request, *args, **kwargs):
+        upload = self.get_object()
+        if upload.offset != upload.size:
+            return Response(
+                {'detail': 'The upload is not finished.', 'offset': upload.offset},
+                status=status.HTTP_409_CONFLICT,
+            )
+        try:
+            complete_upload(upload)
+        except UploadChecksumMismatch as exc:
+            raise ValidationError({'sha256': [str(exc)]})
+        return Response(self.get_serializer(upload).data)
+
+
+class DiaryMediaView(generics.GenericAPIView):
+    """
+    A diary's attachment (``file/<name>``) or thumbnail (``thumbnail/<name>``).
+
+    Served to the owner, or to anyone holding the signed URL from the
+    diary's ``file_url``/``thumbnail_url``; supports ``Range`` and
+    conditional requests, see ``diary.media``.
+    """
+    permission_classes = []
+    kind = 'file'
+
+    def perform_content_negotiation(self, request, force=False):
+        # The body is a file, whatever the client says it accepts
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, pk, name):
+        diary = Diary.objects.defer('content').filter(pk=pk).first()
+        if diary is None or not getattr(diary, self.kind):
+            raise NotFound()
+        if diary.user_id != request.user.pk and not has_valid_signature(request, diary, self.kind):
+            # Indistinguishable from a diary that does not exist
+            raise NotFound()
+        try:
+            return serve(request, diary, self.kind)
+        except FileNotFoundError:
+            # The row outlived its file, e.g. storage was restored from an older backup
+            raise NotFound()
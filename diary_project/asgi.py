@@ -2,6 +2,8 @@
 ASGI config for diary_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests are routed with ``diary_project.asgi_urls``, which serves the
+busiest diary endpoints with async views.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -9,8 +11,27 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler, ASGIRequest
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'diary_project.settings')
+# Persistent database connections aren't reused under ASGI (see settings)
+os.environ.setdefault('DIARY_ASGI', '1')
 
-application = get_asgi_application()
+
+class DiaryASGIRequest(ASGIRequest):
+    # Django resolves a request against its ``urlconf`` when it has one
+    urlconf = 'diary_project.asgi_urls'
+
+
+class DiaryASGIHandler(ASGIHandler):
+    request_class = DiaryASGIRequest
+
+
+def get_diary_asgi_application():
+    """``get_asgi_application()``, routing with the async diary views"""
+    django.setup(set_prefix=False)
+    return DiaryASGIHandler()
+
+
+application = get_diary_asgi_application()
@@ -0,0 +1,19 @@
+"""
+URL configuration for the ASGI deployment.
+
+The project's URLs, with the diary list and detail endpoints served by the
+async views in ``diary.async_views``. Selected per request by the handler
+in ``diary_project.asgi``; WSGI deployments use ``diary_project.urls``.
+"""
+from django.urls import path
+
+from diary.async_views import AsyncDiaryDetailView, AsyncDiaryListCreateView
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/diaries/', AsyncDiaryListCreateView.as_view(), name='diary-list-create'),
+    path('api/diaries/<int:pk>/', AsyncDiaryDetailView.as_view(), name='diary-detail'),
+    # Everything else, including the sync versions above, which are never reached
+    *sync_urlpatterns,
+]
@@ -0,0 +1,122 @@
+"""
+Middleware that only runs outside the token-authenticated API.
+
+The mobile app authenticates every ``/api/diaries/`` request with a token,
+so sessions, CSRF, ``request.user`` from the session, messages and frame
+options are all wasted work there. ``PathScopedMiddleware`` runs the
+middleware listed in DIARY_BROWSER_MIDDLEWARE, in order, for every request
+except those whose path starts with one of DIARY_TOKEN_ONLY_PATHS. Those
+requests go straight on to the rest of MIDDLEWARE. The admin and the
+login/registration endpoints keep the full stack.
+
+The wrapped middleware are set up the way Django sets up MIDDLEWARE,
+including sync/async adaptation and their ``process_view``,
+``process_template_response`` and ``process_exception`` hooks.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.module_loading import import_string
+
+
+class PathScopedMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.token_only_paths = tuple(settings.DIARY_TOKEN_ONLY_PATHS)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            # Django would run a sync process_view() in a thread on every request
+            self.process_view = self._aprocess_view
+        self._load_middleware()
+
+    def _load_middleware(self):
+        # BaseHandler.load_middleware(), for DIARY_BROWSER_MIDDLEWARE
+        adapter = BaseHandler()
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+
+        handler = self.get_response
+        handler_is_async = self.is_async
+        for middleware_path in reversed(settings.DIARY_BROWSER_MIDDLEWARE):
+            middleware = import_string(middleware_path)
+            if not handler_is_async and getattr(middleware, 'sync_capable', True):
+                middleware_is_async = False
+            else:
+                middleware_is_async = getattr(middleware, 'async_capable', False)
+            adapted_handler = adapter.adapt_method_mode(middleware_is_async, handler, handler_is_async)
+            try:
+                mw_instance = middleware(adapted_handler)
+            except MiddlewareNotUsed:
+                continue
+            handler = adapted_handler
+
+            if hasattr(mw_instance, 'process_view'):
+                self._view_middleware.insert(0, adapter.adapt_method_mode(self.is_async, mw_instance.process_view))
+            if hasattr(mw_instance, 'process_template_response'):
+                self._template_response_middleware.append(
+                    adapter.adapt_method_mode(False, mw_instance.process_template_response),
+                )
+            if hasattr(mw_instance, 'process_exception'):
+                self._exception_middleware.append(adapter.adapt_method_mode(False, mw_instance.process_exception))
+
+            handler = convert_exception_to_response(mw_instance)
+            handler_is_async = middleware_is_async
+
+        self._browser_chain = adapter.adapt_method_mode(self.is_async, handler, handler_is_async)
+
+    def is_token_only(self, request):
+        return request.path_info.startswith(self.token_only_paths)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if self.is_token_only(request):
+            return self.get_response(request)
+        return self._browser_chain(request)
+
+    async def __acall__(self, request):
+        if self.is_token_only(request):
+            return await self.get_response(request)
+        return await self._browser_chain(request)
+
+    # Run the wrapped middleware's hooks only for requests that went through them
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.is_token_only(request):
+            return None
+        for process_view in self._view_middleware:
+            response = process_view(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if self.is_token_only(request):
+            return None
+        for process_view in self._view_middleware:
+            response = await process_view(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        if not self.is_token_only(request):
+            for process_template_response in self._template_response_middleware:
+                response = process_template_response(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        if self.is_token_only(request):
+            return None
+        for process_exception in self._exception_middleware:
+            response = process_exception(request, exception)
+            if response is not None:
+                return response
+        return None
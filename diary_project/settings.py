@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -85,10 +86,92 @@ WSGI_APPLICATION = 'diary_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite is tuned to serve concurrent requests (see `manage.py stress_sqlite`):
+# - WAL lets readers carry on while a write commits, and with
+#   synchronous=NORMAL commits do not wait for fsync (a power cut can lose
+#   the last commits, never corrupt the file)
+# - cache_size (negative: KiB) and mmap_size keep hot pages in memory
+# - timeout is SQLite's busy_timeout: how long a writer waits for the lock
+#   before giving up with "database is locked"
+# - IMMEDIATE transactions take the write lock at BEGIN. A deferred
+#   transaction that reads and then writes cannot wait for the lock and
+#   fails straight away when another writer got in between.
+# - Connections are kept open between requests, and checked before reuse
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA cache_size=-32000;'
+                'PRAGMA mmap_size=268435456;'
+            ),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    }
+}
+
+# Under ASGI, requests don't run on long-lived threads of their own, so a
+# connection kept open for the next request is never reused; the ASGI
+# entry point (diary_project.asgi) sets DIARY_ASGI to close them instead
+if os.environ.get('DIARY_ASGI'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# PostgreSQL: set DIARY_DATABASE=postgresql and the POSTGRES_* variables
+# below. Each process keeps a psycopg connection pool of between
+# POSTGRES_POOL_MIN_SIZE and POSTGRES_POOL_MAX_SIZE connections (keep
+# processes x max size under the server's max_connections). A request
+# waits up to POSTGRES_POOL_TIMEOUT seconds for a free connection. Idle
+# connections beyond the minimum close after POSTGRES_POOL_MAX_IDLE seconds
+# and all are replaced after POSTGRES_POOL_MAX_LIFETIME. Connections are
+# checked when taken from the pool, so ones the server dropped are replaced.
+# See `manage.py benchmark_postgres` for sizing.
+
+if os.environ.get('DIARY_DATABASE') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'diary'),
+            'USER': os.environ.get('POSTGRES_USER', 'diary'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Connections are reused through the pool instead; health
+            # checks make the pool test each connection it hands out
+            'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('POSTGRES_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.environ.get('POSTGRES_POOL_MAX_SIZE', 10)),
+                    'timeout': float(os.environ.get('POSTGRES_POOL_TIMEOUT', 10)),
+                    'max_idle': float(os.environ.get('POSTGRES_POOL_MAX_IDLE', 300)),
+                    'max_lifetime': float(os.environ.get('POSTGRES_POOL_MAX_LIFETIME', 3600)),
+                },
+            },
+        }
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# LocMemCache is per process. Cached diary responses are keyed by their
+# ETag, which is read from the database, so they stay correct with several
+# worker processes. Each process keeps its own copy, though; switch to
+# FileBasedCache to share them without running a cache server:
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#   'LOCATION': BASE_DIR / 'cache',
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'diary',
     }
 }
 
@@ -137,14 +220,76 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Add authentication settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'diary.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'diary.pagination.DiaryCursorPagination',
+    'PAGE_SIZE': 20,
 }
 
+# Token lookups cached per process (diary.authentication): how many
+# tokens, and for how long. The timeout is also how long a token deleted
+# or a user deactivated in another process keeps authenticating here.
+DIARY_TOKEN_CACHE_SIZE = 10000
+DIARY_TOKEN_CACHE_TIMEOUT = 60
+
+# How long deletions are remembered for delta sync. Clients whose sync
+# token is older than this are told to reload their list from scratch.
+DIARY_TOMBSTONE_RETENTION_DAYS = 30
+
+# Largest delta the changes endpoint returns before asking for a reload
+DIARY_SYNC_MAX_CHANGES = 500
+
+# Cache used for per-user diary responses, and how long entries live
+DIARY_CACHE_ALIAS = 'default'
+DIARY_CACHE_TIMEOUT = 300
+
+# How long a create request's Idempotency-Key is honoured for retries
+DIARY_IDEMPOTENCY_KEY_RETENTION_HOURS = 24
+
+# Chunked attachment uploads: where partial files are kept (outside
+# MEDIA_ROOT, so they are never served), the chunk size suggested to
+# clients, the largest chunk and file accepted, and how long unfinished
+# uploads may be resumed
+DIARY_UPLOAD_TEMP_DIR = BASE_DIR / 'upload_tmp'
+DIARY_UPLOAD_CHUNK_SIZE = 1024 * 1024
+DIARY_UPLOAD_MAX_CHUNK_SIZE = 8 * 1024 * 1024
+DIARY_UPLOAD_MAX_SIZE = 500 * 1024 * 1024
+DIARY_UPLOAD_RETENTION_HOURS = 24
+
+# Django's default upload handlers, computing each file's SHA-256 as it arrives
+FILE_UPLOAD_HANDLERS = [
+    'diary.uploads.HashingMemoryFileUploadHandler',
+    'diary.uploads.HashingTemporaryFileUploadHandler',
+]
+
+# Background tasks (diary.tasks): worker threads started in each web
+# process (0 to leave tasks to `manage.py run_tasks` workers), how often
+# idle workers look for due tasks, and how long a task may run before it
+# is presumed lost with its worker and run again
+DIARY_TASK_WORKERS = 2
+DIARY_TASK_POLL_INTERVAL = 5
+DIARY_TASK_LEASE_SECONDS = 600
+
+# Image attachments get a WebP thumbnail that fits within this box (twice
+# the size the app shows it at, for high-density screens); at most this
+# many are made at once
+DIARY_THUMBNAIL_SIZE = (600, 400)
+DIARY_THUMBNAIL_QUALITY = 80
+DIARY_THUMBNAIL_CONCURRENCY = 2
+
+# Attachments are served by the API to their owners (diary.media). Behind
+# nginx, set this to the prefix of an internal location aliased to
+# MEDIA_ROOT (e.g. '/protected-media/') to have nginx send the files
+DIARY_MEDIA_ACCEL_REDIRECT = None
+
+# Signed attachment URLs expire one to two of these (seconds) after they
+# are handed out; they are reissued, and diary ETags change, every window
+DIARY_MEDIA_URL_LIFETIME = 24 * 60 * 60
+
 # Add media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -0,0 +1,44 @@
+"""
+Settings for deployments whose API clients all authenticate with tokens.
+
+Run with DJANGO_SETTINGS_MODULE=diary_project.settings_api. The diary
+endpoints skip the session, CSRF, auth, messages and clickjacking
+middleware (see ``diary_project.middleware``) and accept only token
+authentication. The admin and the login, logout and registration
+endpoints work as they do with ``diary_project.settings``.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import REST_FRAMEWORK
+
+# Requests under these paths skip DIARY_BROWSER_MIDDLEWARE. Login and
+# registration stay out: allauth logs the new user in with a session.
+DIARY_TOKEN_ONLY_PATHS = ['/api/diaries/']
+
+DIARY_BROWSER_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'diary_project.middleware.PathScopedMiddleware',
+    # allauth refuses to start without it; it only sets up a context for
+    # allauth's own views
+    'allauth.account.middleware.AccountMiddleware',
+]
+
+# The admin finds its middleware in DIARY_BROWSER_MIDDLEWARE, which these
+# checks do not look in
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'diary.authentication.CachedTokenAuthentication',
+    ],
+}
@@ -16,8 +16,6 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.conf.urls.static import static
-from django.conf import settings
 from dj_rest_auth.views import LoginView, LogoutView
 from dj_rest_auth.registration.views import RegisterView
 
@@ -27,4 +25,4 @@ urlpatterns = [
     path('api/logout/', LogoutView.as_view(), name='rest_logout'),
     path('api/register/', RegisterView.as_view(), name='rest_register'),
     path('api/diaries/', include('diary.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
@@ -0,0 +1,482 @@
+import asyncio
+import hashlib
+import mimetypes
+import os
+import uuid
+from http import cookiejar
+from urllib.parse import urljoin
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class _RejectCookies(cookiejar.DefaultCookiePolicy):
+    """Cookie policy that never stores or sends cookies"""
+
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+
+def file_sha256(path, buffer_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(buffer_size), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+class StreamingMultipart:
+    """
+    ``multipart/form-data`` body that reads its files from disk on demand.
+
+    requests sends a body object that has ``read()`` and a length in
+    blocks, so only one block of each file is in memory at a time; its own
+    ``files=`` encoder would build the whole body in memory first.
+    """
+
+    def __init__(self, data, files):
+        boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        self.parts = []
+        for name, value in data.items():
+            self.parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            )
+        for name, f in files.items():
+            filename = os.path.basename(f.name)
+            content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            self.parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f'Content-Type: {content_type}\r\n\r\n'.encode()
+            )
+            self.parts.append(f)
+            self.parts.append(b'\r\n')
+        self.parts.append(f'--{boundary}--\r\n'.encode())
+        self.length = sum(
+            len(part) if isinstance(part, bytes) else os.fstat(part.fileno()).st_size - part.tell()
+            for part in self.parts
+        )
+        self.index = 0
+        self.position = 0
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.length
+        chunks = []
+        while size > 0 and self.index < len(self.parts):
+            part = self.parts[self.index]
+            if isinstance(part, bytes):
+                chunk = part[self.position:self.position + size]
+                self.position += len(chunk)
+                if self.position >= len(part):
+                    self.index += 1
+                    self.position = 0
+            else:
+                chunk = part.read(size)
+                if not chunk:
+                    self.index += 1
+                    continue
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+
+class FileSlice:
+    """
+    ``length`` bytes of an open file from ``offset``, as an async body.
+
+    The bytes are read in small blocks as they are sent, and each
+    iteration starts again from ``offset``, so a retried request resends
+    the same slice.
+    """
+
+    def __init__(self, f, offset, length, block_size=64 * 1024):
+        self.f = f
+        self.offset = offset
+        self.length = length
+        self.block_size = block_size
+
+    async def __aiter__(self):
+        self.f.seek(self.offset)
+        remaining = self.length
+        while remaining > 0:
+            block = self.f.read(min(self.block_size, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+class DiaryApiClient:
+    """
+    HTTP client for the diary backend.
+
+    Owns a single ``requests.Session`` so every call reuses pooled
+    keep-alive connections (and TLS sessions) instead of opening a new
+    connection per request. It also holds the auth token, applies a
+    timeout to every call and retries idempotent requests with
+    exponential backoff when the server or network hiccups.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        timeout=(5, 15),
+        retries=3,
+        backoff_factor=0.5,
+        pool_maxsize=10,
+    ):
+        self.base_url = base_url
+        # (connect, read) seconds, applied to every request
+        self.timeout = timeout
+        self.token = None
+        # url -> (etag, decoded JSON) for conditional GETs
+        self.etag_cache = {}
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[502, 503, 504],
+            # POST is not idempotent, so a lost response must not be replayed
+            allowed_methods=frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session = requests.Session()
+        # Auth is token-only; a session cookie (e.g. set by registration)
+        # would make the server demand CSRF tokens on later writes
+        self.session.cookies.set_policy(_RejectCookies())
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def url(self, path):
+        """Resolve an API path; absolute URLs (e.g. cursors) pass through"""
+        # Also resolves root-relative paths such as /media/ file URLs
+        return urljoin(self.base_url, path)
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, self.url(path), **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    # Authentication
+
+    def set_token(self, token):
+        self.token = token
+        self.etag_cache.clear()
+        if token:
+            self.session.headers['Authorization'] = f"Token {token}"
+        else:
+            self.session.headers.pop('Authorization', None)
+
+    def login(self, username, password):
+        response = self.request('POST', 'login/', data={"username": username, "password": password})
+        if response.status_code == 200:
+            self.set_token(response.json().get('key'))
+        return response
+
+    def register(self, username, password):
+        return self.request('POST', 'register/', data={
+            "username": username,
+            "password1": password,
+            "password2": password,
+        })
+
+    def logout(self):
+        """Revoke the token on the server, then forget it locally"""
+        try:
+            if self.token:
+                self.request('POST', 'logout/')
+        except requests.RequestException:
+            # The token is dropped locally either way
+            pass
+        finally:
+            self.set_token(None)
+
+    # Reads
+
+    def get_json(self, path, params=None):
+        """GET a JSON resource, revalidating any cached copy with its ETag"""
+        url = self.url(path)
+        if params:
+            url = requests.Request('GET', url, params=params).prepare().url
+
+        headers = {}
+        cached = self.etag_cache.get(url)
+        if cached:
+            headers['If-None-Match'] = cached[0]
+
+        response = self.request('GET', url, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1]
+        response.raise_for_status()
+
+        data = response.json()
+        etag = response.headers.get('ETag')
+        if etag:
+            self.etag_cache[url] = (etag, data)
+        return data
+
+    def list_diaries(self, url=None):
+        """Fetch one page of diaries, returning (results, next_page_url)"""
+        data = self.get_json(url or 'diaries/')
+        if isinstance(data, list):
+            # Unpaginated response from an older backend
+            return data, None
+        return data.get('results', []), data.get('next')
+
+    def get_diary(self, diary_id):
+        return self.get_json(f"diaries/{diary_id}/")
+
+    def get_changes(self, since=None):
+        return self.get_json('diaries/changes/', params={'since': since} if since else None)
+
+    def search(self, query):
+        return self.get_json('diaries/search/', params={'q': query}).get('results', [])
+
+    def download(self, url, path):
+        """Stream a file (e.g. an attachment) to ``path`` without buffering it in memory"""
+        with self.request('GET', url, stream=True) as response:
+            response.raise_for_status()
+            with open(path, 'wb') as f:
+                for chunk in response.iter_content(64 * 1024):
+                    f.write(chunk)
+
+    # Writes
+
+    def create_diary(self, data, files=None, idempotency_key=None):
+        headers = {'Idempotency-Key': idempotency_key} if idempotency_key else {}
+        if files:
+            # Stream attachments from disk instead of encoding them in memory
+            body = StreamingMultipart(data, files)
+            headers['Content-Type'] = body.content_type
+            return self.request('POST', 'diaries/', data=body, headers=headers)
+        return self.request('POST', 'diaries/', data=data, headers=headers)
+
+    def update_diary(self, diary_id, data):
+        return self.request('PUT', f"diaries/{diary_id}/", data=data)
+
+    def delete_diary(self, diary_id):
+        return self.request('DELETE', f"diaries/{diary_id}/")
+
+
+class AsyncDiaryApiClient:
+    """
+    asyncio counterpart of :class:`DiaryApiClient`, built on ``httpx``.
+
+    Calls are awaitable, so the Flet UI keeps running while a request is
+    in flight and independent requests (e.g. an upload and a prefetch)
+    can overlap on one pooled ``httpx.AsyncClient``.
+    """
+
+    RETRY_STATUSES = frozenset([502, 503, 504])
+    IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'])
+
+    def __init__(
+        self,
+        base_url,
+        timeout=(5, 15),
+        retries=3,
+        backoff_factor=0.5,
+        pool_maxsize=10,
+    ):
+        self.base_url = base_url
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.token = None
+        # url -> (etag, decoded JSON) for conditional GETs
+        self.etag_cache = {}
+
+        connect_timeout, read_timeout = timeout
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+            # Token-only auth, see DiaryApiClient
+            cookies=cookiejar.CookieJar(policy=_RejectCookies()),
+        )
+
+    def url(self, path):
+        """Resolve an API path; absolute URLs (e.g. cursors) pass through"""
+        # Also resolves root-relative paths such as /media/ file URLs
+        return urljoin(self.base_url, path)
+
+    async def request(self, method, path, **kwargs):
+        """Send a request, retrying idempotent methods with exponential backoff"""
+        # A keyed POST is deduplicated by the server, so it may be replayed too
+        retryable = method.upper() in self.IDEMPOTENT_METHODS or 'Idempotency-Key' in (kwargs.get('headers') or {})
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.request(method, self.url(path), **kwargs)
+            except httpx.TransportError:
+                if not retryable or attempt >= self.retries:
+                    raise
+            else:
+                if not retryable or attempt >= self.retries or response.status_code not in self.RETRY_STATUSES:
+                    return response
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+            attempt += 1
+            # Rewind uploads so the retry sends them whole again
+            for upload in (kwargs.get('files') or {}).values():
+                if hasattr(upload, 'seek'):
+                    upload.seek(0)
+
+    async def close(self):
+        await self.client.aclose()
+
+    # Authentication
+
+    def set_token(self, token):
+        self.token = token
+        self.etag_cache.clear()
+        if token:
+            self.client.headers['Authorization'] = f"Token {token}"
+        else:
+            self.client.headers.pop('Authorization', None)
+
+    async def login(self, username, password):
+        response = await self.request('POST', 'login/', data={"username": username, "password": password})
+        if response.status_code == 200:
+            self.set_token(response.json().get('key'))
+        return response
+
+    async def register(self, username, password):
+        return await self.request('POST', 'register/', data={
+            "username": username,
+            "password1": password,
+            "password2": password,
+        })
+
+    async def logout(self):
+        """Revoke the token on the server, then forget it locally"""
+        try:
+            if self.token:
+                await self.request('POST', 'logout/')
+        except httpx.HTTPError:
+            # The token is dropped locally either way
+            pass
+        finally:
+            self.set_token(None)
+
+    # Reads
+
+    async def get_json(self, path, params=None):
+        """GET a JSON resource, revalidating any cached copy with its ETag"""
+        url = self.url(path)
+        if params:
+            # Only when given: httpx drops an existing query string otherwise
+            url = str(httpx.URL(url, params=params))
+
+        headers = {}
+        cached = self.etag_cache.get(url)
+        if cached:
+            headers['If-None-Match'] = cached[0]
+
+        response = await self.request('GET', url, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1]
+        response.raise_for_status()
+
+        data = response.json()
+        etag = response.headers.get('ETag')
+        if etag:
+            self.etag_cache[url] = (etag, data)
+        return data
+
+    async def list_diaries(self, url=None):
+        """Fetch one page of diaries, returning (results, next_page_url)"""
+        data = await self.get_json(url or 'diaries/')
+        if isinstance(data, list):
+            # Unpaginated response from an older backend
+            return data, None
+        return data.get('results', []), data.get('next')
+
+    async def get_diary(self, diary_id):
+        return await self.get_json(f"diaries/{diary_id}/")
+
+    async def get_changes(self, since=None):
+        return await self.get_json('diaries/changes/', params={'since': since} if since else None)
+
+    async def search(self, query):
+        return (await self.get_json('diaries/search/', params={'q': query})).get('results', [])
+
+    async def download(self, url, path):
+        """Stream a file (e.g. an attachment) to ``path`` without buffering it in memory"""
+        async with self.client.stream('GET', self.url(url)) as response:
+            response.raise_for_status()
+            with open(path, 'wb') as f:
+                async for chunk in response.aiter_bytes(64 * 1024):
+                    f.write(chunk)
+
+    # Writes
+
+    async def upload_file(self, path, on_progress=None):
+        """
+        Upload a file in resumable chunks and return the completed upload's id.
+
+        Starting an upload of content the server already holds part of
+        resumes it, so calling this again after an interruption only sends
+        the missing bytes. ``on_progress`` is called with the fraction done.
+        Each chunk is retried like any idempotent request; errors that
+        outlast the retries are raised.
+        """
+        # Hash off the event loop; attachments can be large
+        sha256 = await asyncio.to_thread(file_sha256, path)
+        size = os.path.getsize(path)
+        response = await self.request('POST', 'diaries/uploads/', json={
+            'filename': os.path.basename(path),
+            'size': size,
+            'sha256': sha256,
+        })
+        response.raise_for_status()
+        upload = response.json()
+        upload_url = f"diaries/uploads/{upload['id']}/"
+
+        offset = upload['offset']
+        with open(path, 'rb') as f:
+            while offset < size:
+                if on_progress:
+                    on_progress(offset / size)
+                length = min(upload['chunk_size'], size - offset)
+                # Streamed from disk; an explicit length avoids chunked encoding
+                response = await self.request('PUT', upload_url, content=FileSlice(f, offset, length), headers={
+                    'Upload-Offset': str(offset),
+                    'Content-Length': str(length),
+                    'Content-Type': 'application/offset+octet-stream',
+                })
+                if response.status_code != 409:
+                    # 409: the server is elsewhere, so continue from its offset
+                    response.raise_for_status()
+                offset = response.json()['offset']
+
+        response = await self.request('POST', f"{upload_url}complete/")
+        response.raise_for_status()
+        if on_progress:
+            on_progress(1.0)
+        return upload['id']
+
+    async def create_diary(self, data, files=None, idempotency_key=None):
+        """
+        Create a diary; with an ``idempotency_key`` the POST is safe to retry.
+
+        httpx streams ``files`` from disk in 64 KB pieces, so a multipart
+        attachment is never held in memory whole.
+        """
+        headers = {'Idempotency-Key': idempotency_key} if idempotency_key else None
+        return await self.request('POST', 'diaries/', data=data, files=files, headers=headers)
+
+    async def update_diary(self, diary_id, data):
+        return await self.request('PUT', f"diaries/{diary_id}/", data=data)
+
+    async def delete_diary(self, diary_id):
+        return await self.request('DELETE', f"diaries/{diary_id}/")
@@ -0,0 +1,441 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+PREVIEW_LENGTH = 100
+# What the server's list endpoint returns for each diary
+LIST_FIELDS = (
+    'id', 'title', 'preview', 'file_url', 'thumbnail_url', 'file_type', 'file_size', 'created_at', 'updated_at',
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS diaries (
+    user TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    body TEXT,
+    body_size INTEGER NOT NULL DEFAULT 0,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (user, id)
+);
+CREATE INDEX IF NOT EXISTS diaries_user_created_idx ON diaries (user, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS diaries_body_access_idx ON diaries (last_access) WHERE body IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS attachments (
+    user TEXT NOT NULL,
+    url TEXT NOT NULL,
+    diary_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (user, url)
+);
+CREATE INDEX IF NOT EXISTS attachments_access_idx ON attachments (last_access);
+
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT NOT NULL,
+    op TEXT NOT NULL,
+    diary_id INTEGER NOT NULL,
+    fields TEXT NOT NULL,
+    file_path TEXT,
+    idempotency_key TEXT NOT NULL,
+    queued_at TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    in_flight INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS outbox_user_idx ON outbox (user, id);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    user TEXT PRIMARY KEY,
+    sync_token TEXT,
+    next_url TEXT
+);
+"""
+
+
+def make_preview(content):
+    """Truncate content the way the server's list endpoint does"""
+    if len(content) > PREVIEW_LENGTH:
+        return content[:PREVIEW_LENGTH] + '...'
+    return content
+
+
+def summarize(diary):
+    """The list-item form of a diary, so full and list payloads cache alike"""
+    summary = {key: value for key, value in diary.items() if key in LIST_FIELDS}
+    if 'content' in diary:
+        summary['preview'] = make_preview(diary['content'])
+    return summary
+
+
+def attachment_key(url):
+    """
+    What identifies an attachment URL: the server reissues signed URLs with
+    new ``exp`` and ``sig`` parameters, but the path names the same file
+    """
+    parts = urlsplit(url)
+    query = [(name, value) for name, value in parse_qsl(parts.query) if name not in ('exp', 'sig')]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def default_data_dir():
+    """Directory for on-device data: the app's storage when packaged, else ~/.diary_app"""
+    return os.getenv('FLET_APP_STORAGE_DATA') or os.path.join(os.path.expanduser('~'), '.diary_app')
+
+
+class LocalDiaryStore:
+    """
+    On-device SQLite cache of each user's diaries.
+
+    List items (metadata plus preview) are kept for every diary the app
+    has seen, so the home screen can render before the network answers.
+    Full entry bodies and downloaded attachments are kept too, but only
+    up to ``max_bytes`` in total: when the budget is exceeded the least
+    recently opened bodies and attachment files are evicted first.
+
+    It also holds the outbox: writes made while the server was unreachable,
+    kept in order until a background worker manages to send them.
+
+    Queries are small and indexed, so they run synchronously on the
+    caller's thread; a lock makes the shared connection safe to use from
+    Flet's worker threads as well.
+    """
+
+    def __init__(self, data_dir=None, max_bytes=50 * 1024 * 1024):
+        self.data_dir = data_dir or default_data_dir()
+        self.attachments_dir = os.path.join(self.data_dir, 'attachments')
+        self.outbox_dir = os.path.join(self.data_dir, 'outbox')
+        os.makedirs(self.attachments_dir, exist_ok=True)
+        os.makedirs(self.outbox_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(self.data_dir, 'diaries.sqlite3'), check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    # Diary list
+
+    def load_diaries(self, user):
+        """Return the user's cached list items, newest first"""
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT summary FROM diaries WHERE user = ? ORDER BY created_at DESC, id DESC',
+                [user],
+            ).fetchall()
+        return [json.loads(summary) for summary, in rows]
+
+    def replace_diaries(self, user, diaries, sync_token, next_url):
+        """Make ``diaries`` the user's whole cached list, e.g. after a fresh first page"""
+        keep = {diary['id'] for diary in diaries}
+        with self.lock, self.db:
+            stale = [
+                diary_id for diary_id, in self.db.execute('SELECT id FROM diaries WHERE user = ?', [user])
+                if diary_id not in keep
+            ]
+            self._delete(user, stale)
+            self._upsert(user, diaries)
+            self._set_sync_state(user, sync_token, next_url)
+
+    def add_diaries(self, user, diaries, next_url):
+        """Append a further page of the list"""
+        with self.lock, self.db:
+            self._upsert(user, diaries)
+            self.db.execute('UPDATE sync_state SET next_url = ? WHERE user = ?', [next_url, user])
+
+    def apply_changes(self, user, changed, deleted, sync_token):
+        """Apply a delta sync: upsert changed list items and drop deleted ones"""
+        with self.lock, self.db:
+            self._delete(user, deleted)
+            self._upsert(user, changed)
+            self.db.execute('UPDATE sync_state SET sync_token = ? WHERE user = ?', [sync_token, user])
+
+    def sync_state(self, user):
+        """Return the persisted ``(sync_token, next_url)`` for the user"""
+        with self.lock:
+            row = self.db.execute('SELECT sync_token, next_url FROM sync_state WHERE user = ?', [user]).fetchone()
+        return row or (None, None)
+
+    # Entry bodies
+
+    def get_diary(self, user, diary_id):
+        """Return the full cached diary, or None if its body is not cached"""
+        with self.lock, self.db:
+            row = self.db.execute(
+                'SELECT body FROM diaries WHERE user = ? AND id = ? AND body IS NOT NULL',
+                [user, diary_id],
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute('UPDATE diaries SET last_access = ? WHERE user = ? AND id = ?', [time.time(), user, diary_id])
+        return json.loads(row[0])
+
+    def put_diary(self, user, diary):
+        """Cache a full diary (as returned by the detail endpoint)"""
+        body = json.dumps(diary)
+        with self.lock, self.db:
+            self._upsert(user, [diary])
+            self.db.execute(
+                'UPDATE diaries SET body = ?, body_size = ?, last_access = ? WHERE user = ? AND id = ?',
+                [body, len(body.encode()), time.time(), user, diary['id']],
+            )
+            self._evict()
+
+    # Attachments
+
+    def attachment_path(self, user, url):
+        """Return the local copy of an attachment, or None if it is not cached"""
+        url = attachment_key(url)
+        with self.lock, self.db:
+            row = self.db.execute('SELECT path FROM attachments WHERE user = ? AND url = ?', [user, url]).fetchone()
+            if row is None or not os.path.exists(row[0]):
+                return None
+            self.db.execute('UPDATE attachments SET last_access = ? WHERE user = ? AND url = ?', [time.time(), user, url])
+        return row[0]
+
+    def new_attachment_path(self, user, url):
+        """Where to download ``url`` to before registering it with :meth:`put_attachment`"""
+        name = hashlib.sha256(f'{user}\n{attachment_key(url)}'.encode()).hexdigest()
+        extension = os.path.splitext(url.split('?')[0])[1]
+        return os.path.join(self.attachments_dir, name + extension)
+
+    def put_attachment(self, user, diary_id, url, path):
+        with self.lock, self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO attachments (user, url, diary_id, path, size, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [user, attachment_key(url), diary_id, path, os.path.getsize(path), time.time()],
+            )
+            self._evict()
+
+    def forget_diaries(self, user, diary_ids):
+        """Drop diaries (and their attachments) known to be gone from the server"""
+        with self.lock, self.db:
+            self._delete(user, diary_ids)
+
+    # Outbox
+
+    def queue_write(self, user, op, diary_id, fields=None, file_path=None, idempotency_key=None):
+        """
+        Queue a ``create``, ``update`` or ``delete`` for the server.
+
+        Writes are coalesced with queued ones for the same diary where that
+        is safe: edits fold into a pending create or update, and deleting a
+        diary that was never sent cancels its queued writes altogether. An
+        entry the worker is currently sending is never modified.
+
+        Pass the ``idempotency_key`` of a create that was already attempted,
+        in case that attempt reached the server. A ``file_path`` must be a
+        copy made by ``copy_to_outbox``.
+        """
+        fields = fields or {}
+        with self.lock, self.db:
+            pending = self.db.execute(
+                'SELECT id, op, fields, file_path FROM outbox '
+                'WHERE user = ? AND diary_id = ? AND in_flight = 0 ORDER BY id',
+                [user, diary_id],
+            ).fetchall()
+
+            if op == 'update' and pending and pending[-1][1] in ('create', 'update'):
+                entry_id, _, queued_fields, _ = pending[-1]
+                self.db.execute(
+                    'UPDATE outbox SET fields = ? WHERE id = ?',
+                    [json.dumps({**json.loads(queued_fields), **fields}), entry_id],
+                )
+                return
+
+            if op == 'delete' and pending:
+                for entry_id, _, _, queued_file in pending:
+                    if queued_file:
+                        self._remove_outbox_file(queued_file)
+                self.db.execute(
+                    f"DELETE FROM outbox WHERE id IN ({', '.join('?' * len(pending))})",
+                    [entry_id for entry_id, *_ in pending],
+                )
+                if pending[0][1] == 'create':
+                    # Never reached the server, so there is nothing to delete
+                    return
+
+            self.db.execute(
+                'INSERT INTO outbox (user, op, diary_id, fields, file_path, idempotency_key, queued_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [
+                    user, op, diary_id, json.dumps(fields), file_path, idempotency_key or uuid.uuid4().hex,
+                    datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+                ],
+            )
+
+    def copy_to_outbox(self, file_path):
+        """
+        Keep a private copy of an attachment to queue, under the original name
+        (which the server keeps): the original may be gone by the time it is
+        sent. Returns the copy's path.
+
+        Only file I/O, without the lock, so that callers on the event loop can
+        run it in a thread.
+        """
+        copy = os.path.join(self.outbox_dir, uuid.uuid4().hex, os.path.basename(file_path))
+        os.makedirs(os.path.dirname(copy))
+        shutil.copyfile(file_path, copy)
+        return copy
+
+    def pending_writes(self, user):
+        """Queued writes for the user, oldest first"""
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT id, op, diary_id, fields, file_path, idempotency_key, queued_at, attempts, next_attempt_at '
+                'FROM outbox WHERE user = ? ORDER BY id',
+                [user],
+            ).fetchall()
+        return [self._outbox_entry(row) for row in rows]
+
+    def has_pending_writes(self, user, diary_id):
+        with self.lock:
+            row = self.db.execute('SELECT 1 FROM outbox WHERE user = ? AND diary_id = ?', [user, diary_id]).fetchone()
+        return row is not None
+
+    def next_local_id(self, user):
+        """A negative id for a diary created offline, unique among queued writes"""
+        with self.lock:
+            lowest = self.db.execute('SELECT min(diary_id) FROM outbox WHERE user = ?', [user]).fetchone()[0]
+        return min(lowest or 0, 0) - 1
+
+    def claim_write(self, user):
+        """Mark the oldest queued write as being sent and return it, or None"""
+        with self.lock, self.db:
+            row = self.db.execute(
+                'SELECT id, op, diary_id, fields, file_path, idempotency_key, queued_at, attempts, next_attempt_at '
+                'FROM outbox WHERE user = ? ORDER BY id LIMIT 1',
+                [user],
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute('UPDATE outbox SET in_flight = 1 WHERE id = ?', [row[0]])
+        return self._outbox_entry(row)
+
+    def release_writes(self, user):
+        """Return claimed writes to the queue, e.g. after the app was closed mid-send"""
+        with self.lock, self.db:
+            self.db.execute('UPDATE outbox SET in_flight = 0 WHERE user = ?', [user])
+
+    def retry_write(self, entry_id, attempts, next_attempt_at):
+        with self.lock, self.db:
+            self.db.execute(
+                'UPDATE outbox SET attempts = ?, next_attempt_at = ?, in_flight = 0 WHERE id = ?',
+                [attempts, next_attempt_at, entry_id],
+            )
+
+    def complete_write(self, user, entry, server_id=None):
+        """Drop a sent write; for a create, point later writes at the server's id"""
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM outbox WHERE id = ?', [entry['id']])
+            if server_id is not None:
+                self._remap_writes(user, entry['diary_id'], server_id)
+        if entry['file_path']:
+            self._remove_outbox_file(entry['file_path'])
+
+    def remap_writes(self, user, local_id, server_id):
+        """Point writes queued for a locally created diary at its server id"""
+        with self.lock, self.db:
+            self._remap_writes(user, local_id, server_id)
+
+    @staticmethod
+    def _outbox_entry(row):
+        keys = ('id', 'op', 'diary_id', 'fields', 'file_path', 'idempotency_key', 'queued_at', 'attempts', 'next_attempt_at')
+        entry = dict(zip(keys, row))
+        entry['fields'] = json.loads(entry['fields'])
+        return entry
+
+    # Internals; callers hold the lock and a transaction
+
+    def _upsert(self, user, diaries):
+        now = time.time()
+        self.db.executemany(
+            'INSERT INTO diaries (user, id, created_at, updated_at, summary, last_access) '
+            'VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (user, id) DO UPDATE SET '
+            # A cached body is only valid for the version it was fetched at
+            'body = CASE WHEN diaries.updated_at = excluded.updated_at THEN diaries.body END, '
+            'body_size = CASE WHEN diaries.updated_at = excluded.updated_at THEN diaries.body_size ELSE 0 END, '
+            'created_at = excluded.created_at, updated_at = excluded.updated_at, summary = excluded.summary',
+            [
+                (user, diary['id'], diary['created_at'], diary['updated_at'], json.dumps(summarize(diary)), now)
+                for diary in diaries
+            ],
+        )
+
+    def _remap_writes(self, user, local_id, server_id):
+        self.db.execute(
+            'UPDATE outbox SET diary_id = ? WHERE user = ? AND diary_id = ?', [server_id, user, local_id],
+        )
+
+    def _set_sync_state(self, user, sync_token, next_url):
+        self.db.execute(
+            'INSERT OR REPLACE INTO sync_state (user, sync_token, next_url) VALUES (?, ?, ?)',
+            [user, sync_token, next_url],
+        )
+
+    def _delete(self, user, diary_ids):
+        diary_ids = list(diary_ids)
+        if not diary_ids:
+            return
+        placeholders = ', '.join('?' * len(diary_ids))
+        for path, in self.db.execute(
+            f'SELECT path FROM attachments WHERE user = ? AND diary_id IN ({placeholders})', [user, *diary_ids]
+        ).fetchall():
+            self._remove_file(path)
+        self.db.execute(f'DELETE FROM attachments WHERE user = ? AND diary_id IN ({placeholders})', [user, *diary_ids])
+        self.db.execute(f'DELETE FROM diaries WHERE user = ? AND id IN ({placeholders})', [user, *diary_ids])
+
+    def _evict(self):
+        """Drop least recently used bodies and attachments until under ``max_bytes``"""
+        used = self.db.execute(
+            'SELECT (SELECT coalesce(sum(body_size), 0) FROM diaries) + '
+            '(SELECT coalesce(sum(size), 0) FROM attachments)'
+        ).fetchone()[0]
+        if used <= self.max_bytes:
+            return
+
+        candidates = self.db.execute(
+            "SELECT 'body', user, id, NULL, body_size, last_access FROM diaries WHERE body IS NOT NULL "
+            "UNION ALL "
+            "SELECT 'attachment', user, url, path, size, last_access FROM attachments "
+            "ORDER BY last_access"
+        ).fetchall()
+        for kind, user, key, path, size, _ in candidates:
+            if used <= self.max_bytes:
+                break
+            if kind == 'body':
+                # The list item stays; only the body is dropped
+                self.db.execute(
+                    'UPDATE diaries SET body = NULL, body_size = 0 WHERE user = ? AND id = ?', [user, key]
+                )
+            else:
+                self._remove_file(path)
+                self.db.execute('DELETE FROM attachments WHERE user = ? AND url = ?', [user, key])
+            used -= size
+
+    @staticmethod
+    def _remove_outbox_file(path):
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
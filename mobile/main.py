@@ -37,10 +37,18 @@ from flet import (
     ListTile, 
     SnackBar
 )
-import requests
+import asyncio
+import httpx
 import os
+import uuid
+from datetime import datetime, timezone
+
+from api_client import AsyncDiaryApiClient
+from local_store import LocalDiaryStore, make_preview, summarize
+from outbox import OutboxWorker
 
 BASE_URL = 'http://127.0.0.1:8000/api/'
+SAVED_OFFLINE_MESSAGE = "Saved on this device. It will sync with the server automatically."
 
 class DiaryApp:
     def __init__(self, page: ft.Page):
@@ -50,7 +58,12 @@ class DiaryApp:
         self.page.theme_mode = ft.ThemeMode.LIGHT
         self.page.vertical_alignment = ft.MainAxisAlignment.CENTER
         self.page.horizontal_alignment = ft.CrossAxisAlignment.CENTER
-        self.token = None 
+        self.api = AsyncDiaryApiClient(BASE_URL)
+        # On-device copy of each user's diaries, for instant and offline reads
+        self.store = LocalDiaryStore()
+        self.current_user = None
+        # Replays writes queued while the server was unreachable
+        self.outbox_worker = None
         self.current_view = None
         self.file_picker = FilePicker()
         self.page.overlay.append(self.file_picker)
@@ -109,6 +122,18 @@ class DiaryApp:
         self.title_input = None
         self.content_input = None
 
+        # Home list state: loaded diaries, pagination cursor and sync token
+        self.diaries = []
+        self.sync_token = None
+        self.next_diaries_url = None
+        self.diaries_list_view = None
+        self.load_more_button = None
+        self.loading_more = False
+        self.home_view = None
+        # diary id -> {'card': Card, 'title': Ref[Text], 'preview': Ref[Text]}
+        self.diary_cards = {}
+        self.search_results = None
+
         self.auth_screen()
         
     def auth_screen(self):
@@ -184,7 +209,7 @@ class DiaryApp:
         self.page.go('/')
         self.page.update()
     
-    def login(self, e):
+    async def login(self, e):
         username = self.username_field.value
         password = self.password_field.value
         if not username or not password:
@@ -192,23 +217,21 @@ class DiaryApp:
             return
             
         try:
-            response = requests.post(
-                f"{BASE_URL}login/", 
-                data={"username": username, "password": password}
-            )
+            response = await self.api.login(username, password)
             if response.status_code == 200:
-                self.token = response.json().get('key')
+                self.current_user = username
+                self._start_outbox_worker()
                 self.show_snack_bar('Login successful')
                 # Clear the current view stack and show home screen
                 self.page.views.clear()
-                self.home_screen(None)  # Pass None as the event parameter
+                await self.home_screen(None)  # Pass None as the event parameter
                 self.page.update()
             else:
                 self.show_snack_bar(f'Login failed: {response.text}')
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             self.show_snack_bar(f'Network error: {str(e)}')
     
-    def register(self, e):
+    async def register(self, e):
         username = self.username_field.value
         password = self.password_field.value
         if not username or not password:
@@ -216,14 +239,7 @@ class DiaryApp:
             return
             
         try:
-            response = requests.post(
-                f"{BASE_URL}register/", 
-                data={
-                    "username": username, 
-                    "password1": password,
-                    "password2": password
-                }
-            )
+            response = await self.api.register(username, password)
             if response.status_code == 201:
                 self.show_snack_bar("Registration successful. Please login.")
                 # Clear the fields
@@ -232,12 +248,18 @@ class DiaryApp:
                 self.page.update()
             else:
                 self.show_snack_bar(f"Registration failed: {response.text}")
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             self.show_snack_bar(f"Network error: {str(e)}")
     
-    def home_screen(self, e=None):
+    async def home_screen(self, e=None):
         """Display the home screen with user's diaries"""
         print("Debug: ENTERING home_screen method")
+
+        # The home view is built once per session; afterwards only the
+        # cards affected by server-side changes are patched
+        if self.home_view is not None and self.diaries_list_view is not None:
+            await self._refresh_home_view()
+            return
         
         # Reset page state with fallback mechanisms
         try:
@@ -253,28 +275,28 @@ class DiaryApp:
             traceback.print_exc()
             return
 
+        # Render straight from the on-device store when it has the user's
+        # diaries; the network refresh then runs once the view is up
+        from_store = self._restore_stored_diaries()
+        diaries = self.diaries
+
         # Fetch diaries with comprehensive error handling
-        try:
-            print(f"Debug: Attempting to fetch diaries with token: {self.token}")
-            response = requests.get(
-                f"{BASE_URL}diaries/", 
-                headers={"Authorization": f"Token {self.token}"},
-                timeout=10
-            )
-            print(f"Debug: API Response Status Code: {response.status_code}")
-            
+        if not from_store:
             try:
-                diaries = response.json()
-                print("Debug: Diaries fetched successfully")
-                print("Debug: Diaries content:", diaries)
+                print("Debug: Attempting to fetch diaries")
+                if self.sync_token:
+                    # Already loaded once: only pull what changed since then
+                    await self._sync_diaries()
+                else:
+                    await self._load_first_page()
+                diaries = self.diaries
+                print(f"Debug: {len(diaries)} diaries loaded, next page: {self.next_diaries_url}")
             except ValueError as json_error:
                 print(f"Debug: JSON Parsing Error - {json_error}")
-                print("Debug: Response Text:", response.text)
-                diaries = []
-        
-        except requests.RequestException as req_error:
-            print(f"Debug: Request Error - {req_error}")
-            diaries = []
+                diaries = self.diaries
+            except httpx.HTTPError as req_error:
+                print(f"Debug: Request Error - {req_error}")
+                diaries = self.diaries
 
         # Explicit view construction with multiple fallback strategies
         try:
@@ -302,6 +324,12 @@ class DiaryApp:
                                     Text("My Diaries", size=24, weight=FontWeight.BOLD, color=Colors.WHITE),
                                     Row(
                                         controls=[
+                                            IconButton(
+                                                icon=ft.icons.SEARCH,
+                                                icon_color=Colors.WHITE,
+                                                tooltip="Search Diaries",
+                                                on_click=self.show_search_view
+                                            ),
                                             IconButton(
                                                 icon=ft.icons.ADD,
                                                 icon_color=Colors.WHITE,
@@ -336,116 +364,7 @@ class DiaryApp:
                                     )
                                 ] + (
                                     [
-                                        ListView(
-                                            controls=[
-                                                Card(
-                                                    elevation=4,
-                                                    content=Container(
-                                                        padding=20,
-                                                        content=Column(
-                                                            controls=[
-                                                                Row(
-                                                                    alignment=MainAxisAlignment.SPACE_BETWEEN,
-                                                                    controls=[
-                                                                        Text(
-                                                                            diary["title"],
-                                                                            size=18,
-                                                                            weight=FontWeight.BOLD,
-                                                                            color=Colors.BLUE_GREY_800
-                                                                        ),
-                                                                        Row(
-                                                                            spacing=0,
-                                                                            controls=[
-                                                                                IconButton(
-                                                                                    icon=ft.icons.EDIT,
-                                                                                    icon_color=Colors.BLUE_400,
-                                                                                    tooltip="Edit",
-                                                                                    on_click=lambda e, diary=diary: self.update_diary(diary['id'])
-                                                                                ),
-                                                                                IconButton(
-                                                                                    icon=ft.icons.DELETE,
-                                                                                    icon_color=Colors.RED_400,
-                                                                                    tooltip="Delete",
-                                                                                    on_click=lambda e, diary=diary: self.delete_diary(diary['id'])
-                                                                                ),
-                                                                            ]
-                                                                        )
-                                                                    ]
-                                                                ),
-                                                                Container(
-                                                                    padding=padding.only(top=8, bottom=12),
-                                                                    content=Text(
-                                                                        diary["content"][:100] + "..." if len(diary["content"]) > 100 else diary["content"],
-                                                                        color=Colors.BLUE_GREY_600,
-                                                                        size=14,
-                                                                    )
-                                                                ),
-                                                                Divider(
-                                                                    color=Colors.BLUE_GREY_100,
-                                                                    height=1,
-                                                                ),
-                                                                Container(
-                                                                    padding=padding.only(top=12),
-                                                                    content=Row(
-                                                                        alignment=MainAxisAlignment.SPACE_BETWEEN,
-                                                                        controls=[
-                                                                            Column(
-                                                                                spacing=5,
-                                                                                controls=[
-                                                                                    Text(
-                                                                                        "Created",
-                                                                                        size=12,
-                                                                                        color=Colors.BLUE_GREY_400,
-                                                                                    ),
-                                                                                    Text(
-                                                                                        diary.get("created_at", "").split("T")[0],
-                                                                                        size=12,
-                                                                                        color=Colors.BLUE_GREY_700,
-                                                                                        weight=FontWeight.BOLD,
-                                                                                    )
-                                                                                ]
-                                                                            ),
-                                                                            ElevatedButton(
-                                                                                content=Row(
-                                                                                    controls=[
-                                                                                        Icon(
-                                                                                            ft.icons.VISIBILITY,
-                                                                                            color=Colors.WHITE,
-                                                                                            size=16,
-                                                                                        ),
-                                                                                        Text(
-                                                                                            "View Details",
-                                                                                            color=Colors.WHITE,
-                                                                                            size=14,
-                                                                                        ),
-                                                                                    ],
-                                                                                    spacing=5,
-                                                                                ),
-                                                                                style=ButtonStyle(
-                                                                                    color={
-                                                                                        "": Colors.WHITE,
-                                                                                    },
-                                                                                    bgcolor={
-                                                                                        "": Colors.BLUE_400,
-                                                                                    },
-                                                                                    padding=padding.only(left=15, right=15, top=12, bottom=12),
-                                                                                ),
-                                                                                on_click=lambda e, diary=diary: self.show_diary_details(diary)
-                                                                            ),
-                                                                        ]
-                                                                    )
-                                                                )
-                                                            ]
-                                                        )
-                                                    ),
-                                                    margin=margin.only(bottom=16)
-                                                )
-                                                for diary in diaries
-                                            ],
-                                            expand=True,
-                                            spacing=0,
-                                            padding=padding.only(right=4)
-                                        )
+                                        self._build_diary_list(diaries)
                                     ] if diaries else [
                                         Container(
                                             margin=margin.only(top=40),
@@ -514,6 +433,7 @@ class DiaryApp:
             print("Debug: View created successfully")
             
             # Update the page
+            self.home_view = home_view
             self.page.views.clear()
             self.page.views.append(home_view)
             print(f"Debug: View appended. Total views: {len(self.page.views)}")
@@ -526,7 +446,496 @@ class DiaryApp:
             import traceback
             traceback.print_exc()
             return
+
+        if from_store:
+            self.page.run_task(self.reload_diaries)
     
+    def _restore_stored_diaries(self):
+        """Load the in-memory list from the on-device store; False if it holds none"""
+        if self.diaries or self.current_user is None:
+            return False
+        diaries = self.store.load_diaries(self.current_user)
+        if not diaries:
+            return False
+        self.diaries = diaries
+        self.sync_token, self.next_diaries_url = self.store.sync_state(self.current_user)
+        self._apply_pending_writes()
+        print(f"Debug: {len(diaries)} diaries restored from the local store")
+        return True
+
+    async def _load_first_page(self):
+        """Replace the in-memory list with the first page from the server"""
+        # Fetch the sync token alongside the page; the server's sync overlap
+        # window covers anything written between the two requests
+        changes, (diaries, self.next_diaries_url) = await asyncio.gather(
+            self.api.get_changes(),
+            self.api.list_diaries(),
+        )
+        sync_token = changes['sync_token']
+        # Copy, since the page may be the ETag cache's own list
+        self.diaries = list(diaries)
+        self.sync_token = sync_token
+        self.store.replace_diaries(self.current_user, self.diaries, sync_token, self.next_diaries_url)
+        self._apply_pending_writes()
+
+    async def _sync_diaries(self):
+        """Patch the in-memory list with the changes since the last sync"""
+        changes = await self.api.get_changes(self.sync_token)
+        if changes['reset']:
+            print("Debug: Sync token expired or delta too large, reloading list")
+            await self._load_first_page()
+            return None
+
+        deleted = set(changes['deleted'])
+        by_id = {diary['id']: diary for diary in self.diaries if diary['id'] not in deleted}
+        oldest_loaded = self.diaries[-1]['created_at'] if self.diaries else None
+        changed = set()
+        for diary in changes['changed']:
+            # Entries older than the loaded pages will arrive with "Load more"
+            if diary['id'] in by_id or not self.next_diaries_url or diary['created_at'] >= oldest_loaded:
+                if by_id.get(diary['id']) != diary:
+                    changed.add(diary['id'])
+                by_id[diary['id']] = diary
+        self.diaries = sorted(by_id.values(), key=lambda d: (d['created_at'], d['id']), reverse=True)
+        self.sync_token = changes['sync_token']
+        self.store.apply_changes(self.current_user, [by_id[diary_id] for diary_id in changed], deleted, self.sync_token)
+        print(f"Debug: Synced {len(changed)} changed and {len(deleted)} deleted diaries")
+        # Writes the server has not seen yet still win over what it sent
+        pending_changed, pending_deleted = self._apply_pending_writes()
+        return changed | pending_changed, deleted | pending_deleted
+
+    def _apply_pending_writes(self):
+        """Overlay the writes still waiting in the outbox onto the in-memory list"""
+        by_id = {diary['id']: diary for diary in self.diaries}
+        changed, deleted = set(), set()
+        for entry in self.store.pending_writes(self.current_user):
+            diary_id = entry['diary_id']
+            if entry['op'] == 'delete':
+                if by_id.pop(diary_id, None) is not None:
+                    deleted.add(diary_id)
+                continue
+
+            current = by_id.get(diary_id)
+            if current is None and entry['op'] == 'update':
+                # The diary is on a page that has not been loaded
+                continue
+            diary = dict(current or {
+                'id': diary_id,
+                'created_at': entry['queued_at'],
+                'updated_at': entry['queued_at'],
+                'file_url': None,
+                'file_type': None,
+            })
+            fields = entry['fields']
+            if 'title' in fields:
+                diary['title'] = fields['title']
+            if 'content' in fields:
+                diary['preview'] = make_preview(fields['content'])
+            if diary != current:
+                by_id[diary_id] = diary
+                changed.add(diary_id)
+        self.diaries = sorted(by_id.values(), key=lambda d: (d['created_at'], d['id']), reverse=True)
+        return changed, deleted
+
+    def _start_outbox_worker(self):
+        """Start replaying the user's queued writes in the background"""
+        if self.outbox_worker is not None:
+            self.outbox_worker.stop()
+        self.outbox_worker = OutboxWorker(
+            self.api, self.store, self.current_user, self._on_write_sent, self._on_write_failed,
+            on_progress=lambda entry, done: self._show_upload_progress(entry['diary_id'], done),
+        )
+        self.page.run_task(self.outbox_worker.run)
+
+    async def _queue_write(self, op, diary_id, fields=None, file_path=None, idempotency_key=None):
+        """Keep a write in the outbox for the worker and show it in the list right away"""
+        if file_path:
+            # Attachments can be large; copy them off the event loop
+            file_path = await asyncio.to_thread(self.store.copy_to_outbox, file_path)
+        self.store.queue_write(self.current_user, op, diary_id, fields, file_path, idempotency_key)
+        if self.outbox_worker is not None:
+            self.outbox_worker.wake()
+        changes = self._apply_pending_writes()
+        if self.diaries_list_view is not None:
+            self._patch_diary_cards(*changes)
+
+    def _must_queue(self, diary_id):
+        """Writes to a diary with queued writes (or only known locally) must queue behind them"""
+        return diary_id < 0 or self.store.has_pending_writes(self.current_user, diary_id)
+
+    async def _on_write_sent(self, entry, response):
+        if entry['op'] == 'delete':
+            self.store.forget_diaries(self.current_user, [entry['diary_id']])
+            return
+        self._settle_local_diary(entry['diary_id'], response.json())
+
+    async def _on_write_failed(self, entry, response, error):
+        reason = str(error) if response is None else response.text
+        print(f"Debug: Outbox write rejected - {reason}")
+        self.show_snack_bar(f"A change made offline could not be saved: {reason}")
+        diary = None
+        if entry['op'] != 'create':
+            # Roll back to what the server has
+            try:
+                diary = await self.api.get_diary(entry['diary_id'])
+            except httpx.HTTPError:
+                pass
+        self._settle_local_diary(entry['diary_id'], diary)
+
+    def _settle_local_diary(self, local_id, diary=None):
+        """Replace an optimistic list entry with the server's diary, or drop it"""
+        if diary is not None:
+            self.store.put_diary(self.current_user, diary)
+            if diary['id'] != local_id:
+                # Writes queued against the local id now belong to the real one
+                self.store.remap_writes(self.current_user, local_id, diary['id'])
+        self._swap_listed_diary(local_id, diary)
+
+    def _swap_listed_diary(self, old_id, diary=None):
+        """Swap a list entry for ``diary`` (or drop it) and patch only the affected cards"""
+        self.diaries = [d for d in self.diaries if d['id'] != old_id and (diary is None or d['id'] != diary['id'])]
+        changed, deleted = set(), set()
+        if diary is None or diary['id'] != old_id:
+            deleted.add(old_id)
+        if diary is not None:
+            self.diaries.append(summarize(diary))
+            changed.add(diary['id'])
+        pending_changed, pending_deleted = self._apply_pending_writes()
+        if self.diaries_list_view is not None:
+            self._patch_diary_cards(changed | pending_changed, deleted | pending_deleted)
+
+    async def _refresh_home_view(self):
+        """Return to the cached home view and patch it with the latest changes"""
+        self._pop_to_home_view()
+        self.page.update()
+        await self.reload_diaries()
+
+    def _patch_diary_cards(self, changed, deleted):
+        """Remove, replace or insert only the cards whose diaries changed"""
+        structural = False
+        for diary_id in deleted:
+            if diary_id in self.diary_cards:
+                self._remove_diary_card(diary_id)
+                structural = True
+
+        for index, diary in enumerate(self.diaries):
+            if diary['id'] not in changed:
+                continue
+            if diary['id'] in self.diary_cards:
+                self._replace_diary_card(diary)
+            else:
+                # Walking the list in order keeps each insert at its diary's index
+                self._insert_diary_card(index, diary)
+                structural = True
+
+        if structural:
+            self.diaries_list_view.update()
+
+    def _pop_to_home_view(self):
+        """Drop every view stacked above the home view"""
+        if self.home_view in self.page.views:
+            del self.page.views[self.page.views.index(self.home_view) + 1:]
+        else:
+            self.page.views.clear()
+            self.page.views.append(self.home_view)
+
+    def _push_view(self, view):
+        """Show ``view`` on top of the home view, keeping the home view alive"""
+        if self.home_view is not None:
+            self._pop_to_home_view()
+        else:
+            self.page.views.clear()
+        self.page.views.append(view)
+
+    def _build_diary_list(self, diaries):
+        """Build the diaries ListView with a trailing "Load more" button"""
+        self.load_more_button = TextButton(
+            "Load more",
+            icon=ft.icons.EXPAND_MORE,
+            visible=bool(self.next_diaries_url),
+            on_click=self.load_more_diaries,
+        )
+        self.diary_cards = {}
+        self.diaries_list_view = ListView(
+            controls=[self._build_diary_card(diary) for diary in diaries] + [self.load_more_button],
+            expand=True,
+            spacing=0,
+            padding=padding.only(right=4),
+            # Fetch the next page as the user nears the end of the list
+            on_scroll_interval=100,
+            on_scroll=self._on_diaries_scroll,
+        )
+        return self.diaries_list_view
+
+    def _on_diaries_scroll(self, e: ft.OnScrollEvent):
+        if self.loading_more or not self.next_diaries_url:
+            return
+        if e.max_scroll_extent is not None and e.pixels >= e.max_scroll_extent - 400:
+            self.page.run_task(self.load_more_diaries)
+
+    def _build_diary_card(self, diary):
+        """Build the card for a diary and register it under the diary's id"""
+        title_ref = ft.Ref[Text]()
+        preview_ref = ft.Ref[Text]()
+        progress_ref = ft.Ref[ft.ProgressBar]()
+        thumbnail_ref = ft.Ref[Image]()
+        thumbnail = self._stored_copy(diary, 'thumbnail_url')
+        card = Card(
+            data=diary['id'],
+            elevation=4,
+            content=Container(
+                padding=20,
+                content=Column(
+                    controls=[
+                        Row(
+                            alignment=MainAxisAlignment.SPACE_BETWEEN,
+                            controls=[
+                                Text(
+                                    diary["title"],
+                                    size=18,
+                                    weight=FontWeight.BOLD,
+                                    color=Colors.BLUE_GREY_800,
+                                    ref=title_ref,
+                                ),
+                                Row(
+                                    spacing=0,
+                                    controls=[
+                                        IconButton(
+                                            icon=ft.icons.EDIT,
+                                            icon_color=Colors.BLUE_400,
+                                            tooltip="Edit",
+                                            on_click=lambda e, diary=diary: self.page.run_task(self.update_diary, diary['id'])
+                                        ),
+                                        IconButton(
+                                            icon=ft.icons.DELETE,
+                                            icon_color=Colors.RED_400,
+                                            tooltip="Delete",
+                                            on_click=lambda e, diary=diary: self.delete_diary(diary['id'])
+                                        ),
+                                    ]
+                                )
+                            ]
+                        ),
+                        Container(
+                            padding=padding.only(top=8, bottom=12),
+                            content=Text(
+                                diary.get("preview", ""),
+                                color=Colors.BLUE_GREY_600,
+                                size=14,
+                                ref=preview_ref,
+                            )
+                        ),
+                        # Server-made thumbnail of an image attachment, never the original
+                        Image(
+                            src=thumbnail,
+                            visible=thumbnail is not None,
+                            width=180,
+                            height=120,
+                            fit=ft.ImageFit.COVER,
+                            border_radius=border_radius.all(8),
+                            ref=thumbnail_ref,
+                        ),
+                        # Attachment upload progress while the diary is being created
+                        ft.ProgressBar(
+                            value=0,
+                            visible=False,
+                            color=Colors.BLUE_400,
+                            bgcolor=Colors.BLUE_GREY_100,
+                            ref=progress_ref,
+                        ),
+                        Divider(
+                            color=Colors.BLUE_GREY_100,
+                            height=1,
+                        ),
+                        Container(
+                            padding=padding.only(top=12),
+                            content=Row(
+                                alignment=MainAxisAlignment.SPACE_BETWEEN,
+                                controls=[
+                                    Column(
+                                        spacing=5,
+                                        controls=[
+                                            Text(
+                                                "Created",
+                                                size=12,
+                                                color=Colors.BLUE_GREY_400,
+                                            ),
+                                            Text(
+                                                diary.get("created_at", "").split("T")[0],
+                                                size=12,
+                                                color=Colors.BLUE_GREY_700,
+                                                weight=FontWeight.BOLD,
+                                            )
+                                        ]
+                                    ),
+                                    ElevatedButton(
+                                        content=Row(
+                                            controls=[
+                                                Icon(
+                                                    ft.icons.VISIBILITY,
+                                                    color=Colors.WHITE,
+                                                    size=16,
+                                                ),
+                                                Text(
+                                                    "View Details",
+                                                    color=Colors.WHITE,
+                                                    size=14,
+                                                ),
+                                            ],
+                                            spacing=5,
+                                        ),
+                                        style=ButtonStyle(
+                                            color={
+                                                "": Colors.WHITE,
+                                            },
+                                            bgcolor={
+                                                "": Colors.BLUE_400,
+                                            },
+                                            padding=padding.only(left=15, right=15, top=12, bottom=12),
+                                        ),
+                                        # Looked up by id so an in-place card update is never stale
+                                        on_click=lambda e, diary_id=diary['id']: self.page.run_task(self.show_diary_details, {'id': diary_id})
+                                    ),
+                                ]
+                            )
+                        )
+                    ]
+                )
+            ),
+            margin=margin.only(bottom=16)
+        )
+        self.diary_cards[diary['id']] = {
+            'card': card, 'title': title_ref, 'preview': preview_ref, 'progress': progress_ref,
+            'thumbnail': thumbnail_ref,
+        }
+        return card
+
+    def _insert_diary_card(self, index, diary):
+        self.diaries_list_view.controls.insert(index, self._build_diary_card(diary))
+
+    def _replace_diary_card(self, diary):
+        """Patch an existing card's text in place and push just that card"""
+        entry = self.diary_cards[diary['id']]
+        entry['title'].current.value = diary['title']
+        entry['preview'].current.value = diary.get('preview', '')
+        # The thumbnail is made after upload, so it can appear on a later sync
+        thumbnail = self._stored_copy(diary, 'thumbnail_url')
+        entry['thumbnail'].current.src = thumbnail
+        entry['thumbnail'].current.visible = thumbnail is not None
+        entry['card'].update()
+
+    def _show_upload_progress(self, diary_id, done):
+        """Show how much of a diary's attachment has been uploaded on its card"""
+        entry = self.diary_cards.get(diary_id)
+        if entry is None or entry['progress'].current is None:
+            return
+        entry['progress'].current.value = done
+        entry['progress'].current.visible = done < 1
+        entry['progress'].current.update()
+
+    def _remove_diary_card(self, diary_id):
+        entry = self.diary_cards.pop(diary_id, None)
+        if entry is not None:
+            self.diaries_list_view.controls.remove(entry['card'])
+
+    async def load_more_diaries(self, e=None):
+        """Follow the next cursor and append its diaries to the home list"""
+        if not self.next_diaries_url or self.diaries_list_view is None or self.loading_more:
+            return
+
+        self.loading_more = True
+        self.load_more_button.disabled = True
+        self.load_more_button.update()
+        try:
+            diaries, self.next_diaries_url = await self.api.list_diaries(self.next_diaries_url)
+        except (httpx.HTTPError, ValueError) as load_error:
+            print(f"Debug: Error loading more diaries - {load_error}")
+            self.show_snack_bar(f"Error loading diaries: {str(load_error)}")
+            return
+        finally:
+            self.loading_more = False
+            self.load_more_button.disabled = False
+            self.load_more_button.update()
+
+        self.diaries.extend(diaries)
+        self.store.add_diaries(self.current_user, diaries, self.next_diaries_url)
+
+        # Insert the new cards just before the "Load more" button
+        controls = self.diaries_list_view.controls
+        controls[-1:-1] = [self._build_diary_card(diary) for diary in diaries]
+        self.load_more_button.visible = bool(self.next_diaries_url)
+        self.diaries_list_view.update()
+
+    def show_search_view(self, e=None):
+        """Show the full-text search screen"""
+        self.search_results = ListView(expand=True, spacing=10)
+        search_field = TextField(
+            label='Search your diaries',
+            border_radius=10,
+            text_size=16,
+            prefix_icon=ft.icons.SEARCH,
+            focused_border_color=Colors.BLUE_400,
+            autofocus=True,
+            on_submit=lambda e: self.page.run_task(self.handle_search, e.control.value),
+        )
+
+        view = View(
+            "/search",
+            [
+                AppBar(
+                    title=Text("Search"),
+                    bgcolor=Colors.BLUE_400,
+                    leading=IconButton(
+                        icon=ft.icons.ARROW_BACK,
+                        icon_color=Colors.WHITE,
+                        on_click=lambda _: self.page.run_task(self.home_screen)
+                    ),
+                ),
+                Container(
+                    padding=20,
+                    expand=True,
+                    content=Column(
+                        controls=[search_field, self.search_results],
+                        spacing=20,
+                        expand=True,
+                    ),
+                ),
+            ],
+            bgcolor=Colors.WHITE,
+            padding=0,
+        )
+
+        self._push_view(view)
+        self.page.go('/search')
+        self.page.update()
+
+    async def handle_search(self, query):
+        """Run a server-side search and render the ranked results"""
+        query = (query or "").strip()
+        if not query:
+            return
+
+        try:
+            results = await self.api.search(query)
+        except (httpx.HTTPError, ValueError) as search_error:
+            print(f"Debug: Search error - {search_error}")
+            self.show_snack_bar(f"Search failed: {str(search_error)}")
+            return
+
+        def emphasize(text):
+            # The API wraps matched terms in <mark> tags
+            return (text or "").replace('<mark>', '**').replace('</mark>', '**')
+
+        self.search_results.controls = [
+            ListTile(
+                title=ft.Markdown(emphasize(result['highlighted_title'])),
+                subtitle=ft.Markdown(emphasize(result['snippet'])),
+                on_click=lambda e, result=result: self.page.run_task(self.show_diary_details, result),
+            )
+            for result in results
+        ] or [Text("No matching diaries", color=Colors.BLUE_GREY_400)]
+        self.search_results.update()
+
     def show_create_diary_view(self, e=None):
         """Show the diary creation form"""
         # Create form fields
@@ -573,7 +982,7 @@ class DiaryApp:
                             OutlinedButton(
                                 "Cancel",
                                 icon=ft.icons.CANCEL,
-                                on_click=lambda _: self.home_screen()
+                                on_click=lambda _: self.page.run_task(self.home_screen)
                             ),
                             ElevatedButton(
                                 "Create",
@@ -604,14 +1013,14 @@ class DiaryApp:
                     leading=IconButton(
                         icon=ft.icons.ARROW_BACK,
                         icon_color=Colors.WHITE,
-                        on_click=lambda _: self.home_screen()
+                        on_click=lambda _: self.page.run_task(self.home_screen)
                     ),
                     actions=[
                         IconButton(
                             icon=ft.icons.CLOSE,
                             icon_color=Colors.WHITE,
                             tooltip="Cancel",
-                            on_click=lambda _: self.home_screen()
+                            on_click=lambda _: self.page.run_task(self.home_screen)
                         )
                     ]
                 ),
@@ -625,12 +1034,11 @@ class DiaryApp:
             padding=0
         )
 
-        self.page.views.clear()
-        self.page.views.append(view)
+        self._push_view(view)
         self.page.go('/create')
         self.page.update()
         
-    def handle_create_diary(self, e):
+    async def handle_create_diary(self, e):
         """Handle the creation of a new diary entry"""
         title = self.title_field.value
         content = self.content_field.value
@@ -641,151 +1049,149 @@ class DiaryApp:
             self.show_snack_bar("Please enter both title and content")
             return
 
-        # Prepare file if selected
-        files = {}
-        if self.selected_file_path:
-            try:
-                files['file'] = open(self.selected_file_path, 'rb')
-            except Exception as e:
-                self.show_snack_bar(f"Error with file: {str(e)}")
-                return
+        # Check the selected file is still there
+        file_path = self.selected_file_path
+        if file_path and not os.path.isfile(file_path):
+            self.show_snack_bar(f"Error with file: {file_path} is no longer available")
+            return
+
+        # Prepare request data
+        data = {
+            'title': title,
+            'content': content,
+        }
+
+        # Show the new card straight away under a local id; it is swapped
+        # for the server's diary once the request completes
+        local_id = self._next_local_id()
+        now = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+        self._swap_listed_diary(local_id, {
+            'id': local_id, **data, 'created_at': now, 'updated_at': now, 'file_url': None, 'file_type': None,
+        })
+        self._clear_diary_form()
+        await self._return_home()
 
         try:
-            # Prepare request data
-            data = {
-                'title': title,
-                'content': content,
-            }
-
-            # Make API request
-            response = requests.post(
-                f"{BASE_URL}diaries/",
-                data=data,
-                files=files,
-                headers={'Authorization': f'Token {self.token}'}
-            )
+            # Make API request; a queued retry reuses the key in case
+            # this attempt reached the server after all
+            idempotency_key = uuid.uuid4().hex
+            try:
+                upload = {}
+                if file_path:
+                    # Sent in resumable chunks, with progress on the new card
+                    upload['upload'] = await self.api.upload_file(
+                        file_path, lambda done: self._show_upload_progress(local_id, done),
+                    )
+                response = await self.api.create_diary({**data, **upload}, idempotency_key=idempotency_key)
+            except httpx.HTTPStatusError as status_error:
+                response = status_error.response
+            except httpx.TransportError as network_error:
+                print(f"Debug: Network error creating diary - {network_error}")
+                response = None
 
-            if response.status_code == 201:
+            if response is None or response.status_code >= 500:
+                await self._queue_write('create', local_id, data, file_path, idempotency_key)
+                self.show_snack_bar(SAVED_OFFLINE_MESSAGE)
+            elif response.status_code == 201:
                 print("Debug: Diary created successfully")
-                
-                # Clear the form fields
-                self.title_field.value = ""
-                self.content_field.value = ""
-                self.selected_file_path = None
-                if self.file_info_container.current:
-                    self.file_info_container.current.value = "No file selected"
-                
-                # Show success message
+                self._settle_local_diary(local_id, response.json())
                 self.show_snack_bar("Diary created successfully!")
-                
-                # Navigate back to home screen
-                self.page.views.clear()
-                self.page.update()
-                self.home_screen()
             else:
                 print(f"Debug: Error creating diary - {response.text}")
+                self._rollback_diary_form(local_id, None, title, content, file_path)
                 self.show_snack_bar(f"Error creating diary: {response.text}")
 
         except Exception as e:
             print(f"Debug: Exception while creating diary - {str(e)}")
+            self._rollback_diary_form(local_id, None, title, content, file_path)
             self.show_snack_bar(f"Error: {str(e)}")
-            
-        finally:
-            # Clean up resources
-            if files and 'file' in files:
-                files['file'].close()
 
-    def update_diary(self, diary_id):
+    async def update_diary(self, diary_id):
         """Update an existing diary entry"""
         try:
-            # Get the diary details first
-            response = requests.get(
-                f"{BASE_URL}diaries/{diary_id}/",
-                headers={'Authorization': f'Token {self.token}'}
-            )
+            # Get the diary details first, from the local store if possible
+            try:
+                diary = await self._get_full_diary(diary_id)
+            except httpx.HTTPError:
+                self.show_snack_bar("Error loading diary details")
+                return
             
-            if response.status_code == 200:
-                diary = response.json()
-                
-                # Pre-fill the form fields
-                self.title_field.value = diary.get('title', '')
-                self.content_field.value = diary.get('content', '')
-                
-                # Create the update form
-                form = Column(
-                    controls=[
-                        Container(
-                            padding=padding.only(bottom=20),
-                            content=Text(
-                                "Edit Diary",
-                                size=24,
-                                weight=FontWeight.BOLD,
-                                color=Colors.BLUE_GREY_800,
-                            ),
+            # Pre-fill the form fields
+            self.title_field.value = diary.get('title', '')
+            self.content_field.value = diary.get('content', '')
+            
+            # Create the update form
+            form = Column(
+                controls=[
+                    Container(
+                        padding=padding.only(bottom=20),
+                        content=Text(
+                            "Edit Diary",
+                            size=24,
+                            weight=FontWeight.BOLD,
+                            color=Colors.BLUE_GREY_800,
                         ),
-                        self.title_field,
-                        self.content_field,
-                        Container(
-                            padding=padding.only(top=20),
-                            content=Row(
-                                controls=[
-                                    OutlinedButton(
-                                        "Cancel",
-                                        icon=ft.icons.CANCEL,
-                                        on_click=lambda _: self.home_screen()
-                                    ),
-                                    ElevatedButton(
-                                        "Update",
-                                        icon=ft.icons.SAVE,
-                                        on_click=lambda _: self.handle_update_diary(diary_id),
-                                        style=ButtonStyle(
-                                            color={"": Colors.WHITE},
-                                            bgcolor={"": Colors.BLUE_400},
-                                        ),
+                    ),
+                    self.title_field,
+                    self.content_field,
+                    Container(
+                        padding=padding.only(top=20),
+                        content=Row(
+                            controls=[
+                                OutlinedButton(
+                                    "Cancel",
+                                    icon=ft.icons.CANCEL,
+                                    on_click=lambda _: self.page.run_task(self.home_screen)
+                                ),
+                                ElevatedButton(
+                                    "Update",
+                                    icon=ft.icons.SAVE,
+                                    on_click=lambda _: self.page.run_task(self.handle_update_diary, diary_id),
+                                    style=ButtonStyle(
+                                        color={"": Colors.WHITE},
+                                        bgcolor={"": Colors.BLUE_400},
                                     ),
-                                ],
-                                alignment=MainAxisAlignment.END,
-                                spacing=10,
-                            ),
+                                ),
+                            ],
+                            alignment=MainAxisAlignment.END,
+                            spacing=10,
                         ),
-                    ],
-                    spacing=20,
-                )
+                    ),
+                ],
+                spacing=20,
+            )
 
-                # Create and show the update view
-                view = View(
-                    "/edit",
-                    [
-                        AppBar(
-                            title=Text("Edit Diary"),
-                            bgcolor=Colors.BLUE_400,
-                            leading=IconButton(
-                                icon=ft.icons.ARROW_BACK,
-                                icon_color=Colors.WHITE,
-                                on_click=lambda _: self.home_screen()
-                            ),
-                        ),
-                        Container(
-                            content=form,
-                            padding=20,
-                            expand=True,
+            # Create and show the update view
+            view = View(
+                "/edit",
+                [
+                    AppBar(
+                        title=Text("Edit Diary"),
+                        bgcolor=Colors.BLUE_400,
+                        leading=IconButton(
+                            icon=ft.icons.ARROW_BACK,
+                            icon_color=Colors.WHITE,
+                            on_click=lambda _: self.page.run_task(self.home_screen)
                         ),
-                    ],
-                    bgcolor=Colors.WHITE,
-                    padding=0,
-                )
+                    ),
+                    Container(
+                        content=form,
+                        padding=20,
+                        expand=True,
+                    ),
+                ],
+                bgcolor=Colors.WHITE,
+                padding=0,
+            )
 
-                self.page.views.clear()
-                self.page.views.append(view)
-                self.page.go('/edit')
-                self.page.update()
-            else:
-                self.show_snack_bar("Error loading diary details")
+            self._push_view(view)
+            self.page.go('/edit')
+            self.page.update()
         except Exception as e:
             print(f"Error updating diary: {str(e)}")
             self.show_snack_bar(f"Error: {str(e)}")
 
-    def handle_update_diary(self, diary_id):
+    async def handle_update_diary(self, diary_id):
         """Handle the diary update submission"""
         title = self.title_field.value
         content = self.content_field.value
@@ -794,109 +1200,104 @@ class DiaryApp:
             self.show_snack_bar("Please enter both title and content")
             return
 
+        data = {
+            'title': title,
+            'content': content,
+        }
+
+        # Patch the card first, then confirm with the server
+        previous = self._listed_diary(diary_id)
+        if previous is not None:
+            self._swap_listed_diary(diary_id, {**previous, **data})
+        self._clear_diary_form()
+        await self._return_home()
+
         try:
-            # Make API request
-            response = requests.put(
-                f"{BASE_URL}diaries/{diary_id}/",
-                data={
-                    'title': title,
-                    'content': content,
-                },
-                headers={'Authorization': f'Token {self.token}'}
-            )
+            response = None
+            if not self._must_queue(diary_id):
+                # Make API request
+                try:
+                    response = await self.api.update_diary(diary_id, data)
+                except httpx.TransportError as network_error:
+                    print(f"Debug: Network error updating diary - {network_error}")
 
-            if response.status_code == 200:
+            if response is None or response.status_code >= 500:
+                await self._queue_write('update', diary_id, data)
+                self.show_snack_bar(SAVED_OFFLINE_MESSAGE)
+            elif response.status_code == 200:
                 print("Debug: Diary updated successfully")
-                
-                # Clear the form fields
-                self.title_field.value = ""
-                self.content_field.value = ""
-                
-                # Show success message
+                self._settle_local_diary(diary_id, response.json())
                 self.show_snack_bar("Diary updated successfully!")
-                
-                # Navigate back to home screen
-                self.page.views.clear()
-                self.page.update()
-                self.home_screen()
             else:
                 print(f"Debug: Error updating diary - {response.text}")
+                self._rollback_diary_form(diary_id, previous, title, content)
                 self.show_snack_bar(f"Error updating diary: {response.text}")
 
         except Exception as e:
             print(f"Debug: Exception while updating diary - {str(e)}")
+            self._rollback_diary_form(diary_id, previous, title, content)
             self.show_snack_bar(f"Error: {str(e)}")
 
-    def reload_diaries(self):
+    def _listed_diary(self, diary_id):
+        return next((diary for diary in self.diaries if diary['id'] == diary_id), None)
+
+    def _next_local_id(self):
+        """A negative id no queued or optimistic diary is using"""
+        lowest = min((diary['id'] for diary in self.diaries), default=0)
+        return min(self.store.next_local_id(self.current_user), lowest - 1)
+
+    def _clear_diary_form(self):
+        self.title_field.value = ""
+        self.content_field.value = ""
+        self.selected_file_path = None
+        if self.file_info_container.current:
+            self.file_info_container.current.value = "No file selected"
+
+    def _rollback_diary_form(self, diary_id, previous, title, content, file_path=None):
+        """Undo an optimistic write the server refused, keeping what the user typed"""
+        if previous is not None or diary_id < 0:
+            self._swap_listed_diary(diary_id, previous)
+        self.title_field.value = title
+        self.content_field.value = content
+        self.selected_file_path = file_path
+
+    async def _return_home(self):
+        """Go back to the home view as it stands, without refetching"""
+        if self.home_view is None or self.diaries_list_view is None:
+            # No list to patch yet (e.g. the first diary): build it
+            await self.home_screen()
+            return
+        self._pop_to_home_view()
+        self.page.go('/home')
+        self.page.update()
+
+    async def reload_diaries(self):
         """Reload diaries list without recreating the entire view"""
-        try:
-            # Fetch updated diaries
-            response = requests.get(
-                f"{BASE_URL}diaries/", 
-                headers={"Authorization": f"Token {self.token}"}
-            )
-            
-            if response.status_code == 200:
-                diaries = response.json()
-                
-                # Find the ListView in the current view
-                if self.page.views:
-                    current_view = self.page.views[-1]
-                    
-                    # Traverse through controls to find the ListView
-                    def find_listview(controls):
-                        for control in controls:
-                            if isinstance(control, ListView):
-                                return control
-                            if hasattr(control, 'content'):
-                                if isinstance(control.content, ListView):
-                                    return control.content
-                                if hasattr(control.content, 'controls'):
-                                    result = find_listview(control.content.controls)
-                                    if result:
-                                        return result
-                        return None
-                    
-                    # Get the ListView
-                    diaries_list = find_listview(current_view.controls)
-                    
-                    if diaries_list:
-                        # Clear existing diaries
-                        diaries_list.controls.clear()
-                        
-                        # Populate with new diaries
-                        for diary in diaries:
-                            diary_card = Card(
-                                content=Container(
-                                    padding=10,
-                                    content=Column([
-                                        Text(diary['title'], size=18, weight=FontWeight.BOLD),
-                                        Text(diary['content'][:100], size=14),
-                                        Row([
-                                            IconButton(
-                                                icon=ft.icons.EDIT,
-                                                on_click=lambda e: self.update_diary(diary['id'])
-                                            ),
-                                            IconButton(
-                                                icon=ft.icons.DELETE,
-                                                on_click=lambda e: self.delete_diary(diary['id'])
-                                            )
-                                        ])
-                                    ])
-                                )
-                            )
-                            diaries_list.controls.append(diary_card)
-                        
-                        # Update the page
-                        self.page.update()
-                        return True
-            
+        if self.diaries_list_view is None:
             return False
-        
-        except Exception as e:
+
+        try:
+            # Bring the in-memory list up to date
+            if self.sync_token:
+                changes = await self._sync_diaries()
+            else:
+                await self._load_first_page()
+                changes = None
+        except (httpx.HTTPError, ValueError) as e:
             print(f"Error reloading diaries: {e}")
             return False
 
+        if changes is None:
+            # Fresh first page: rebuild the cards and the registry
+            self.diary_cards = {}
+            self.diaries_list_view.controls = [self._build_diary_card(diary) for diary in self.diaries]
+            self.diaries_list_view.controls.append(self.load_more_button)
+            self.load_more_button.visible = bool(self.next_diaries_url)
+            self.diaries_list_view.update()
+        else:
+            self._patch_diary_cards(*changes)
+        return True
+
     def delete_diary(self, diary_id):
         """Delete a diary entry"""
         try:
@@ -909,7 +1310,7 @@ class DiaryApp:
                     TextButton("Cancel", on_click=lambda _: self.close_dialog()),
                     TextButton(
                         "Delete", 
-                        on_click=lambda _: self.handle_delete_confirmation(diary_id)
+                        on_click=lambda _: self.page.run_task(self.handle_delete_confirmation, diary_id)
                     ),
                 ]
             )
@@ -920,49 +1321,44 @@ class DiaryApp:
             print(f"Error preparing delete dialog: {str(e)}")
             self.show_snack_bar(f"Error: {str(e)}")
 
-    def handle_delete_confirmation(self, diary_id):
+    async def handle_delete_confirmation(self, diary_id):
         """Handle the actual deletion of the diary after confirmation"""
-        try:
-            # Close the confirmation dialog
-            self.close_dialog()
+        # Close the confirmation dialog
+        self.close_dialog()
 
-            # Show loading indicator
-            loading = ProgressRing()
-            self.page.overlay.append(loading)
-            self.page.update()
+        # Drop the card first, then confirm with the server
+        previous = self._listed_diary(diary_id)
+        self._swap_listed_diary(diary_id, None)
+        await self._return_home()
 
-            # Make delete request
-            response = requests.delete(
-                f"{BASE_URL}diaries/{diary_id}/",
-                headers={'Authorization': f'Token {self.token}'}
-            )
-
-            # Remove loading indicator
-            self.page.overlay.remove(loading)
+        try:
+            response = None
+            if not self._must_queue(diary_id):
+                # Make delete request
+                try:
+                    response = await self.api.delete_diary(diary_id)
+                except httpx.TransportError as network_error:
+                    print(f"Network error deleting diary: {network_error}")
 
-            if response.status_code == 204:  # No content (successful deletion)
+            if response is None or response.status_code >= 500:
+                await self._queue_write('delete', diary_id)
+                self.show_snack_bar(SAVED_OFFLINE_MESSAGE)
+            elif response.status_code in (204, 404):  # Gone either way
+                self.store.forget_diaries(self.current_user, [diary_id])
                 self.show_snack_bar("Diary deleted successfully!")
-                # Refresh home screen
-                self.page.views.clear()
-                self.home_screen()
-                self.page.go('/home')
-                self.page.update()
             else:
                 error_message = f"Error deleting diary: {response.status_code} - {response.text}"
                 print(error_message)
+                if previous is not None:
+                    self._swap_listed_diary(diary_id, previous)
                 self.show_snack_bar(error_message)
 
-        except requests.RequestException as e:
-            error_message = f"Network error deleting diary: {str(e)}"
-            print(error_message)
-            self.show_snack_bar(error_message)
         except Exception as e:
             error_message = f"Unexpected error deleting diary: {str(e)}"
             print(error_message)
+            if previous is not None:
+                self._swap_listed_diary(diary_id, previous)
             self.show_snack_bar(error_message)
-        finally:
-            # Ensure loading is removed
-            self.page.update()
 
     def close_dialog(self):
         """Close the current dialog"""
@@ -970,11 +1366,22 @@ class DiaryApp:
             self.page.dialog.open = False
             self.page.update()
 
-    def logout(self, e=None):
+    async def logout(self, e=None):
         """Logout the user and return to auth screen"""
         try:
-            # Clear the token
-            self.token = None
+            # Revoke the token and drop anything fetched with it; queued
+            # writes stay on the device for the user's next login
+            if self.outbox_worker is not None:
+                self.outbox_worker.stop()
+                self.outbox_worker = None
+            await self.api.logout()
+            self.diaries = []
+            self.sync_token = None
+            self.next_diaries_url = None
+            self.home_view = None
+            self.diaries_list_view = None
+            self.diary_cards = {}
+            self.current_user = None
             
             # Reset fields
             self.username_field.value = ""
@@ -1047,13 +1454,11 @@ class DiaryApp:
             print(f"File path: {file.path}")
             print(f"File size: {file.size}")
             
-            try:
-                # Check if file exists and is readable
-                with open(file.path, 'rb') as f:
-                    print(f"File is readable: {file.path}")
-            except Exception as e:
-                print(f"Error accessing file: {str(e)}")
-                self.show_snack_bar(f"Error accessing file: {str(e)}")
+            # Check the file exists and is readable without opening it;
+            # it is only read, a chunk at a time, when it is uploaded
+            if not (file.path and os.path.isfile(file.path) and os.access(file.path, os.R_OK)):
+                print(f"Error accessing file: {file.path}")
+                self.show_snack_bar(f"Error accessing file: {file.name} cannot be read")
                 return
             
             # Preserve the selected file information
@@ -1102,13 +1507,27 @@ class DiaryApp:
             return Container()  # Return empty container if no file
 
         if diary.get('file_type') == 'image':
-            return Container(
-                content=Image(
-                    src=diary['file_url'],
+            # Shown from the thumbnail; the full-size file is only fetched on request
+            image_ref = ft.Ref[Image]()
+            controls = [
+                Image(
+                    src=diary.get('thumbnail_url') or diary['file_url'],
                     width=300,
                     height=200,
                     fit=ft.ImageFit.COVER,
+                    ref=image_ref,
                 ),
+            ]
+            if diary.get('thumbnail_url'):
+                controls.append(
+                    TextButton(
+                        "View original",
+                        icon=ft.icons.ZOOM_IN,
+                        on_click=lambda e: self.page.run_task(self._show_original_image, diary, image_ref, e.control),
+                    )
+                )
+            return Container(
+                content=Column(controls, spacing=4, horizontal_alignment=CrossAxisAlignment.CENTER),
                 margin=margin.only(bottom=10),
                 alignment=alignment.center,
             )
@@ -1122,7 +1541,7 @@ class DiaryApp:
                         on_click=lambda e: self._play_audio(diary['file_url'])
                     ),
                     Text(
-                        os.path.basename(diary['file_url']),
+                        os.path.basename(diary['file_url'].split('?')[0]),
                         color=Colors.BLACK54,
                     )
                 ]),
@@ -1131,6 +1550,21 @@ class DiaryApp:
         
         return Container()  # Default empty container
 
+    async def _show_original_image(self, diary, image_ref, button):
+        """Swap a details view's thumbnail for the full-size image, storing it on the device"""
+        button.text = "Loading original..."
+        button.disabled = True
+        button.update()
+        path = self.store.attachment_path(self.current_user, diary['file_url'])
+        if path is None:
+            await self._store_attachment(diary['id'], diary['file_url'])
+            path = self.store.attachment_path(self.current_user, diary['file_url'])
+        image_ref.current.src = path or self.api.url(diary['file_url'])
+        image_ref.current.fit = ft.ImageFit.CONTAIN
+        image_ref.current.update()
+        button.visible = False
+        button.update()
+
     def _play_audio(self, audio_url):
         """Play audio from the given URL"""
         try:
@@ -1141,14 +1575,18 @@ class DiaryApp:
             self.audio_player.play()
             
             # Show a snackbar to indicate audio is playing
-            self.show_snack_bar(f"Playing: {os.path.basename(audio_url)}")
+            self.show_snack_bar(f"Playing: {os.path.basename(audio_url.split('?')[0])}")
         except Exception as e:
             # Handle any errors in playing the audio
             self.show_snack_bar(f"Error playing audio: {str(e)}")
 
-    def show_diary_details(self, diary):
+    async def show_diary_details(self, diary):
         """Show full details of a specific diary entry"""
         try:
+            # List items only carry a preview, so load the full entry first
+            if 'content' not in diary:
+                diary = await self._get_full_diary(diary['id'])
+
             # Create the details view
             details_view = View(
                 "/details",
@@ -1159,14 +1597,14 @@ class DiaryApp:
                         leading=IconButton(
                             icon=ft.icons.ARROW_BACK,
                             icon_color=Colors.WHITE,
-                            on_click=lambda _: self.home_screen()
+                            on_click=lambda _: self.page.run_task(self.home_screen)
                         ),
                         actions=[
                             IconButton(
                                 icon=ft.icons.EDIT,
                                 icon_color=Colors.WHITE,
                                 tooltip="Edit",
-                                on_click=lambda _: self.update_diary(diary['id'])
+                                on_click=lambda _: self.page.run_task(self.update_diary, diary['id'])
                             ),
                             IconButton(
                                 icon=ft.icons.DELETE,
@@ -1194,6 +1632,7 @@ class DiaryApp:
                                         color=Colors.BLUE_GREY_700,
                                     ),
                                 ),
+                                self._render_diary_file_content(self._with_stored_attachment(diary)),
                                 Row(
                                     controls=[
                                         Text(
@@ -1212,8 +1651,7 @@ class DiaryApp:
                 padding=0,
             )
             
-            self.page.views.clear()
-            self.page.views.append(details_view)
+            self._push_view(details_view)
             self.page.go('/details')
             self.page.update()
             
@@ -1221,7 +1659,56 @@ class DiaryApp:
             print(f"Error showing diary details: {str(e)}")
             self.show_snack_bar("Error showing diary details")
 
-    def create_home_view(self):
+    async def _get_full_diary(self, diary_id):
+        """Return the full diary, from the on-device store when its body is there"""
+        pending = [entry for entry in self.store.pending_writes(self.current_user) if entry['diary_id'] == diary_id]
+        if pending and pending[0]['op'] == 'create':
+            # Created offline: the outbox is the only copy
+            diary = {'id': diary_id, 'created_at': pending[0]['queued_at'], 'file_url': None, 'file_type': None}
+        else:
+            diary = self.store.get_diary(self.current_user, diary_id)
+            if diary is None:
+                diary = await self.api.get_diary(diary_id)
+                self.store.put_diary(self.current_user, diary)
+        for entry in pending:
+            diary = {**diary, **entry['fields']}
+        return diary
+
+    def _with_stored_attachment(self, diary):
+        """Point the diary at stored copies of what its details show"""
+        if diary.get('file_type') == 'image' and diary.get('thumbnail_url'):
+            # The full-size image stays remote until it is asked for
+            return {**diary, 'thumbnail_url': self._stored_copy(diary, 'thumbnail_url')}
+        if not diary.get('file_url'):
+            return diary
+        return {**diary, 'file_url': self._stored_copy(diary, 'file_url')}
+
+    def _stored_copy(self, diary, key):
+        """Return the stored copy of ``diary[key]``, or its URL while it is stored for next time"""
+        url = diary.get(key)
+        if not url:
+            return None
+        path = self.store.attachment_path(self.current_user, url)
+        if path is None:
+            self.page.run_task(self._store_attachment, diary['id'], url)
+            return self.api.url(url)
+        return path
+
+    async def _store_attachment(self, diary_id, url):
+        """Download one of a diary's files into the on-device store"""
+        path = self.store.new_attachment_path(self.current_user, url)
+        partial = path + '.part'
+        try:
+            await self.api.download(url, partial)
+            os.replace(partial, path)
+        except (httpx.HTTPError, OSError) as e:
+            print(f"Debug: Could not store attachment - {e}")
+            if os.path.exists(partial):
+                os.remove(partial)
+            return
+        self.store.put_attachment(self.current_user, diary_id, url, path)
+
+    async def create_home_view(self):
         """Create the home view"""
         # Comprehensive diagnostics function
         def log_detailed_diagnostics(prefix=""):
@@ -1267,26 +1754,20 @@ class DiaryApp:
 
         # Fetch diaries with comprehensive error
         try:
-            print(f"Debug: Attempting to fetch diaries with token: {self.token}")
-            response = requests.get(
-                f"{BASE_URL}diaries/", 
-                headers={"Authorization": f"Token {self.token}"},
-                timeout=10
-            )
-            print(f"Debug: API Response Status Code: {response.status_code}")
-            
-            try:
-                diaries = response.json()
-                print("Debug: Diaries fetched successfully")
-                print("Debug: Diaries content:", diaries)
-            except ValueError as json_error:
-                print(f"Debug: JSON Parsing Error - {json_error}")
-                print("Debug: Response Text:", response.text)
-                diaries = []
-        
-        except requests.RequestException as req_error:
+            print("Debug: Attempting to fetch diaries")
+            if self.sync_token:
+                # Already loaded once: only pull what changed since then
+                await self._sync_diaries()
+            else:
+                await self._load_first_page()
+            diaries = self.diaries
+            print(f"Debug: {len(diaries)} diaries loaded, next page: {self.next_diaries_url}")
+        except ValueError as json_error:
+            print(f"Debug: JSON Parsing Error - {json_error}")
+            diaries = self.diaries
+        except httpx.HTTPError as req_error:
             print(f"Debug: Request Error - {req_error}")
-            diaries = []
+            diaries = self.diaries
 
         # Explicit view construction with multiple fallback strategies
         try:
@@ -1314,6 +1795,12 @@ class DiaryApp:
                                     Text("My Diaries", size=24, weight=FontWeight.BOLD, color=Colors.WHITE),
                                     Row(
                                         controls=[
+                                            IconButton(
+                                                icon=Icons.SEARCH,
+                                                icon_color=Colors.WHITE,
+                                                tooltip="Search Diaries",
+                                                on_click=self.show_search_view
+                                            ),
                                             IconButton(
                                                 icon=Icons.ADD,
                                                 icon_color=Colors.WHITE,
@@ -1348,116 +1835,7 @@ class DiaryApp:
                                     )
                                 ] + (
                                     [
-                                        ListView(
-                                            controls=[
-                                                Card(
-                                                    elevation=4,
-                                                    content=Container(
-                                                        padding=20,
-                                                        content=Column(
-                                                            controls=[
-                                                                Row(
-                                                                    alignment=MainAxisAlignment.SPACE_BETWEEN,
-                                                                    controls=[
-                                                                        Text(
-                                                                            diary["title"],
-                                                                            size=18,
-                                                                            weight=FontWeight.BOLD,
-                                                                            color=Colors.BLUE_GREY_800
-                                                                        ),
-                                                                        Row(
-                                                                            spacing=0,
-                                                                            controls=[
-                                                                                IconButton(
-                                                                                    icon=Icons.EDIT,
-                                                                                    icon_color=Colors.BLUE_400,
-                                                                                    tooltip="Edit",
-                                                                                    on_click=lambda e, diary=diary: self.update_diary(diary['id'])
-                                                                                ),
-                                                                                IconButton(
-                                                                                    icon=Icons.DELETE,
-                                                                                    icon_color=Colors.RED_400,
-                                                                                    tooltip="Delete",
-                                                                                    on_click=lambda e, diary=diary: self.delete_diary(diary['id'])
-                                                                                ),
-                                                                            ]
-                                                                        )
-                                                                    ]
-                                                                ),
-                                                                Container(
-                                                                    padding=padding.only(top=8, bottom=12),
-                                                                    content=Text(
-                                                                        diary["content"][:100] + "..." if len(diary["content"]) > 100 else diary["content"],
-                                                                        color=Colors.BLUE_GREY_600,
-                                                                        size=14,
-                                                                    )
-                                                                ),
-                                                                Divider(
-                                                                    color=Colors.BLUE_GREY_100,
-                                                                    height=1,
-                                                                ),
-                                                                Container(
-                                                                    padding=padding.only(top=12),
-                                                                    content=Row(
-                                                                        alignment=MainAxisAlignment.SPACE_BETWEEN,
-                                                                        controls=[
-                                                                            Column(
-                                                                                spacing=5,
-                                                                                controls=[
-                                                                                    Text(
-                                                                                        "Created",
-                                                                                        size=12,
-                                                                                        color=Colors.BLUE_GREY_400,
-                                                                                    ),
-                                                                                    Text(
-                                                                                        diary.get("created_at", "").split("T")[0],
-                                                                                        size=12,
-                                                                                        color=Colors.BLUE_GREY_700,
-                                                                                        weight=FontWeight.BOLD,
-                                                                                    )
-                                                                                ]
-                                                                            ),
-                                                                            ElevatedButton(
-                                                                                content=Row(
-                                                                                    controls=[
-                                                                                        Icon(
-                                                                                            Icons.VISIBILITY,
-                                                                                            color=Colors.WHITE,
-                                                                                            size=16,
-                                                                                        ),
-                                                                                        Text(
-                                                                                            "View Details",
-                                                                                            color=Colors.WHITE,
-                                                                                            size=14,
-                                                                                        ),
-                                                                                    ],
-                                                                                    spacing=5,
-                                                                                ),
-                                                                                style=ButtonStyle(
-                                                                                    color={
-                                                                                        "": Colors.WHITE,
-                                                                                    },
-                                                                                    bgcolor={
-                                                                                        "": Colors.BLUE_400,
-                                                                                    },
-                                                                                    padding=padding.only(left=15, right=15, top=12, bottom=12),
-                                                                                ),
-                                                                                on_click=lambda e, diary=diary: self.show_diary_details(diary)
-                                                                            ),
-                                                                        ]
-                                                                    )
-                                                                )
-                                                            ]
-                                                        )
-                                                    ),
-                                                    margin=margin.only(bottom=16)
-                                                )
-                                                for diary in diaries
-                                            ],
-                                            expand=True,
-                                            spacing=0,
-                                            padding=padding.only(right=4)
-                                        )
+                                        self._build_diary_list(diaries)
                                     ] if diaries else [
                                         Container(
                                             margin=margin.only(top=40),
@@ -0,0 +1,126 @@
+import asyncio
+import random
+import time
+
+import httpx
+
+
+class OutboxWorker:
+    """
+    Background task that replays a user's queued writes in order.
+
+    Each write is sent once the server is reachable; network failures and
+    5xx/429 responses are retried with jittered exponential backoff, and a
+    create is sent with its queued ``Idempotency-Key`` so a retry after a
+    lost response never creates a duplicate. The worker sleeps while the
+    outbox is empty; call :meth:`wake` after queueing a write.
+
+    ``on_sent(entry, response)`` is awaited after each write the server
+    accepted and ``on_failed(entry, response, error)`` after one it rejected
+    for good (e.g. a validation error) or that can't be sent at all (e.g.
+    its attachment is gone, when ``response`` is None and ``error`` says
+    why), which is then dropped from the queue.
+    Attachments go up as resumable chunked uploads, so a retry only sends
+    what the server is missing; ``on_progress(entry, fraction)`` follows
+    them.
+    """
+
+    RETRY_STATUSES = frozenset([408, 429, 500, 502, 503, 504])
+
+    def __init__(self, api, store, user, on_sent, on_failed, on_progress=None, base_delay=1.0, max_delay=300.0):
+        self.api = api
+        self.store = store
+        self.user = user
+        self.on_sent = on_sent
+        self.on_failed = on_failed
+        self.on_progress = on_progress
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.wakeup = asyncio.Event()
+        self.stopped = False
+
+    def wake(self):
+        """Send queued writes now, skipping any backoff in progress"""
+        self.wakeup.set()
+
+    def stop(self):
+        self.stopped = True
+        self.wakeup.set()
+
+    async def run(self):
+        # Anything claimed when the app last stopped was never confirmed
+        self.store.release_writes(self.user)
+        while not self.stopped:
+            entry = self.store.claim_write(self.user)
+            if entry is None:
+                await self._sleep(None)
+                continue
+
+            delay = entry['next_attempt_at'] - time.time()
+            if delay > 0 and not self.wakeup.is_set():
+                self.store.retry_write(entry['id'], entry['attempts'], entry['next_attempt_at'])
+                await self._sleep(delay)
+                continue
+            self.wakeup.clear()
+
+            try:
+                response = await self._send(entry)
+            except httpx.TransportError as e:
+                print(f"Debug: Outbox write {entry['id']} failed - {e}")
+                self._back_off(entry)
+                continue
+            except OSError as e:
+                # Retrying won't bring a missing or unreadable attachment back
+                print(f"Debug: Outbox write {entry['id']} can't be sent - {e}")
+                self.store.complete_write(self.user, entry)
+                await self.on_failed(entry, None, e)
+                continue
+
+            if response.status_code in self.RETRY_STATUSES:
+                self._back_off(entry)
+            elif response.status_code in (401, 403):
+                # Keep the write for the next login rather than losing it
+                self.store.retry_write(entry['id'], entry['attempts'], entry['next_attempt_at'])
+                return
+            elif response.is_success or (entry['op'] == 'delete' and response.status_code == 404):
+                try:
+                    server_id = response.json()['id'] if entry['op'] == 'create' else None
+                except ValueError as e:
+                    # A garbled body, e.g. cut off by a proxy; the idempotency
+                    # key makes sending the write again safe
+                    print(f"Debug: Outbox write {entry['id']} got a bad response - {e}")
+                    self._back_off(entry)
+                    continue
+                self.store.complete_write(self.user, entry, server_id)
+                await self.on_sent(entry, response)
+            else:
+                self.store.complete_write(self.user, entry)
+                await self.on_failed(entry, response, None)
+
+    async def _send(self, entry):
+        if entry['op'] == 'create':
+            fields = entry['fields']
+            if entry['file_path']:
+                on_progress = None
+                if self.on_progress:
+                    on_progress = lambda done: self.on_progress(entry, done)
+                try:
+                    upload_id = await self.api.upload_file(entry['file_path'], on_progress)
+                except httpx.HTTPStatusError as e:
+                    return e.response
+                fields = {**fields, 'upload': upload_id}
+            return await self.api.create_diary(fields, idempotency_key=entry['idempotency_key'])
+        if entry['op'] == 'update':
+            return await self.api.update_diary(entry['diary_id'], entry['fields'])
+        return await self.api.delete_diary(entry['diary_id'])
+
+    def _back_off(self, entry):
+        attempts = entry['attempts'] + 1
+        delay = min(self.max_delay, self.base_delay * 2 ** attempts) * random.uniform(0.5, 1.0)
+        self.store.retry_write(entry['id'], attempts, time.time() + delay)
+
+    async def _sleep(self, timeout):
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass